@@ -0,0 +1,222 @@
+"""
+Caché de análisis por resumen cuantizado de la lectura.
+
+El prompt sólo incluye un resumen pequeño de cada lectura (ubicación y unos
+pocos valores climáticos), y lecturas tomadas con minutos de diferencia
+suelen coincidir casi por completo. Cuantizando esos valores (por ejemplo,
+temperatura a 0.5 °C y humedad a 2 %) lecturas equivalentes comparten clave
+y reutilizan el análisis ya generado en lugar de volver a llamar a Ollama.
+
+Las entradas se guardan en SQLite (tabla analysis_cache), caducan tras
+ANALYSIS_CACHE_TTL segundos y, por encima de ANALYSIS_CACHE_MAX_ENTRIES,
+se descartan las usadas hace más tiempo. Un acierto sólo lee de la base de
+datos: el uso de la entrada se acumula en memoria y se escribe con el
+siguiente guardado, justo antes de descartar entradas.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from app.db.manager import DBManager
+
+logger = logging.getLogger(__name__)
+
+# Configuración (se puede sobrescribir mediante variables de entorno)
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", "3600"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1000"))
+
+# Paso de cuantización por campo del resumen; ANALYSIS_CACHE_STEPS permite
+# sobrescribirlos con el formato "temperatura=0.5,humedad=2"
+DEFAULT_QUANTIZATION = {
+    "latitud": 0.01,
+    "longitud": 0.01,
+    "temperatura": 0.5,
+    "presion_hPa": 1.0,
+    "luz_lux": 50.0,
+    "indice_uv": 0.5,
+    "temp_media": 0.5,
+    "humedad": 2.0,
+    "precipitacion": 1.0,
+    "viento": 0.5,
+}
+
+
+def parse_quantization(spec: Optional[str]) -> Dict[str, float]:
+    """
+    Combinar los pasos de cuantización por defecto con los indicados en texto.
+
+    Args:
+        spec: Pasos con el formato "campo=paso,campo=paso" (o None)
+
+    Returns:
+        Paso de cuantización por campo
+    """
+    steps = dict(DEFAULT_QUANTIZATION)
+    if not spec:
+        return steps
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        try:
+            name, value = item.split("=", 1)
+            steps[name.strip()] = float(value)
+        except ValueError:
+            raise ValueError(f"Paso de cuantización no válido: '{item}' (use campo=paso)")
+    return steps
+
+
+ANALYSIS_CACHE_STEPS = parse_quantization(os.getenv("ANALYSIS_CACHE_STEPS"))
+
+
+def quantize(value: Any, step: Optional[float]) -> Any:
+    """Redondear un valor numérico al múltiplo más cercano del paso."""
+    if not step or isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    return round(round(value / step) * step, 6)
+
+
+def quantize_resumen(data_resumen: Dict[str, Any], steps: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Cuantizar los valores de un resumen de lectura.
+
+    Args:
+        data_resumen: Resumen devuelto por build_data_resumen
+        steps: Paso de cuantización por campo
+
+    Returns:
+        Resumen con los mismos campos y los valores cuantizados
+    """
+    return {
+        key: quantize_resumen(value, steps) if isinstance(value, dict) else quantize(value, steps.get(key))
+        for key, value in data_resumen.items()
+    }
+
+
+class AnalysisCache:
+    """Caché de análisis persistida en SQLite con TTL, LRU y contadores."""
+
+    def __init__(
+        self,
+        db: DBManager,
+        ttl: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        steps: Optional[Dict[str, float]] = None,
+    ):
+        """
+        Inicializar la caché.
+
+        Args:
+            db: Gestor de base de datos
+            ttl: Segundos de vigencia de cada entrada (0 desactiva la caché)
+            max_entries: Número máximo de entradas
+            steps: Paso de cuantización por campo del resumen
+        """
+        self.db = db
+        self.ttl = ttl if ttl is not None else ANALYSIS_CACHE_TTL
+        self.max_entries = max_entries or ANALYSIS_CACHE_MAX_ENTRIES
+        self.steps = steps or ANALYSIS_CACHE_STEPS
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Usos pendientes de escribir: clave -> (último uso en segundos epoch, aciertos)
+        self._usage: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Indica si la caché está activa."""
+        return self.ttl > 0
+
+    def key(self, model: str, data_resumen: Dict[str, Any], namespace: Optional[str] = None) -> str:
+        """
+        Calcular la clave de un análisis.
+
+        Args:
+            model: Modelo de IA
+            data_resumen: Resumen de la lectura
+            namespace: Espacio de claves para análisis de otro tipo (p. ej. la
+                plantilla de los informes por lotes); None para el análisis individual
+
+        Returns:
+            Hash SHA-256 del modelo, el espacio de claves y el resumen cuantizado
+        """
+        entry = {"model": model, "resumen": quantize_resumen(data_resumen, self.steps)}
+        if namespace:
+            entry["namespace"] = namespace
+        payload = json.dumps(entry, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, data_resumen: Dict[str, Any], namespace: Optional[str] = None) -> Optional[str]:
+        """
+        Buscar un análisis equivalente ya generado.
+
+        Args:
+            model: Modelo de IA
+            data_resumen: Resumen de la lectura
+            namespace: Espacio de claves (ver key)
+
+        Returns:
+            Texto del análisis o None si no está en caché
+        """
+        if not self.enabled:
+            return None
+        key = self.key(model, data_resumen, namespace)
+        now = int(time.time())
+        result = self.db.get_cached_analysis(key, now - self.ttl)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._usage[key] = (now, self._usage.get(key, (now, 0))[1] + 1)
+        return result
+
+    def put(self, model: str, data_resumen: Dict[str, Any], result: str, namespace: Optional[str] = None) -> None:
+        """
+        Guardar un análisis generado.
+
+        Args:
+            model: Modelo de IA
+            data_resumen: Resumen de la lectura
+            result: Texto del análisis
+            namespace: Espacio de claves (ver key)
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            usage, self._usage = self._usage, {}
+        removed = self.db.save_cached_analysis(
+            self.key(model, data_resumen, namespace),
+            model,
+            result,
+            self.max_entries,
+            int(time.time()) - self.ttl,
+            usage
+        )
+        with self._lock:
+            self.evictions += removed
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Obtener los contadores de la caché.
+
+        Returns:
+            Aciertos, fallos, tasa de aciertos, entradas y configuración
+        """
+        with self._lock:
+            hits, misses, evictions = self.hits, self.misses, self.evictions
+        lookups = hits + misses
+        return {
+            "enabled": self.enabled,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": evictions,
+            "entries": self.db.count_cached_analyses(),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+        }
@@ -0,0 +1,46 @@
+"""
+Separación de las respuestas de análisis por lotes.
+
+En un análisis por lotes varias lecturas comparten un único prompt
+(generate_batch_prompt) y el modelo devuelve un informe por lectura, cada
+uno precedido por la cabecera BATCH_SECTION_HEADER con el ID de la lectura.
+"""
+import re
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Cabecera de sección tolerante con el formato que suele añadir el modelo
+# (negritas, almohadillas de Markdown o espacios de más)
+_SECTION_RE = re.compile(
+    r"^[ \t#*>]*=+\s*LECTURA\s*(?:ID\s*)?[:#]?\s*(\d+)\s*=+[ \t*]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def split_batch_response(text: str, data_ids: List[int]) -> Dict[int, str]:
+    """
+    Separar la respuesta de un análisis por lotes en un informe por lectura.
+
+    Args:
+        text: Respuesta completa del modelo
+        data_ids: IDs de las lecturas incluidas en el prompt
+
+    Returns:
+        Informe de cada lectura encontrada (las que falten no aparecen)
+    """
+    expected = set(data_ids)
+    matches = [m for m in _SECTION_RE.finditer(text) if int(m.group(1)) in expected]
+    sections: Dict[int, str] = {}
+    for n, match in enumerate(matches):
+        end = matches[n + 1].start() if n + 1 < len(matches) else len(text)
+        body = text[match.end():end].strip()
+        data_id = int(match.group(1))
+        # Si el modelo repite una cabecera, se conserva el informe más largo
+        if body and len(body) > len(sections.get(data_id, "")):
+            sections[data_id] = body
+    missing = expected - set(sections)
+    if missing:
+        logger.warning("La respuesta por lotes no incluye informe para las lecturas %s", sorted(missing))
+    return sections
@@ -0,0 +1,312 @@
+"""
+Detección de cambios en las lecturas para decidir cuándo analizar.
+
+La mayoría de lecturas consecutivas apenas varían, así que no merece la
+pena generar un informe nuevo con cada una. El detector sigue cada métrica
+configurada con una media móvil exponencial (EWMA) y compara contra el
+valor de la lectura analizada por última vez, de dos formas:
+
+- "ewma": se dispara cuando la media suavizada se aleja del valor de
+  referencia más que el umbral (p. ej. 1.5 °C de temperatura).
+- "cusum": CUSUM de dos lados; acumula las desviaciones respecto a la
+  referencia que superan la holgura k y se dispara cuando la suma supera
+  el umbral h. Detecta derivas lentas y sostenidas.
+
+También se dispara si desde el último análisis han pasado más de
+CHANGE_MAX_STALENESS segundos. El estado se lleva por dispositivo (campo
+"dispositivo" de la lectura) o, si la lectura no lo indica, por fuente, de
+modo que las lecturas de robots distintos no se mezclan en la misma media
+ni un cambio en uno reinicia la referencia de los demás. Los umbrales se configuran por campo en
+CHANGE_THRESHOLDS con el formato "campo=umbral" (EWMA) o
+"campo=cusum:h:k", p. ej. "temperatura_a=1,presion_hPa=cusum:4:0.5".
+"""
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from app.db.sensor_schema import SENSOR_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Configuración (se puede sobrescribir mediante variables de entorno)
+CHANGE_DETECTION = os.getenv("CHANGE_DETECTION", "1").lower() not in ("0", "false", "no")
+CHANGE_EWMA_ALPHA = float(os.getenv("CHANGE_EWMA_ALPHA", "0.3"))
+CHANGE_MAX_STALENESS = float(os.getenv("CHANGE_MAX_STALENESS", "3600"))
+
+# Umbrales por defecto: campo de la lectura -> (método, umbral, holgura)
+DEFAULT_THRESHOLDS: Dict[str, Tuple[str, float, float]] = {
+    "temperatura_a": ("ewma", 1.5, 0.0),
+    "presion_hPa": ("cusum", 4.0, 0.5),
+    "lux": ("ewma", 200.0, 0.0),
+    "indice_uv": ("ewma", 1.0, 0.0),
+    "co2_ppm": ("ewma", 100.0, 0.0),
+    "humedad_pct": ("ewma", 10.0, 0.0),
+    "T2M": ("ewma", 1.5, 0.0),
+    "RH2M": ("ewma", 8.0, 0.0),
+    "PRECTOTCORR": ("cusum", 10.0, 1.0),
+    "WS10M": ("ewma", 2.0, 0.0),
+}
+
+
+def parse_thresholds(spec: Optional[str]) -> Dict[str, Tuple[str, float, float]]:
+    """
+    Leer los umbrales por campo.
+
+    Args:
+        spec: Texto con el formato "campo=umbral,campo=cusum:h:k"
+
+    Returns:
+        Umbrales por defecto con los indicados sustituidos (umbral 0 desactiva el campo)
+    """
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        field, value = (part.strip() for part in item.split("=", 1))
+        if field not in SENSOR_COLUMNS:
+            logger.warning("Campo desconocido en CHANGE_THRESHOLDS: %s", field)
+            continue
+        parts = value.split(":")
+        if parts[0] == "cusum":
+            thresholds[field] = ("cusum", float(parts[1]), float(parts[2]) if len(parts) > 2 else 0.0)
+        elif parts[0] == "ewma":
+            thresholds[field] = ("ewma", float(parts[1]), 0.0)
+        else:
+            thresholds[field] = ("ewma", float(parts[0]), 0.0)
+        if thresholds[field][1] <= 0:
+            del thresholds[field]
+    return thresholds
+
+
+class _FieldState:
+    """Estado del detector para una métrica."""
+
+    __slots__ = ("ewma", "value", "reference", "high", "low")
+
+    def __init__(self, value: float):
+        self.ewma = value
+        self.value = value
+        self.reference: Optional[float] = None
+        self.high = 0.0
+        self.low = 0.0
+
+
+class _SourceState:
+    """Estado del detector para un dispositivo o fuente."""
+
+    __slots__ = ("fields", "observed", "triggered", "last_analysis", "last_reason", "reference_id")
+
+    def __init__(self):
+        self.fields: Dict[str, _FieldState] = {}
+        self.observed = 0
+        self.triggered = 0
+        self.last_analysis: Optional[float] = None
+        self.last_reason: Optional[str] = None
+        # Lectura cuyo análisis es la referencia vigente
+        self.reference_id: Optional[int] = None
+
+
+def source_key(data: Dict[str, Any], source: Optional[str] = None) -> str:
+    """
+    Clave del estado del detector para una lectura.
+
+    Args:
+        data: Lectura de sensores
+        source: Fuente de la lectura (URL consultada, cliente que la envía...)
+
+    Returns:
+        Dispositivo de la lectura, la fuente si no lo indica, o "default"
+    """
+    device = data.get("dispositivo") if isinstance(data, dict) else None
+    return str(device or source or "default")
+
+
+class ChangeDetector:
+    """Detector de cambios por métrica con EWMA o CUSUM y límite de antigüedad."""
+
+    def __init__(
+        self,
+        thresholds: Optional[Dict[str, Tuple[str, float, float]]] = None,
+        alpha: Optional[float] = None,
+        max_staleness: Optional[float] = None,
+        enabled: Optional[bool] = None,
+    ):
+        """
+        Inicializar el detector.
+
+        Args:
+            thresholds: Método, umbral y holgura por campo (por defecto, CHANGE_THRESHOLDS)
+            alpha: Peso de la lectura nueva en la media móvil exponencial
+            max_staleness: Segundos máximos sin análisis (0 = sin límite)
+            enabled: Si es False, todas las lecturas disparan un análisis
+        """
+        self.thresholds = thresholds if thresholds is not None else parse_thresholds(os.getenv("CHANGE_THRESHOLDS"))
+        self.alpha = alpha if alpha is not None else CHANGE_EWMA_ALPHA
+        self.max_staleness = max_staleness if max_staleness is not None else CHANGE_MAX_STALENESS
+        self.enabled = enabled if enabled is not None else CHANGE_DETECTION
+        self._sources: Dict[str, _SourceState] = {}
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        data: Dict[str, Any],
+        now: Optional[float] = None,
+        source: Optional[str] = None,
+        data_id: Optional[int] = None,
+        force: bool = False,
+    ) -> Optional[str]:
+        """
+        Incorporar una lectura y decidir si hay que analizarla.
+
+        Si se dispara, la lectura pasa a ser la referencia del siguiente
+        análisis de su dispositivo o fuente, así que cada cambio dispara un
+        único análisis.
+
+        Args:
+            data: Lectura de sensores
+            now: Instante de la lectura (por defecto, el actual)
+            source: Fuente de la lectura, si ésta no indica su dispositivo
+            data_id: ID de la lectura guardada (ver reference_id)
+            force: Analizar la lectura aunque no haya cambios
+
+        Returns:
+            Motivo del análisis, o None si las condiciones no han cambiado
+        """
+        now = now if now is not None else time.time()
+        key = source_key(data, source)
+        with self._lock:
+            state = self._sources.get(key)
+            if state is None:
+                state = self._sources[key] = _SourceState()
+            state.observed += 1
+            reasons = []
+            for field, (method, threshold, slack) in self.thresholds.items():
+                group, name = SENSOR_COLUMNS[field]
+                values = data.get(group) if isinstance(data, dict) else None
+                value = values.get(name) if isinstance(values, dict) else None
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    continue
+                field_state = state.fields.get(field)
+                if field_state is None:
+                    field_state = state.fields[field] = _FieldState(float(value))
+                else:
+                    field_state.ewma += self.alpha * (value - field_state.ewma)
+                    field_state.value = value
+                if field_state.reference is None:
+                    continue
+                if method == "cusum":
+                    field_state.high = max(0.0, field_state.high + value - field_state.reference - slack)
+                    field_state.low = max(0.0, field_state.low + field_state.reference - value - slack)
+                    if max(field_state.high, field_state.low) > threshold:
+                        reasons.append(f"{field} (CUSUM {max(field_state.high, field_state.low):.2f} > {threshold:g})")
+                elif abs(field_state.ewma - field_state.reference) > threshold:
+                    reasons.append(f"{field} ({field_state.reference:g} -> {field_state.ewma:.2f})")
+
+            if not self.enabled:
+                reasons.append("detección de cambios desactivada")
+            elif state.last_analysis is None:
+                reasons.append("sin análisis previo")
+            elif self.max_staleness and now - state.last_analysis >= self.max_staleness:
+                reasons.append(f"último análisis hace {now - state.last_analysis:.0f} s")
+            if force and not reasons:
+                reasons.append("análisis forzado")
+            if not reasons:
+                return None
+            return self._set_reference(state, now, ", ".join(reasons), data_id)
+
+    def reset_reference(
+        self,
+        data: Dict[str, Any],
+        reason: str,
+        now: Optional[float] = None,
+        source: Optional[str] = None,
+        data_id: Optional[int] = None,
+    ) -> str:
+        """
+        Tomar como referencia la última lectura observada sin volver a incorporarla.
+
+        Sirve cuando el análisis de la referencia vigente no existe o falló y
+        hay que analizar la lectura que acaba de pasar por observe().
+
+        Args:
+            data: Lectura de sensores (sólo se usa para identificar su dispositivo)
+            reason: Motivo del análisis
+            now: Instante de la lectura (por defecto, el actual)
+            source: Fuente de la lectura, igual que en observe()
+            data_id: ID de la lectura que pasa a ser la referencia
+
+        Returns:
+            Motivo del análisis
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            state = self._sources.setdefault(source_key(data, source), _SourceState())
+            return self._set_reference(state, now, reason, data_id)
+
+    @staticmethod
+    def _set_reference(state: _SourceState, now: float, reason: str, data_id: Optional[int]) -> str:
+        """Fijar como referencia los valores de la lectura que se va a analizar."""
+        for field_state in state.fields.values():
+            field_state.reference = field_state.value
+            field_state.high = field_state.low = 0.0
+        state.triggered += 1
+        state.last_analysis = now
+        state.last_reason = reason
+        state.reference_id = data_id
+        return reason
+
+    def reference_id(self, data: Dict[str, Any], source: Optional[str] = None) -> Optional[int]:
+        """
+        ID de la lectura que fijó la referencia vigente del dispositivo o fuente.
+
+        Cuando observe() devuelve None, el análisis vigente para esa lectura
+        es el de esta lectura de referencia.
+
+        Args:
+            data: Lectura de sensores
+            source: Fuente de la lectura, igual que en observe()
+
+        Returns:
+            ID de la lectura de referencia o None si no se conoce
+        """
+        with self._lock:
+            state = self._sources.get(source_key(data, source))
+            return state.reference_id if state else None
+
+    def status(self) -> Dict[str, Any]:
+        """Estado del detector para el endpoint de consulta."""
+        with self._lock:
+            sources = {
+                key: {
+                    "observed": state.observed,
+                    "triggered": state.triggered,
+                    "last_analysis": state.last_analysis,
+                    "last_reason": state.last_reason,
+                    "reference_id": state.reference_id,
+                    "fields": {
+                        field: {
+                            "ewma": round(state.fields[field].ewma, 3),
+                            "reference": state.fields[field].reference,
+                        }
+                        for field in self.thresholds
+                        if field in state.fields
+                    },
+                }
+                for key, state in self._sources.items()
+            }
+            latest = max(self._sources.values(), key=lambda state: state.last_analysis or 0, default=None)
+            return {
+                "enabled": self.enabled,
+                "observed": sum(state.observed for state in self._sources.values()),
+                "triggered": sum(state.triggered for state in self._sources.values()),
+                "last_analysis": latest.last_analysis if latest else None,
+                "last_reason": latest.last_reason if latest else None,
+                "max_staleness": self.max_staleness,
+                "thresholds": {
+                    field: {"method": method, "threshold": threshold}
+                    for field, (method, threshold, _) in self.thresholds.items()
+                },
+                "sources": sources,
+            }
@@ -0,0 +1,104 @@
+"""
+Métricas de las generaciones de Ollama.
+
+Cada respuesta de Ollama (y el último fragmento de un stream) trae las
+duraciones en nanosegundos de la carga del modelo (load_duration), del
+procesado del prompt (prompt_eval_duration, el "prefill") y de la
+generación de tokens (eval_duration). Aquí se acumulan por modelo para ver
+cuánto tiempo se va en cada fase y si el prefijo del prompt se está
+reutilizando (pocos tokens de prompt evaluados y prefill corto). Las
+mismas duraciones alimentan los histogramas de GET /metrics.
+"""
+import threading
+from typing import Any, Dict
+
+from app.utils.metrics import record_generation
+
+# Campos de Ollama que se acumulan (las duraciones vienen en nanosegundos)
+_COUNT_FIELDS = ("prompt_eval_count", "eval_count")
+_DURATION_FIELDS = ("load_duration", "prompt_eval_duration", "eval_duration", "total_duration")
+
+# Con el modelo ya residente, load_duration es de pocos milisegundos; por
+# encima de este umbral se cuenta como una carga del modelo en memoria
+_LOAD_THRESHOLD_NS = 5e8
+
+
+def _ms(nanoseconds: float) -> float:
+    return round(nanoseconds / 1e6, 1)
+
+
+class GenerationMetrics:
+    """Acumulador de tiempos de prefill y generación por modelo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, model: str, result: Dict[str, Any]) -> None:
+        """
+        Registrar las estadísticas de una generación terminada.
+
+        Args:
+            model: Modelo que generó la respuesta
+            result: Respuesta final de Ollama (la que lleva "done": true)
+        """
+        if "eval_count" not in result and "prompt_eval_duration" not in result:
+            return
+        record_generation(model, result)
+        with self._lock:
+            totals = self._models.setdefault(model, {
+                "generaciones": 0,
+                "cargas_modelo": 0,
+                **{field: 0 for field in _COUNT_FIELDS + _DURATION_FIELDS},
+            })
+            totals["generaciones"] += 1
+            if (result.get("load_duration") or 0) > _LOAD_THRESHOLD_NS:
+                totals["cargas_modelo"] += 1
+            for field in _COUNT_FIELDS + _DURATION_FIELDS:
+                totals[field] += result.get(field) or 0
+            totals["ultima"] = {field: result.get(field) for field in _COUNT_FIELDS + _DURATION_FIELDS}
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Resumen de las métricas por modelo.
+
+        Returns:
+            Medias de prefill y generación, tokens por segundo y la última generación de cada modelo
+        """
+        with self._lock:
+            summary = {}
+            for model, totals in self._models.items():
+                n = totals["generaciones"]
+                prefill = totals["prompt_eval_duration"]
+                generation = totals["eval_duration"]
+                last = totals["ultima"]
+                summary[model] = {
+                    "generaciones": n,
+                    "cargas_modelo": totals["cargas_modelo"],
+                    "prefill_ms_medio": _ms(prefill / n),
+                    "generacion_ms_medio": _ms(generation / n),
+                    "carga_ms_medio": _ms(totals["load_duration"] / n),
+                    "total_ms_medio": _ms(totals["total_duration"] / n),
+                    "tokens_prompt_medio": round(totals["prompt_eval_count"] / n, 1),
+                    "tokens_generados_medio": round(totals["eval_count"] / n, 1),
+                    "prefill_tokens_s": round(totals["prompt_eval_count"] / (prefill / 1e9), 1) if prefill else None,
+                    "generacion_tokens_s": round(totals["eval_count"] / (generation / 1e9), 1) if generation else None,
+                    "fraccion_prefill": round(prefill / (prefill + generation), 3) if prefill + generation else None,
+                    "ultima": {
+                        "tokens_prompt": last["prompt_eval_count"],
+                        "tokens_generados": last["eval_count"],
+                        "prefill_ms": _ms(last["prompt_eval_duration"] or 0),
+                        "generacion_ms": _ms(last["eval_duration"] or 0),
+                        "carga_ms": _ms(last["load_duration"] or 0),
+                    },
+                }
+            return summary
+
+    def reset(self) -> None:
+        """Borrar las métricas acumuladas."""
+        with self._lock:
+            self._models.clear()
+
+
+# Métricas compartidas por todos los clientes de Ollama del proceso
+generation_metrics = GenerationMetrics()
@@ -0,0 +1,341 @@
+"""
+Cola de trabajos de análisis con IA en segundo plano.
+
+/procesar-datos sólo guarda la lectura y encola un trabajo; un pool de
+workers asíncronos (dimensionado según lo que el host de Ollama puede
+atender) toma los trabajos de la tabla analysis_jobs, genera el análisis
+y lo guarda en analysis_results. Si hay una caché de análisis, las
+lecturas equivalentes a una ya analizada reutilizan su texto, y los
+trabajos simultáneos con el mismo modelo y prompt comparten una única
+generación; cada lectura recibe su propia fila de analysis_results con
+el texto compartido. Por defecto hay ANALYSIS_WORKERS=4 workers (el
+número de peticiones simultáneas que Ollama atiende por modelo por
+defecto); con un solo worker los trabajos nunca coinciden y no hay nada
+que compartir. Como la cola vive en SQLite, los trabajos pendientes
+sobreviven a un reinicio de la API.
+
+Análisis por lotes: los trabajos de un lote (enqueue_batch) y, si
+ANALYSIS_BATCH_WINDOW_MS > 0, los que llegan dentro de esa ventana se
+analizan juntos en un único prompt de hasta ANALYSIS_BATCH_SIZE lecturas;
+la respuesta se separa en un informe (y una fila de analysis_results) por
+lectura. Si el modelo omite alguna, ésta se analiza por separado. Los
+informes de un lote son más breves que un análisis individual, así que se
+guardan en la caché con la plantilla de lotes como espacio de claves y no
+se sirven a /procesar-datos.
+"""
+import os
+import uuid
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.db.manager import DBManager
+from app.ai.ollama_client import OllamaClient
+from app.ai.analysis_cache import AnalysisCache
+from app.ai.single_flight import SingleFlight
+from app.ai.batch_analysis import split_batch_response
+from app.utils.prompt_generator import build_data_resumen, generate_batch_prompt, prompt_from_resumen
+from app.utils.prompt_templates import get_template
+
+logger = logging.getLogger(__name__)
+
+# Configuración (se puede sobrescribir mediante variables de entorno)
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+ANALYSIS_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "3"))
+ANALYSIS_POLL_SECONDS = float(os.getenv("ANALYSIS_POLL_SECONDS", "5"))
+ANALYSIS_BATCH_SIZE = int(os.getenv("ANALYSIS_BATCH_SIZE", "4"))
+ANALYSIS_BATCH_WINDOW_MS = int(os.getenv("ANALYSIS_BATCH_WINDOW_MS", "0"))
+
+
+class AnalysisJobQueue:
+    """Pool de workers que procesa los trabajos de análisis persistidos en SQLite."""
+
+    def __init__(
+        self,
+        db: DBManager,
+        ollama_client: OllamaClient,
+        workers: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        poll_seconds: Optional[float] = None,
+        cache: Optional[AnalysisCache] = None,
+        batch_size: Optional[int] = None,
+        batch_window_ms: Optional[int] = None,
+    ):
+        """
+        Inicializar la cola de trabajos.
+
+        Args:
+            db: Gestor de base de datos
+            ollama_client: Cliente de Ollama
+            workers: Número de análisis simultáneos
+            max_attempts: Intentos máximos por trabajo (incluye reinicios)
+            poll_seconds: Intervalo máximo entre revisiones de la cola
+            cache: Caché de análisis opcional
+            batch_size: Lecturas máximas por prompt en el análisis por lotes
+            batch_window_ms: Ventana para agrupar trabajos sueltos (0 = no agrupar)
+        """
+        self.db = db
+        self.ollama_client = ollama_client
+        self.workers = max(1, workers or ANALYSIS_WORKERS)
+        self.max_attempts = max_attempts or ANALYSIS_MAX_ATTEMPTS
+        self.poll_seconds = poll_seconds if poll_seconds is not None else ANALYSIS_POLL_SECONDS
+        self.cache = cache
+        self.flights = SingleFlight()
+        self.batch_size = max(1, batch_size or ANALYSIS_BATCH_SIZE)
+        self.batch_window = (batch_window_ms if batch_window_ms is not None else ANALYSIS_BATCH_WINDOW_MS) / 1000
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Reencolar trabajos interrumpidos y arrancar los workers."""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        await run_in_threadpool(self.db.requeue_interrupted_jobs, self.max_attempts)
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"analysis-worker-{n}")
+            for n in range(self.workers)
+        ]
+        logger.info("Cola de análisis iniciada con %s workers", self.workers)
+
+    async def stop(self) -> None:
+        """
+        Detener los workers.
+
+        Los trabajos en curso quedan en estado 'running' y se reencolan al
+        siguiente arranque.
+        """
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info("Cola de análisis detenida")
+
+    async def enqueue(self, data_id: int, model: Optional[str] = None) -> int:
+        """
+        Encolar el análisis de un registro de sensores.
+
+        Args:
+            data_id: ID de los datos a analizar
+            model: Modelo a usar (por defecto, el modelo activo)
+
+        Returns:
+            ID del trabajo
+        """
+        job_id = await run_in_threadpool(self.db.create_job, data_id, model or self.ollama_client.model)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def enqueue_batch(self, data_ids: List[int], model: Optional[str] = None) -> Tuple[str, List[int]]:
+        """
+        Encolar el análisis conjunto de varias lecturas.
+
+        Args:
+            data_ids: IDs de los datos a analizar
+            model: Modelo a usar (por defecto, el modelo activo)
+
+        Returns:
+            ID del lote e IDs de los trabajos (uno por lectura)
+        """
+        batch_id = uuid.uuid4().hex
+        job_ids = await run_in_threadpool(
+            self.db.create_jobs, data_ids, model or self.ollama_client.model, batch_id
+        )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return batch_id, job_ids
+
+    async def _worker(self, number: int) -> None:
+        """Bucle de un worker: tomar trabajos mientras haya y esperar si no."""
+        while True:
+            try:
+                job = await run_in_threadpool(self.db.claim_next_job)
+            except Exception as e:
+                logger.error("Worker %s: error al leer la cola: %s", number, e)
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            jobs = await self._gather_batch(job)
+            if len(jobs) == 1:
+                await self._process(job)
+            else:
+                await self._process_batch(jobs)
+
+    async def _gather_batch(self, job: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Tomar los trabajos que se analizarán junto con el primero."""
+        if self.batch_size <= 1:
+            return [job]
+        try:
+            if job["batch_id"] is None:
+                if self.batch_window <= 0:
+                    return [job]
+                # Esperar a que lleguen más lecturas dentro de la ventana
+                await asyncio.sleep(self.batch_window)
+            more = await run_in_threadpool(
+                self.db.claim_jobs, job["model"], self.batch_size - 1, job["batch_id"]
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Error al agrupar trabajos de análisis: %s", e)
+            more = []
+        return [job] + more
+
+    async def _process(self, job) -> None:
+        """Ejecutar un trabajo: lectura -> prompt -> Ollama -> guardar resultado."""
+        logger.info("Procesando trabajo de análisis %s (datos: %s, modelo: %s)", job['id'], job['data_id'], job['model'])
+        try:
+            data_resumen = await self._load_resumen(job)
+            await self._process_single(job, data_resumen)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._fail(job, e)
+
+    async def _process_single(self, job, data_resumen, check_cache: bool = True) -> None:
+        """Analizar una lectura por separado y cerrar su trabajo."""
+        try:
+            prompt = prompt_from_resumen(data_resumen, model=job["model"])
+            # Trabajos simultáneos con el mismo modelo y prompt esperan a una sola generación
+            data_id, response_id, response = await self.flights.do(
+                (job["model"], prompt),
+                lambda: self._analyze(job["data_id"], data_resumen, prompt, job["model"], check_cache)
+            )
+            if data_id != job["data_id"]:
+                # La generación compartida se guardó para otra lectura: ésta recibe su propia fila
+                response_id = await run_in_threadpool(self.db.save_analysis_result, job["data_id"], response)
+            await run_in_threadpool(self.db.finish_job, job["id"], response_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._fail(job, e)
+
+    async def _process_batch(self, jobs: List[Dict[str, Any]]) -> None:
+        """Analizar varias lecturas con un único prompt y guardar un informe por lectura."""
+        model = jobs[0]["model"]
+        try:
+            # Los informes por lote tienen su propio espacio de claves en la caché
+            namespace = get_template("analisis_lote", model).name
+        except Exception as e:
+            for job in jobs:
+                await self._fail(job, e)
+            return
+        pending = []
+        for job in jobs:
+            try:
+                data_resumen = await self._load_resumen(job)
+                cached = await self._cache_get(model, data_resumen, namespace)
+                if cached is not None:
+                    await self._finish(job, cached)
+                else:
+                    pending.append((job, data_resumen))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._fail(job, e)
+
+        if len(pending) <= 1:
+            for job, data_resumen in pending:
+                await self._process_single(job, data_resumen, check_cache=False)
+            return
+
+        logger.info("Análisis por lotes de %s lecturas (modelo: %s)", len(pending), model)
+        try:
+            prompt = generate_batch_prompt(
+                [(job["data_id"], data_resumen) for job, data_resumen in pending], model=model
+            )
+            response = await self.ollama_client.get_response_async(prompt, model=model)
+            sections = split_batch_response(response, [job["data_id"] for job, _ in pending])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            for job, _ in pending:
+                await self._fail(job, e)
+            return
+
+        for job, data_resumen in pending:
+            section = sections.get(job["data_id"])
+            if section is None:
+                # El modelo omitió esta lectura: se analiza por separado
+                await self._process_single(job, data_resumen, check_cache=False)
+                continue
+            try:
+                await self._cache_put(model, data_resumen, section, namespace)
+                await self._finish(job, section)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._fail(job, e)
+
+    async def _load_resumen(self, job) -> Dict[str, Any]:
+        """Leer la lectura de un trabajo y reducirla al resumen del prompt."""
+        data = await run_in_threadpool(self.db.get_sensor_reading, job["data_id"])
+        if data is None:
+            raise Exception(f"No existen datos de sensores con ID {job['data_id']}")
+        return build_data_resumen(data)
+
+    async def _finish(self, job, response: str) -> None:
+        """Guardar el análisis de un trabajo y marcarlo como terminado."""
+        response_id = await run_in_threadpool(self.db.save_analysis_result, job["data_id"], response)
+        await run_in_threadpool(self.db.finish_job, job["id"], response_id)
+
+    async def _fail(self, job, error: Exception) -> None:
+        """Marcar un trabajo como fallido."""
+        logger.error("Error en el trabajo de análisis %s: %s", job['id'], error)
+        try:
+            await run_in_threadpool(self.db.finish_job, job["id"], None, str(error))
+        except Exception:
+            pass
+
+    async def _analyze(
+        self,
+        data_id: int,
+        data_resumen,
+        prompt: str,
+        model: str,
+        check_cache: bool = True
+    ) -> Tuple[int, int, str]:
+        """
+        Obtener el análisis (de la caché o de Ollama) y guardarlo para una lectura.
+
+        Returns:
+            ID de la lectura, ID del análisis guardado y texto del análisis
+        """
+        response = await self._cache_get(model, data_resumen) if check_cache else None
+        if response is None:
+            response = await self.ollama_client.get_response_async(prompt, model=model)
+            await self._cache_put(model, data_resumen, response)
+        response_id = await run_in_threadpool(self.db.save_analysis_result, data_id, response)
+        return data_id, response_id, response
+
+    async def _cache_get(self, model: str, data_resumen, namespace: Optional[str] = None) -> Optional[str]:
+        """Buscar un análisis en la caché; un fallo de la caché cuenta como ausencia."""
+        if self.cache is None:
+            return None
+        try:
+            cached = await run_in_threadpool(self.cache.get, model, data_resumen, namespace)
+        except Exception as e:
+            logger.warning("No se pudo consultar la caché de análisis: %s", e)
+            return None
+        if cached is not None:
+            logger.info("Análisis obtenido de la caché (modelo: %s)", model)
+        return cached
+
+    async def _cache_put(self, model: str, data_resumen, response: str, namespace: Optional[str] = None) -> None:
+        """Guardar un análisis en la caché sin que un fallo afecte al trabajo."""
+        if self.cache is None:
+            return
+        try:
+            await run_in_threadpool(self.cache.put, model, data_resumen, response, namespace)
+        except Exception as e:
+            logger.warning("No se pudo guardar el análisis en la caché: %s", e)
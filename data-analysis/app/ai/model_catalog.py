@@ -0,0 +1,167 @@
+"""
+Catálogo de modelos de Ollama en memoria.
+
+Listar modelos y validar un cambio de modelo no consultan a Ollama en cada
+petición: una tarea en segundo plano refresca el catálogo (/api/tags y los
+detalles de /api/show) cada MODEL_CATALOG_TTL segundos y las rutas lo leen
+de memoria. Si un refresco falla, se sigue sirviendo el último catálogo
+conocido, de modo que el listado funciona aunque Ollama esté ocupado
+generando o no responda.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from app.ai.ollama_client import OllamaClient
+
+logger = logging.getLogger(__name__)
+
+# Configuración (se puede sobrescribir mediante variables de entorno)
+MODEL_CATALOG_TTL = float(os.getenv("MODEL_CATALOG_TTL", "60"))
+
+# Campos de /api/show que se guardan (se omiten modelfile, template y licencia)
+SHOW_FIELDS = ("details", "parameters", "capabilities", "model_info")
+
+
+class ModelCatalog:
+    """Catálogo de modelos con refresco periódico en segundo plano."""
+
+    def __init__(self, ollama_client: OllamaClient, ttl: Optional[float] = None):
+        """
+        Inicializar el catálogo.
+
+        Args:
+            ollama_client: Cliente de Ollama
+            ttl: Segundos entre refrescos del catálogo
+        """
+        self.ollama_client = ollama_client
+        self.ttl = ttl if ttl is not None else MODEL_CATALOG_TTL
+        self.last_error: Optional[str] = None
+        self._models: Dict[str, Dict[str, Any]] = {}
+        # Modelos cuyos detalles fallaron en el último refresco
+        self._failed: Set[str] = set()
+        self._loaded_at: Optional[float] = None
+        self._refresh_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        """Indica si el catálogo se ha cargado al menos una vez."""
+        return self._loaded_at is not None
+
+    @property
+    def age(self) -> Optional[float]:
+        """Segundos desde el último refresco correcto."""
+        return None if self._loaded_at is None else time.monotonic() - self._loaded_at
+
+    def _details(self, name: str) -> Dict[str, Any]:
+        """Obtener los detalles relevantes de un modelo desde /api/show."""
+        info = self.ollama_client.get_model_info(name)
+        return {field: info[field] for field in SHOW_FIELDS if field in info}
+
+    def refresh(self) -> List[str]:
+        """
+        Refrescar el catálogo desde Ollama.
+
+        Los detalles sólo se piden para los modelos que no estaban ya en el
+        catálogo o cuyos detalles fallaron en el refresco anterior. Si
+        /api/show falla para un modelo, éste se incluye con los detalles que
+        hubiera (o vacíos), se anota en last_error y se reintenta en el
+        siguiente refresco; el resto del catálogo se actualiza igualmente.
+
+        Returns:
+            Nombres de los modelos disponibles
+        """
+        with self._refresh_lock:
+            try:
+                names = self.ollama_client.get_models()
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            current = self._models
+            models: Dict[str, Dict[str, Any]] = {}
+            failed: Dict[str, str] = {}
+            for name in names:
+                if name in current and name not in self._failed:
+                    models[name] = current[name]
+                    continue
+                try:
+                    models[name] = self._details(name)
+                except Exception as e:
+                    logger.warning("No se pudieron obtener los detalles del modelo %s: %s", name, e)
+                    models[name] = current.get(name, {})
+                    failed[name] = str(e)
+            self._models = models
+            self._failed = set(failed)
+            self._loaded_at = time.monotonic()
+            self.last_error = "; ".join(f"{name}: {error}" for name, error in failed.items()) or None
+            logger.info("Catálogo de modelos actualizado (%s modelos)", len(models))
+            return names
+
+    def models(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtener el catálogo (nombre -> detalles).
+
+        Sólo se consulta a Ollama si el catálogo no se ha cargado nunca.
+
+        Returns:
+            Detalles de cada modelo disponible
+        """
+        if not self.loaded:
+            self.refresh()
+        return self._models
+
+    def has_model(self, name: str) -> bool:
+        """
+        Comprobar si un modelo está disponible.
+
+        Si no está en el catálogo se refresca una vez, por si se acaba de
+        descargar.
+
+        Args:
+            name: Nombre del modelo
+
+        Returns:
+            True si el modelo existe en Ollama
+        """
+        if name in self.models():
+            return True
+        return name in self.refresh()
+
+    async def start(self) -> None:
+        """Arrancar el refresco periódico en segundo plano."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop(), name="model-catalog")
+
+    async def stop(self) -> None:
+        """Detener el refresco periódico."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _refresh_loop(self) -> None:
+        """Refrescar el catálogo cada ttl segundos."""
+        while True:
+            first_load = not self.loaded
+            try:
+                names = await run_in_threadpool(self.refresh)
+                if first_load:
+                    self._check_active_model(names)
+            except Exception as e:
+                logger.warning("No se pudo refrescar el catálogo de modelos: %s", e)
+            await asyncio.sleep(self.ttl)
+
+    def _check_active_model(self, names: List[str]) -> None:
+        """Avisar si el modelo activo no está descargado en Ollama."""
+        model = self.ollama_client.model
+        if model in names:
+            logger.info("Modelo %s encontrado en la lista de modelos", model)
+        else:
+            logger.info("Modelo %s no encontrado. Por favor, descárgalo manualmente.", model)
+            logger.info("Puede usar: 'ollama pull %s' en la máquina host", model)
@@ -5,11 +5,26 @@ import os
 import time
 import json
 import logging
-import requests
-from typing import Dict, Any, List, Optional
+import httpx
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+
+from app.ai.ollama_transport import OllamaTransportError
+from app.ai.ollama_router import OllamaRouter
+from app.ai.generation_metrics import generation_metrics
+from app.utils.metrics import generations_in_flight, stage, timed
+from app.utils.prompt_templates import split_prompt
 
 logger = logging.getLogger(__name__)
 
+# Configuración (se puede sobrescribir mediante variables de entorno)
+# Tiempo que Ollama mantiene el modelo cargado tras una petición ("-1" = siempre)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# "chat": el texto fijo de la plantilla va como mensaje de sistema y los datos
+# como mensaje de usuario (/api/chat); "generate": prompt completo (/api/generate)
+OLLAMA_PROMPT_MODE = os.getenv("OLLAMA_PROMPT_MODE", "chat")
+# Tamaño de contexto fijo; si cambia entre peticiones, Ollama recarga el modelo
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "0"))
+
 class OllamaClientSingleton:
     """Implementación Singleton del cliente de Ollama para mantener estado entre llamadas"""
     
@@ -20,7 +35,8 @@ class OllamaClientSingleton:
             cls._instance = super(OllamaClientSingleton, cls).__new__(cls)
             # Inicialización al crear la instancia
             cls._instance._model = os.getenv("OLLAMA_MODEL", "gemma3:4b")
-            cls._instance._base_url = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+            # Hosts de Ollama (OLLAMA_HOSTS o OLLAMA_HOST) con reparto de carga
+            cls._instance._router = OllamaRouter()
         return cls._instance
 
 class OllamaClient:
@@ -37,82 +53,195 @@ class OllamaClient:
     def model(self, value: str) -> None:
         """Establecer el modelo actual y guardarlo"""
         self._singleton._model = value
-        logger.info(f"Modelo cambiado a {value}")
+        logger.info("Modelo cambiado a %s", value)
+    
+    @property
+    def router(self) -> OllamaRouter:
+        """Enrutador compartido entre los hosts de Ollama"""
+        return self._singleton._router
     
-    def get_response(self, prompt: str) -> str:
+    @timed("ollama")
+    def get_response(self, prompt: str, model: Optional[str] = None) -> str:
         """
         Obtener respuesta de Ollama para un prompt dado
         
         Args:
             prompt: Texto del prompt para el modelo
+            model: Modelo a usar (por defecto, el modelo activo)
             
         Returns:
             Respuesta generada por el modelo
         """
         try:
-            url = f"{self._singleton._base_url}/api/generate"
-            
-            # Datos de la solicitud
-            data = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False
-            }
+            model, path, data = self._prepare(prompt, model)
+            with generations_in_flight.track(model):
+                response = self.router.call(
+                    model, lambda transport: transport.request("POST", path, "generate", json=data)
+                )
+            return self._handle_response(model, response)
+        except Exception as e:
+            raise self._response_error(e)
+    
+    @timed("ollama")
+    async def get_response_async(self, prompt: str, model: Optional[str] = None) -> str:
+        """
+        Obtener respuesta de Ollama sin bloquear el event loop
+        
+        Usa el cliente HTTP asíncrono compartido, de modo que varias
+        generaciones concurrentes se solapan en lugar de serializarse.
+        
+        Args:
+            prompt: Texto del prompt para el modelo
+            model: Modelo a usar (por defecto, el modelo activo)
             
-            logger.info(f"Enviando prompt a Ollama (modelo: {self.model})")
+        Returns:
+            Respuesta generada por el modelo
+        """
+        try:
+            model, path, data = self._prepare(prompt, model)
+            with generations_in_flight.track(model):
+                response = await self.router.call_async(
+                    model, lambda transport: transport.request_async("POST", path, "generate", json=data)
+                )
+            return self._handle_response(model, response)
+        except Exception as e:
+            raise self._response_error(e)
+    
+    def _prepare(self, prompt: str, model: Optional[str]) -> Tuple[str, str, Dict[str, Any]]:
+        """
+        Preparar una generación sin streaming (común a la versión síncrona y la asíncrona).
+        
+        Args:
+            prompt: Texto del prompt
+            model: Modelo pedido (por defecto, el modelo activo)
             
-            # Realizar solicitud a Ollama
-            response = requests.post(url, json=data, timeout=120)  # Timeout extendido para modelos grandes
-            response.raise_for_status()
+        Returns:
+            Modelo, ruta de la API de Ollama y cuerpo de la petición
+        """
+        model = model or self.model
+        path, data = self._build_request(prompt, model, stream=False)
+        logger.info("Enviando prompt a Ollama (modelo: %s)", model)
+        return model, path, data
+    
+    def _handle_response(self, model: str, response: httpx.Response) -> str:
+        """Comprobar el estado HTTP de una generación y extraer su texto."""
+        response.raise_for_status()
+        return self._parse_generate(model, response.json())
+    
+    @staticmethod
+    def _response_error(error: Exception) -> Exception:
+        """Traducir un fallo de una generación al error que ven los llamantes."""
+        if isinstance(error, (OllamaTransportError, httpx.HTTPError)):
+            logger.error("Error al comunicarse con Ollama: %s", error)
+            return Exception(f"Error de comunicación con Ollama: {str(error)}")
+        logger.error("Error al obtener respuesta de Ollama: %s", error)
+        return Exception(f"Error al procesar respuesta de Ollama: {str(error)}")
+    
+    def _build_request(self, prompt: str, model: str, stream: bool) -> Tuple[str, Dict[str, Any]]:
+        """
+        Preparar la petición de una generación.
+        
+        En modo "chat", el texto fijo de la plantilla se envía como mensaje de
+        sistema y sólo los datos como mensaje de usuario: el prefijo tokenizado
+        es idéntico en todas las peticiones y, con el modelo residente
+        (keep_alive), Ollama reutiliza su estado ya procesado y sólo evalúa
+        los tokens nuevos.
+        
+        Args:
+            prompt: Texto del prompt
+            model: Modelo a usar
+            stream: Si la respuesta se recibe por fragmentos
             
-            result = response.json()
+        Returns:
+            Ruta de la API de Ollama y cuerpo de la petición
+        """
+        data: Dict[str, Any] = {"model": model, "stream": stream, "keep_alive": OLLAMA_KEEP_ALIVE}
+        if OLLAMA_NUM_CTX > 0:
+            data["options"] = {"num_ctx": OLLAMA_NUM_CTX}
+        system, user = split_prompt(prompt) if OLLAMA_PROMPT_MODE == "chat" else ("", prompt)
+        if not system:
+            data["prompt"] = prompt
+            return "/api/generate", data
+        data["messages"] = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ]
+        return "/api/chat", data
+    
+    @staticmethod
+    def _as_generate(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """Pasar una respuesta de /api/chat al formato de /api/generate ("response")."""
+        if "message" in chunk and "response" not in chunk:
+            chunk = dict(chunk)
+            chunk["response"] = chunk.pop("message").get("content", "")
+        return chunk
+    
+    def _parse_generate(self, model: str, result: Dict[str, Any]) -> str:
+        """Extraer el texto de una respuesta de /api/generate o /api/chat"""
+        result = self._as_generate(result)
+        generation_metrics.record(model, result)
+        if 'response' in result:
+            logger.info("Respuesta recibida de Ollama (%s caracteres)", len(result['response']))
+            return result['response']
+        logger.error("Respuesta de Ollama no contiene campo 'response' (campos: %s)", sorted(result))
+        return "Error: Respuesta inesperada del modelo."
+    
+    async def stream_response(self, prompt: str, model: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Obtener la respuesta de Ollama token a token (NDJSON con "stream": true)
+        
+        Args:
+            prompt: Texto del prompt para el modelo
+            model: Modelo a usar (por defecto, el modelo activo)
             
-            if 'response' in result:
-                logger.info(f"Respuesta recibida de Ollama ({len(result['response'])} caracteres)")
-                return result['response']
-            else:
-                logger.error(f"Respuesta de Ollama no contiene campo 'response': {result}")
-                return "Error: Respuesta inesperada del modelo."
-                
-        except requests.RequestException as e:
-            logger.error(f"Error al comunicarse con Ollama: {str(e)}")
+        Yields:
+            Fragmentos de Ollama; cada uno trae el texto nuevo en "response" y
+            el último lleva "done": true junto con las estadísticas de la generación
+        """
+        model = model or self.model
+        path, data = self._build_request(prompt, model, stream=True)
+        
+        logger.info("Enviando prompt a Ollama en modo streaming (modelo: %s)", model)
+        try:
+            # El host queda reservado mientras dura el stream
+            with stage("ollama", "stream_response"), generations_in_flight.track(model), \
+                    self.router.acquire(model) as backend:
+                async for line in backend.transport.stream_lines(path, data):
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise Exception(chunk["error"])
+                    chunk = self._as_generate(chunk)
+                    if chunk.get("done"):
+                        generation_metrics.record(model, chunk)
+                    yield chunk
+                    if chunk.get("done"):
+                        return
+        except OllamaTransportError as e:
+            logger.error("Error al comunicarse con Ollama: %s", e)
             raise Exception(f"Error de comunicación con Ollama: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error al obtener respuesta de Ollama: {str(e)}")
-            raise Exception(f"Error al procesar respuesta de Ollama: {str(e)}")
     
     def get_models(self) -> List[str]:
         """
         Obtener lista de modelos disponibles en Ollama
         
+        Con varios hosts, se devuelve la unión de los modelos de todos los
+        hosts disponibles.
+        
         Returns:
             Lista de nombres de modelos
         """
         try:
-            url = f"{self._singleton._base_url}/api/tags"
-            
             logger.info("Obteniendo lista de modelos de Ollama")
             
-            # Realizar solicitud a Ollama
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            if 'models' in result:
-                # Extraer sólo los nombres de los modelos
-                model_names = [model['name'] for model in result['models']]
-                logger.info(f"Modelos disponibles: {model_names}")
-                return model_names
-            else:
-                logger.error(f"Respuesta de Ollama no contiene campo 'models': {result}")
-                return []
+            model_names = self.router.model_names()
+            logger.info("Modelos disponibles: %s", model_names)
+            return model_names
                 
-        except requests.RequestException as e:
-            logger.error(f"Error al comunicarse con Ollama: {str(e)}")
+        except (OllamaTransportError, httpx.HTTPError) as e:
+            logger.error("Error al comunicarse con Ollama: %s", e)
             raise Exception(f"Error de comunicación con Ollama: {str(e)}")
         except Exception as e:
-            logger.error(f"Error al obtener lista de modelos: {str(e)}")
+            logger.error("Error al obtener lista de modelos: %s", e)
             raise Exception(f"Error al procesar lista de modelos: {str(e)}")
     
     def get_model_info(self, model_name: Optional[str] = None) -> Dict[str, Any]:
@@ -127,11 +256,10 @@ class OllamaClient:
         """
         model = model_name or self.model
         try:
-            response = requests.post(
-                f"{self._singleton._base_url}/api/show",
-                json={"name": model}
+            response = self.router.call(
+                model, lambda transport: transport.request("POST", "/api/show", "show", json={"name": model})
             )
             return response.json()
         except Exception as e:
-            logger.error(f"Error al obtener información del modelo {model}: {str(e)}")
-            return {} 
\ No newline at end of file
+            logger.error("Error al obtener información del modelo %s: %s", model, e)
+            return {}
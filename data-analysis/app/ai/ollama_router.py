@@ -0,0 +1,322 @@
+"""
+Enrutador de peticiones entre varios hosts de Ollama.
+
+Con OLLAMA_HOSTS="http://nodo1:11434,http://nodo2:11434" cada generación se
+envía al nodo sano con menos peticiones en curso que tenga el modelo
+pedido (a igualdad, al de menor latencia media). Una comprobación de salud
+periódica (/api/tags) actualiza los modelos de cada nodo y deja de enviar
+tráfico a los que no responden hasta que se recuperan; las peticiones que
+ya estaban en curso en ese nodo terminan normalmente.
+
+Si un nodo falla sin llegar a procesar una petición (fallo de conexión,
+circuito abierto o 502/503/504), ésta se reintenta en otro nodo. Una
+generación que sí llegó al nodo (p. ej. un timeout de lectura) no se
+reenvía: probablemente el primer nodo la sigue calculando. Las consultas
+idempotentes se reintentan en otro nodo ante cualquier fallo.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, TypeVar
+
+from starlette.concurrency import run_in_threadpool
+
+from app.ai.ollama_transport import CircuitOpenError, OllamaTransport, OllamaTransportError, get_transport
+
+logger = logging.getLogger(__name__)
+
+# Configuración (se puede sobrescribir mediante variables de entorno)
+OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "15"))
+
+# Peso de la última petición en la latencia media (media móvil exponencial)
+LATENCY_ALPHA = 0.3
+
+T = TypeVar("T")
+
+
+def configured_hosts() -> List[str]:
+    """
+    Obtener la lista de hosts de Ollama configurados.
+
+    Returns:
+        URLs de OLLAMA_HOSTS (separadas por comas) o, si no se indicó, OLLAMA_HOST
+    """
+    hosts = os.getenv("OLLAMA_HOSTS", "")
+    urls = [host.strip() for host in hosts.split(",") if host.strip()]
+    return urls or [os.getenv("OLLAMA_HOST", "http://localhost:11434")]
+
+
+class Backend:
+    """Estado de un host de Ollama."""
+
+    def __init__(self, transport: OllamaTransport):
+        """
+        Inicializar el estado del host.
+
+        Args:
+            transport: Transporte hacia el host
+        """
+        self.transport = transport
+        self.healthy = True
+        self.models: Optional[Set[str]] = None
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+        self.last_check: Optional[float] = None
+
+    @property
+    def url(self) -> str:
+        """URL base del host."""
+        return self.transport.base_url
+
+    @property
+    def available(self) -> bool:
+        """Indica si el host puede recibir peticiones nuevas."""
+        return self.healthy and self.transport.breaker.state != "open"
+
+    def serves(self, model: Optional[str]) -> bool:
+        """Indica si el host tiene el modelo (o si aún no se sabe qué modelos tiene)."""
+        return model is None or self.models is None or model in self.models
+
+    def status(self) -> Dict[str, Any]:
+        """Estado del host para diagnóstico."""
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "circuit": self.transport.breaker.state,
+            "in_flight": self.in_flight,
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "requests": self.requests,
+            "failures": self.failures,
+            "models": sorted(self.models) if self.models is not None else None,
+        }
+
+
+class OllamaRouter:
+    """Reparte las peticiones entre varios hosts de Ollama."""
+
+    def __init__(self, urls: Optional[List[str]] = None, health_interval: Optional[float] = None):
+        """
+        Inicializar el enrutador.
+
+        Args:
+            urls: URLs base de los hosts (por defecto, las configuradas)
+            health_interval: Segundos entre comprobaciones de salud
+        """
+        self.backends = [Backend(get_transport(url)) for url in (urls or configured_hosts())]
+        self.health_interval = health_interval if health_interval is not None else OLLAMA_HEALTH_INTERVAL
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def pick(self, model: Optional[str] = None, exclude: Optional[Set[str]] = None) -> Backend:
+        """
+        Elegir el host con menos carga que tenga el modelo.
+
+        Args:
+            model: Modelo pedido
+            exclude: URLs de hosts que no se deben elegir
+
+        Returns:
+            Host elegido
+
+        Raises:
+            OllamaTransportError: Si ningún host disponible tiene el modelo
+        """
+        with self._lock:
+            return self._pick(model, exclude or set())
+
+    def _pick(self, model: Optional[str], exclude: Set[str]) -> Backend:
+        """Elegir host; se llama con el lock tomado."""
+        candidates = [
+            b for b in self.backends
+            if b.available and b.serves(model) and b.url not in exclude
+        ]
+        if not candidates:
+            raise OllamaTransportError(
+                f"No hay ningún host de Ollama disponible con el modelo {model}"
+            )
+        return min(candidates, key=lambda b: (b.in_flight, b.latency or 0.0))
+
+    @contextmanager
+    def acquire(self, model: Optional[str] = None, exclude: Optional[Set[str]] = None) -> Iterator[Backend]:
+        """
+        Reservar un host durante una petición y registrar su latencia.
+
+        Args:
+            model: Modelo pedido
+            exclude: URLs de hosts que no se deben elegir
+
+        Yields:
+            Host elegido
+        """
+        # La elección y la reserva se hacen juntas para que dos peticiones
+        # simultáneas no elijan el mismo host libre
+        with self._lock:
+            backend = self._pick(model, exclude or set())
+            backend.in_flight += 1
+            backend.requests += 1
+        started = time.monotonic()
+        failed = False
+        try:
+            yield backend
+        except OllamaTransportError:
+            failed = True
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                backend.in_flight -= 1
+                if failed:
+                    backend.failures += 1
+                elif backend.latency is None:
+                    backend.latency = elapsed
+                else:
+                    backend.latency = LATENCY_ALPHA * elapsed + (1 - LATENCY_ALPHA) * backend.latency
+
+    def call(self, model: Optional[str], fn: Callable[[OllamaTransport], T]) -> T:
+        """
+        Ejecutar una petición síncrona en el mejor host, pasando a otro si falla.
+
+        Args:
+            model: Modelo pedido
+            fn: Función que recibe el transporte del host y realiza la petición
+
+        Returns:
+            Resultado de fn
+        """
+        tried: Set[str] = set()
+        while True:
+            backend = None
+            try:
+                with self.acquire(model, tried) as backend:
+                    return fn(backend.transport)
+            except OllamaTransportError as e:
+                # Sin host elegido (ninguno disponible), petición ya procesada o sin alternativas: propagar
+                if backend is None or not e.retryable:
+                    raise
+                tried.add(backend.url)
+                self._log_failover(backend, e)
+                if not self._has_alternative(model, tried):
+                    raise
+
+    async def call_async(self, model: Optional[str], fn: Callable[[OllamaTransport], Awaitable[T]]) -> T:
+        """
+        Ejecutar una petición asíncrona en el mejor host, pasando a otro si falla.
+
+        Args:
+            model: Modelo pedido
+            fn: Función asíncrona que recibe el transporte del host y realiza la petición
+
+        Returns:
+            Resultado de fn
+        """
+        tried: Set[str] = set()
+        while True:
+            backend = None
+            try:
+                with self.acquire(model, tried) as backend:
+                    return await fn(backend.transport)
+            except OllamaTransportError as e:
+                # Sin host elegido (ninguno disponible), petición ya procesada o sin alternativas: propagar
+                if backend is None or not e.retryable:
+                    raise
+                tried.add(backend.url)
+                self._log_failover(backend, e)
+                if not self._has_alternative(model, tried):
+                    raise
+
+    def _has_alternative(self, model: Optional[str], tried: Set[str]) -> bool:
+        """Indica si queda algún host disponible sin probar."""
+        with self._lock:
+            return any(b.available and b.serves(model) and b.url not in tried for b in self.backends)
+
+    def _log_failover(self, backend: Backend, error: Exception) -> None:
+        """Registrar el fallo de un host."""
+        if not isinstance(error, CircuitOpenError):
+            logger.warning("Fallo en el host de Ollama %s: %s", backend.url, error)
+
+    def model_names(self) -> List[str]:
+        """
+        Consultar los modelos de todos los hosts.
+
+        Returns:
+            Unión de los nombres de modelos (en el orden en que aparecen)
+
+        Raises:
+            OllamaTransportError: Si ningún host responde
+        """
+        names: Dict[str, None] = {}
+        errors = []
+        for backend in self.backends:
+            try:
+                models = self._fetch_models(backend)
+            except OllamaTransportError as e:
+                errors.append(f"{backend.url}: {str(e)}")
+                continue
+            names.update(dict.fromkeys(models))
+        if not names and errors:
+            raise OllamaTransportError("; ".join(errors))
+        return list(names)
+
+    def _fetch_models(self, backend: Backend) -> List[str]:
+        """Consultar /api/tags de un host y actualizar sus modelos."""
+        response = backend.transport.request("GET", "/api/tags", "tags")
+        if response.status_code >= 400:
+            raise OllamaTransportError(f"HTTP {response.status_code}")
+        models = [model["name"] for model in response.json().get("models", [])]
+        with self._lock:
+            backend.models = set(models)
+        return models
+
+    def check_health(self) -> None:
+        """Comprobar todos los hosts y actualizar su estado y sus modelos."""
+        for backend in self.backends:
+            try:
+                self._fetch_models(backend)
+                healthy = True
+            except Exception as e:
+                healthy = False
+                reason = str(e)
+            with self._lock:
+                if backend.healthy != healthy:
+                    if healthy:
+                        logger.info("Host de Ollama %s recuperado", backend.url)
+                    else:
+                        logger.warning("Host de Ollama %s retirado del reparto: %s", backend.url, reason)
+                backend.healthy = healthy
+                backend.last_check = time.monotonic()
+
+    def status(self) -> List[Dict[str, Any]]:
+        """
+        Obtener el estado de todos los hosts.
+
+        Returns:
+            Estado, carga y latencia de cada host
+        """
+        with self._lock:
+            return [backend.status() for backend in self.backends]
+
+    async def start(self) -> None:
+        """Arrancar la comprobación de salud periódica."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._health_loop(), name="ollama-health")
+
+    async def stop(self) -> None:
+        """Detener la comprobación de salud periódica."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _health_loop(self) -> None:
+        """Comprobar la salud de los hosts cada health_interval segundos."""
+        while True:
+            try:
+                await run_in_threadpool(self.check_health)
+            except Exception as e:
+                logger.error("Error al comprobar los hosts de Ollama: %s", e)
+            await asyncio.sleep(self.health_interval)
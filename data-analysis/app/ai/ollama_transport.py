@@ -0,0 +1,363 @@
+"""
+Transporte HTTP hacia Ollama con pool de conexiones, reintentos y circuit breaker.
+
+Cada host de Ollama tiene un único transporte: las llamadas síncronas
+comparten un httpx.Client con conexiones keep-alive y las asíncronas usan
+el cliente asíncrono compartido de la aplicación. Cada operación tiene su
+propio timeout (una generación puede tardar minutos; listar modelos, no).
+
+Los fallos de conexión se reintentan un número acotado de veces con
+backoff exponencial y jitter. Si el host acumula fallos seguidos, el
+circuit breaker se abre y las peticiones fallan de inmediato durante
+OLLAMA_BREAKER_RESET segundos, en lugar de ocupar un worker hasta el
+timeout; pasado ese tiempo se deja pasar una petición de prueba.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from app.utils.http_client import get_async_client
+
+logger = logging.getLogger(__name__)
+
+# Configuración (se puede sobrescribir mediante variables de entorno)
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "3"))
+OLLAMA_GENERATE_TIMEOUT = float(os.getenv("OLLAMA_GENERATE_TIMEOUT", "120"))
+OLLAMA_METADATA_TIMEOUT = float(os.getenv("OLLAMA_METADATA_TIMEOUT", "10"))
+OLLAMA_RETRIES = int(os.getenv("OLLAMA_RETRIES", "2"))
+OLLAMA_RETRY_BACKOFF = float(os.getenv("OLLAMA_RETRY_BACKOFF", "0.5"))
+OLLAMA_BREAKER_THRESHOLD = int(os.getenv("OLLAMA_BREAKER_THRESHOLD", "5"))
+OLLAMA_BREAKER_RESET = float(os.getenv("OLLAMA_BREAKER_RESET", "30"))
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "10"))
+
+# Timeout y política de reintento por operación. Las operaciones idempotentes
+# (consultas de metadatos) también se reintentan tras un timeout de lectura;
+# una generación sólo si la petición no llegó a enviarse.
+OPERATIONS = {
+    "generate": {"timeout": OLLAMA_GENERATE_TIMEOUT, "idempotent": False},
+    "tags": {"timeout": OLLAMA_METADATA_TIMEOUT, "idempotent": True},
+    "show": {"timeout": OLLAMA_METADATA_TIMEOUT, "idempotent": True},
+}
+
+# Respuestas del servidor que indican un problema transitorio
+RETRY_STATUS = {502, 503, 504}
+
+# Errores en los que la petición no llegó al servidor
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class OllamaTransportError(Exception):
+    """
+    Error de comunicación con un host de Ollama.
+
+    `retryable` indica si la petición se puede reenviar a otro host sin
+    riesgo de duplicarla: no llegó a procesarse (fallo de conexión, circuito
+    abierto, 502/503/504) o la operación es idempotente.
+    """
+
+    def __init__(self, message: str = "", retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class CircuitOpenError(OllamaTransportError):
+    """El circuit breaker está abierto: el host se considera caído."""
+
+    def __init__(self, message: str = ""):
+        super().__init__(message, retryable=True)
+
+
+class CircuitBreaker:
+    """Circuit breaker con estados cerrado, abierto y semiabierto."""
+
+    def __init__(self, threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        """
+        Inicializar el circuit breaker.
+
+        Args:
+            threshold: Fallos seguidos que abren el circuito
+            reset_timeout: Segundos en abierto antes de permitir una petición de prueba
+        """
+        self.threshold = threshold or OLLAMA_BREAKER_THRESHOLD
+        self.reset_timeout = reset_timeout if reset_timeout is not None else OLLAMA_BREAKER_RESET
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        """
+        Comprobar si se puede enviar una petición.
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto
+        """
+        with self._lock:
+            if self.state == "open":
+                remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(f"Ollama no disponible (reintento en {remaining:.0f} s)")
+                self.state = "half_open"
+                self._trial = False
+            if self.state == "half_open":
+                if self._trial:
+                    raise CircuitOpenError("Ollama no disponible (petición de prueba en curso)")
+                self._trial = True
+
+    def record_success(self) -> None:
+        """Registrar una petición correcta: el circuito se cierra."""
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Circuit breaker de Ollama cerrado")
+            self.state = "closed"
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self) -> None:
+        """Registrar un fallo: el circuito se abre al superar el umbral."""
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    logger.warning("Circuit breaker de Ollama abierto tras %s fallos", self.failures)
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class OllamaTransport:
+    """Transporte hacia un host de Ollama."""
+
+    def __init__(
+        self,
+        base_url: str,
+        retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        """
+        Inicializar el transporte.
+
+        Args:
+            base_url: URL base del host de Ollama
+            retries: Reintentos máximos por petición
+            backoff: Espera base (segundos) entre reintentos
+            breaker: Circuit breaker del host
+        """
+        self.base_url = base_url.rstrip("/")
+        self.retries = retries if retries is not None else OLLAMA_RETRIES
+        self.backoff = backoff if backoff is not None else OLLAMA_RETRY_BACKOFF
+        self.breaker = breaker or CircuitBreaker()
+        self._client: Optional[httpx.Client] = None
+        self._client_lock = threading.Lock()
+
+    def _sync_client(self) -> httpx.Client:
+        """Obtener el cliente síncrono del transporte, creándolo si no existe."""
+        with self._client_lock:
+            if self._client is None or self._client.is_closed:
+                self._client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=OLLAMA_POOL_SIZE,
+                        max_keepalive_connections=OLLAMA_POOL_SIZE,
+                    )
+                )
+            return self._client
+
+    def close(self) -> None:
+        """Cerrar el cliente síncrono del transporte."""
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def _timeout(self, operation: str) -> httpx.Timeout:
+        """Timeout de una operación."""
+        return httpx.Timeout(OPERATIONS[operation]["timeout"], connect=OLLAMA_CONNECT_TIMEOUT)
+
+    def _delay(self, attempt: int) -> float:
+        """Espera antes del siguiente intento: backoff exponencial con jitter completo."""
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def _should_retry(self, operation: str, error: Optional[Exception], status: Optional[int]) -> bool:
+        """Decidir si un fallo se puede reintentar."""
+        if error is not None:
+            return isinstance(error, _NOT_SENT_ERRORS) or OPERATIONS[operation]["idempotent"]
+        return status in RETRY_STATUS
+
+    def _check(self, response: Optional[httpx.Response], error: Optional[Exception]) -> bool:
+        """
+        Registrar el resultado de un intento en el circuit breaker.
+
+        Returns:
+            True si el intento fue correcto (incluye errores 4xx, que son del cliente)
+        """
+        if error is None and response.status_code < 500:
+            self.breaker.record_success()
+            return True
+        self.breaker.record_failure()
+        return False
+
+    def _failure(
+        self,
+        operation: str,
+        response: Optional[httpx.Response],
+        error: Optional[Exception]
+    ) -> OllamaTransportError:
+        """Construir el error final de una petición fallida."""
+        status = response.status_code if response is not None else None
+        retryable = self._should_retry(operation, error, status)
+        if error is not None:
+            return OllamaTransportError(f"{type(error).__name__}: {str(error)}", retryable)
+        return OllamaTransportError(f"HTTP {response.status_code}: {response.text[:200]}", retryable)
+
+    def request(self, method: str, path: str, operation: str, json: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        """
+        Enviar una petición síncrona con reintentos.
+
+        Args:
+            method: Método HTTP
+            path: Ruta de la API de Ollama (p. ej. "/api/tags")
+            operation: Operación ("generate", "tags" o "show")
+            json: Cuerpo de la petición
+
+        Returns:
+            Respuesta HTTP (puede ser un error 4xx)
+
+        Raises:
+            OllamaTransportError: Si el host no responde o el circuito está abierto
+        """
+        client = self._sync_client()
+        for attempt in range(self.retries + 1):
+            self.breaker.allow()
+            response, error = None, None
+            try:
+                response = client.request(method, self.base_url + path, json=json, timeout=self._timeout(operation))
+            except httpx.TransportError as e:
+                error = e
+            if self._check(response, error):
+                return response
+            if attempt == self.retries or not self._should_retry(operation, error, response.status_code if response is not None else None):
+                raise self._failure(operation, response, error)
+            delay = self._delay(attempt)
+            logger.warning("Fallo al llamar a Ollama (%s), reintento %s en %.2f s", operation, attempt + 1, delay)
+            time.sleep(delay)
+
+    async def _send_async(self, request: httpx.Request, operation: str, stream: bool = False) -> httpx.Response:
+        """Enviar una petición asíncrona ya construida con reintentos."""
+        client = get_async_client()
+        for attempt in range(self.retries + 1):
+            self.breaker.allow()
+            response, error = None, None
+            try:
+                response = await client.send(request, stream=stream)
+            except httpx.TransportError as e:
+                error = e
+            if self._check(response, error):
+                return response
+            if stream and response is not None:
+                await response.aread()
+                await response.aclose()
+            if attempt == self.retries or not self._should_retry(operation, error, response.status_code if response is not None else None):
+                raise self._failure(operation, response, error)
+            delay = self._delay(attempt)
+            logger.warning("Fallo al llamar a Ollama (%s), reintento %s en %.2f s", operation, attempt + 1, delay)
+            await asyncio.sleep(delay)
+
+    async def request_async(
+        self,
+        method: str,
+        path: str,
+        operation: str,
+        json: Optional[Dict[str, Any]] = None
+    ) -> httpx.Response:
+        """
+        Enviar una petición asíncrona con reintentos.
+
+        Args:
+            method: Método HTTP
+            path: Ruta de la API de Ollama
+            operation: Operación ("generate", "tags" o "show")
+            json: Cuerpo de la petición
+
+        Returns:
+            Respuesta HTTP (puede ser un error 4xx)
+
+        Raises:
+            OllamaTransportError: Si el host no responde o el circuito está abierto
+        """
+        request = get_async_client().build_request(
+            method, self.base_url + path, json=json, timeout=self._timeout(operation)
+        )
+        return await self._send_async(request, operation)
+
+    async def stream_lines(self, path: str, json: Dict[str, Any], operation: str = "generate") -> AsyncIterator[str]:
+        """
+        Enviar una petición POST y devolver el cuerpo línea a línea (NDJSON).
+
+        Sólo se reintenta el envío; una vez recibida la respuesta, un corte
+        a mitad del stream se propaga al llamante.
+
+        Args:
+            path: Ruta de la API de Ollama
+            json: Cuerpo de la petición
+            operation: Operación (define el timeout entre fragmentos)
+
+        Yields:
+            Líneas no vacías del cuerpo de la respuesta
+
+        Raises:
+            OllamaTransportError: Si el host no responde o el circuito está abierto
+        """
+        request = get_async_client().build_request(
+            "POST", self.base_url + path, json=json, timeout=self._timeout(operation)
+        )
+        response = await self._send_async(request, operation, stream=True)
+        try:
+            if response.status_code >= 400:
+                await response.aread()
+                raise OllamaTransportError(
+                    f"HTTP {response.status_code}: {response.text[:200]}", response.status_code in RETRY_STATUS
+                )
+            async for line in response.aiter_lines():
+                if line:
+                    yield line
+        except httpx.TransportError as e:
+            self.breaker.record_failure()
+            raise OllamaTransportError(f"{type(e).__name__}: {str(e)}")
+        finally:
+            await response.aclose()
+
+
+_transports: Dict[str, OllamaTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(base_url: str) -> OllamaTransport:
+    """
+    Obtener el transporte compartido de un host de Ollama.
+
+    Args:
+        base_url: URL base del host
+
+    Returns:
+        Transporte del host (uno por proceso)
+    """
+    key = base_url.rstrip("/")
+    with _transports_lock:
+        if key not in _transports:
+            _transports[key] = OllamaTransport(key)
+        return _transports[key]
+
+
+def close_transports() -> None:
+    """Cerrar los clientes síncronos de todos los transportes."""
+    with _transports_lock:
+        for transport in _transports.values():
+            transport.close()
@@ -0,0 +1,52 @@
+"""
+Deduplicación de operaciones asíncronas concurrentes (single-flight).
+
+Mientras una operación con una clave dada está en curso, las llamadas con
+la misma clave no la repiten: esperan a la que ya se está ejecutando y
+reciben su mismo resultado (o su misma excepción).
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Agrupa las llamadas concurrentes con la misma clave en una sola ejecución."""
+
+    def __init__(self):
+        """Inicializar el registro de operaciones en curso."""
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Número de operaciones en curso."""
+        return len(self._flights)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Ejecutar fn, o unirse a la ejecución en curso con la misma clave.
+
+        La operación corre en su propia tarea: si el llamante que la inició
+        se cancela, el resto sigue esperando el resultado.
+
+        Args:
+            key: Clave que identifica operaciones equivalentes
+            fn: Función asíncrona sin argumentos que realiza la operación
+
+        Returns:
+            Resultado de la operación
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            self.executions += 1
+            flight = asyncio.ensure_future(fn())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            self.coalesced += 1
+            logger.info("Uniéndose a una operación en curso (%s en curso)", self.in_flight)
+        return await asyncio.shield(flight)
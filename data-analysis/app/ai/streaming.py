@@ -0,0 +1,115 @@
+"""
+Retransmisión de análisis de Ollama como Server-Sent Events (SSE).
+
+La generación corre en una tarea independiente que vuelca los tokens en
+una cola; el endpoint SSE sólo lee de esa cola. Así, si el cliente se
+desconecta a mitad del informe, la generación termina igualmente y el
+texto completo se guarda en analysis_results.
+"""
+import json
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from app.db.manager import DBManager
+from app.ai.ollama_client import OllamaClient
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+# Referencias a las generaciones en curso (evita que el recolector las cancele)
+_running: Set[asyncio.Task] = set()
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """
+    Formatear un evento SSE.
+
+    Args:
+        event: Nombre del evento
+        data: Datos del evento (se serializan como JSON en una sola línea)
+
+    Returns:
+        Texto del evento listo para enviar
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _generate(
+    db: DBManager,
+    ollama_client: OllamaClient,
+    prompt: str,
+    data_id: int,
+    model: str,
+    queue: "asyncio.Queue[Any]",
+) -> None:
+    """Consumir el stream de Ollama, publicar eventos y guardar el texto final."""
+    parts = []
+    try:
+        final: Dict[str, Any] = {}
+        async for chunk in ollama_client.stream_response(prompt, model=model):
+            token = chunk.get("response", "")
+            if token:
+                parts.append(token)
+                queue.put_nowait(sse_event("token", {"text": token}))
+            if chunk.get("done"):
+                final = chunk
+
+        response = "".join(parts)
+        response_id = await run_in_threadpool(db.save_analysis_result, data_id, response)
+        logger.info("Análisis en streaming guardado con ID: %s", response_id)
+        queue.put_nowait(sse_event("done", {
+            "data_id": data_id,
+            "response_id": response_id,
+            "model": model,
+            "eval_count": final.get("eval_count"),
+            "prompt_eval_count": final.get("prompt_eval_count"),
+            "prompt_eval_duration": final.get("prompt_eval_duration"),
+            "eval_duration": final.get("eval_duration"),
+            "total_duration": final.get("total_duration"),
+        }))
+    except Exception as e:
+        logger.error("Error en el análisis en streaming: %s", e)
+        queue.put_nowait(sse_event("error", {"detail": str(e)}))
+    finally:
+        queue.put_nowait(_END)
+
+
+async def stream_analysis(
+    db: DBManager,
+    ollama_client: OllamaClient,
+    prompt: str,
+    data_id: int,
+    model: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Generar un análisis y emitirlo como eventos SSE a medida que llegan los tokens.
+
+    Eventos: "start" (data_id, model), "token" (text), "done" (response_id) o "error".
+
+    Args:
+        db: Gestor de base de datos
+        ollama_client: Cliente de Ollama
+        prompt: Prompt ya generado
+        data_id: ID de los datos analizados
+        model: Modelo a usar (por defecto, el modelo activo)
+
+    Yields:
+        Eventos SSE formateados
+    """
+    model = model or ollama_client.model
+    queue: "asyncio.Queue[Any]" = asyncio.Queue()
+    # La tarea no depende de la conexión del cliente: siempre llega a guardar el resultado
+    task = asyncio.create_task(_generate(db, ollama_client, prompt, data_id, model, queue))
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+
+    yield sse_event("start", {"data_id": data_id, "model": model})
+    while True:
+        event = await queue.get()
+        if event is _END:
+            break
+        yield event
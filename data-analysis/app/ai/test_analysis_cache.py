@@ -0,0 +1,84 @@
+import unittest
+from app.db.manager import DBManager
+from app.ai.analysis_cache import AnalysisCache, quantize_resumen, parse_quantization
+
+def resumen(temperatura=24.2, humedad=92.3):
+    """Resumen de lectura como el que produce build_data_resumen."""
+    return {
+        "ubicacion": {"latitud": 9.889, "longitud": -84.089},
+        "clima": {"temperatura": temperatura, "presion_hPa": 885.7, "luz_lux": 81.3, "indice_uv": 0.69},
+        "clima_satelital": {"temp_media": 22.5, "humedad": humedad, "precipitacion": 14.7, "viento": 0.99},
+    }
+
+class TestAnalysisCache(unittest.TestCase):
+
+    def setUp(self):
+        """Configura una base de datos en memoria."""
+        self.db_manager = DBManager(db_path=":memory:")
+
+    def tearDown(self):
+        """Cierra la base de datos."""
+        self.db_manager.close()
+
+    def test_nearby_readings_share_entry(self):
+        """Lecturas dentro del mismo paso de cuantización reutilizan el análisis."""
+        cache = AnalysisCache(self.db_manager, ttl=3600, max_entries=10)
+        self.assertIsNone(cache.get("m", resumen()))
+        cache.put("m", resumen(), "informe")
+
+        self.assertEqual(cache.get("m", resumen(temperatura=24.1, humedad=91.8)), "informe")
+        self.assertIsNone(cache.get("m", resumen(temperatura=26.0)))
+        self.assertIsNone(cache.get("otro-modelo", resumen()))
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 3, 1))
+
+    def test_expired_entries_ignored(self):
+        """Una entrada más antigua que el TTL no se devuelve."""
+        cache = AnalysisCache(self.db_manager, ttl=3600, max_entries=10)
+        cache.put("m", resumen(), "informe")
+        with self.db_manager.pool.writer() as conn:
+            conn.execute("UPDATE analysis_cache SET created_epoch = created_epoch - 7200")
+        self.assertIsNone(cache.get("m", resumen()))
+
+    def test_least_recently_used_evicted(self):
+        """Por encima del máximo se descarta la entrada usada hace más tiempo."""
+        cache = AnalysisCache(self.db_manager, ttl=3600, max_entries=2)
+        cache.put("m", resumen(temperatura=10), "a")
+        cache.put("m", resumen(temperatura=20), "b")
+        with self.db_manager.pool.writer() as conn:
+            conn.execute("UPDATE analysis_cache SET last_used_epoch = last_used_epoch - 100")
+        self.assertEqual(cache.get("m", resumen(temperatura=10)), "a")
+        cache.put("m", resumen(temperatura=30), "c")
+
+        self.assertIsNone(cache.get("m", resumen(temperatura=20)))
+        self.assertEqual(cache.get("m", resumen(temperatura=10)), "a")
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_usage_written_on_next_save(self):
+        """Un acierto no escribe en la base de datos; su uso se guarda con el siguiente guardado."""
+        cache = AnalysisCache(self.db_manager, ttl=3600, max_entries=10)
+        cache.put("m", resumen(), "informe")
+        key = cache.key("m", resumen())
+
+        def hits():
+            with self.db_manager.pool.reader() as conn:
+                return conn.execute("SELECT hits FROM analysis_cache WHERE key = ?", (key,)).fetchone()[0]
+
+        self.assertEqual(cache.get("m", resumen()), "informe")
+        self.assertEqual(cache.get("m", resumen()), "informe")
+        self.assertEqual(hits(), 0)
+        cache.put("m", resumen(temperatura=30), "otro")
+        self.assertEqual(hits(), 2)
+
+    def test_quantization_steps(self):
+        """Los pasos se pueden sobrescribir y se aplican por campo."""
+        steps = parse_quantization("temperatura=2, humedad=5")
+        quantized = quantize_resumen(resumen(temperatura=24.9, humedad=93.0), steps)
+        self.assertEqual(quantized["clima"]["temperatura"], 24.0)
+        self.assertEqual(quantized["clima_satelital"]["humedad"], 95.0)
+        with self.assertRaises(ValueError):
+            parse_quantization("temperatura")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import asyncio
+from app.db.manager import DBManager
+from app.ai.job_queue import AnalysisJobQueue
+from app.ai.analysis_cache import AnalysisCache
+from app.ai.batch_analysis import split_batch_response
+
+class FakeBatchClient:
+    """Cliente de Ollama simulado que responde con un informe por lectura."""
+
+    def __init__(self, omit=()):
+        self.model = "modelo-prueba"
+        self.omit = set(omit)
+        self.prompts = []
+
+    async def get_response_async(self, prompt, model=None):
+        self.prompts.append(prompt)
+        await asyncio.sleep(0.01)
+        if "=== LECTURA <id> ===" not in prompt:
+            return "Informe individual"
+        ids = [int(line.split(":")[1].strip(" ,")) for line in prompt.splitlines() if line.strip().startswith('"id":')]
+        return "\n".join(f"=== LECTURA {i} ===\nInforme de la lectura {i}" for i in ids if i not in self.omit)
+
+class TestBatchAnalysis(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Configura una base de datos en memoria con cinco lecturas distintas."""
+        self.db_manager = DBManager(db_path=":memory:")
+        self.data_ids = [
+            self.db_manager.save_sensor_data({"sensor_bmp390": {"temperatura_a": 20.0 + n}})
+            for n in range(5)
+        ]
+
+    def tearDown(self):
+        """Cierra la base de datos."""
+        self.db_manager.close()
+
+    async def run_batch(self, client, **kwargs):
+        """Encolar las lecturas como lote y esperar a que terminen."""
+        queue = AnalysisJobQueue(self.db_manager, client, workers=1, poll_seconds=0.1, **kwargs)
+        await queue.start()
+        try:
+            _, job_ids = await queue.enqueue_batch(self.data_ids)
+            for _ in range(250):
+                jobs = [self.db_manager.get_job(job_id) for job_id in job_ids]
+                if all(job["status"] in ("done", "error") for job in jobs):
+                    return jobs
+                await asyncio.sleep(0.02)
+            self.fail("El lote no terminó")
+        finally:
+            await queue.stop()
+
+    async def test_batch_uses_one_prompt_per_group(self):
+        """Cinco lecturas con lotes de 3 se analizan en dos generaciones."""
+        client = FakeBatchClient()
+        jobs = await self.run_batch(client, batch_size=3)
+        self.assertEqual(len(client.prompts), 2)
+        for job, data_id in zip(jobs, self.data_ids):
+            self.assertEqual(job["status"], "done")
+            self.assertEqual(job["response"], f"Informe de la lectura {data_id}")
+            self.assertEqual(self.db_manager.get_analysis_result(job["response_id"])["data_id"], data_id)
+
+    async def test_missing_section_analyzed_individually(self):
+        """Si el modelo omite una lectura, ésta se analiza por separado."""
+        client = FakeBatchClient(omit={self.data_ids[1]})
+        jobs = await self.run_batch(client, batch_size=5)
+        self.assertEqual(len(client.prompts), 2)
+        self.assertEqual(jobs[1]["response"], "Informe individual")
+        self.assertEqual(jobs[0]["response"], f"Informe de la lectura {self.data_ids[0]}")
+
+    async def test_batch_sections_not_served_to_single_analyses(self):
+        """Los informes de un lote no se reutilizan como análisis individual, pero sí en otro lote."""
+        cache = AnalysisCache(self.db_manager, ttl=3600, max_entries=100)
+        client = FakeBatchClient()
+        await self.run_batch(client, batch_size=5, cache=cache)
+        await self.run_batch(client, batch_size=5, cache=cache)
+        self.assertEqual(len(client.prompts), 1)
+
+        queue = AnalysisJobQueue(self.db_manager, client, workers=1, poll_seconds=0.1, cache=cache)
+        await queue.start()
+        try:
+            job_id = await queue.enqueue(self.data_ids[0])
+            for _ in range(250):
+                job = self.db_manager.get_job(job_id)
+                if job["status"] == "done":
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await queue.stop()
+        self.assertEqual(job["response"], "Informe individual")
+
+    def test_split_tolerates_markdown_headers(self):
+        """Las cabeceras con formato Markdown se reconocen y se ignoran IDs ajenos."""
+        text = "Introducción\n## === LECTURA 7 ===\nA\n**=== Lectura 9 ===**\nB\n=== LECTURA 99 ===\nC"
+        self.assertEqual(split_batch_response(text, [7, 9]), {7: "A", 9: "B\n=== LECTURA 99 ===\nC"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from app.ai.change_detector import ChangeDetector, parse_thresholds
+
+def reading(temperatura, presion=885.0):
+    return {"sensor_bmp390": {"temperatura_a": temperatura, "presion_hPa": presion}}
+
+class TestChangeDetector(unittest.TestCase):
+
+    def setUp(self):
+        """Detector con un umbral EWMA de temperatura y CUSUM de presión."""
+        self.detector = ChangeDetector(
+            thresholds={"temperatura_a": ("ewma", 1.0, 0.0), "presion_hPa": ("cusum", 3.0, 0.5)},
+            alpha=0.5,
+            max_staleness=3600,
+            enabled=True,
+        )
+
+    def test_steady_readings_not_analyzed(self):
+        """Sólo la primera lectura se analiza mientras las condiciones no cambian."""
+        self.assertEqual(self.detector.observe(reading(22.0), now=0), "sin análisis previo")
+        triggered = [self.detector.observe(reading(22.0 + 0.1 * (n % 3)), now=n) for n in range(1, 100)]
+        self.assertEqual(triggered, [None] * 99)
+
+    def test_ewma_shift_triggers_once(self):
+        """Un cambio sostenido de temperatura dispara un único análisis."""
+        self.detector.observe(reading(22.0), now=0)
+        triggered = [self.detector.observe(reading(23.5), now=n) for n in range(1, 10)]
+        self.assertIsNone(triggered[0])
+        self.assertIn("temperatura_a", triggered[1])
+        self.assertEqual(sum(1 for reason in triggered if reason), 1)
+
+    def test_cusum_detects_slow_drift(self):
+        """Una deriva lenta de presión acaba disparando el CUSUM."""
+        self.detector.observe(reading(22.0, 885.0), now=0)
+        reasons = [self.detector.observe(reading(22.0, 886.0), now=n) for n in range(1, 10)]
+        self.assertEqual(reasons[:6], [None] * 6)
+        self.assertIn("presion_hPa", reasons[6])
+
+    def test_staleness_and_disabled(self):
+        """Se analiza al superar la antigüedad máxima, y siempre si la detección está desactivada."""
+        self.detector.observe(reading(22.0), now=0)
+        self.assertIsNone(self.detector.observe(reading(22.0), now=3000))
+        self.assertIn("último análisis", self.detector.observe(reading(22.0), now=3600))
+        self.assertIsNotNone(ChangeDetector(thresholds={}, enabled=False).observe(reading(22.0)))
+
+    def test_state_per_device(self):
+        """Cada dispositivo tiene su propia media y referencia; un cambio en uno no afecta a los demás."""
+        robot_1 = lambda t: {**reading(t), "dispositivo": "robot-001"}
+        robot_2 = lambda t: {**reading(t), "dispositivo": "robot-002"}
+        self.assertIsNotNone(self.detector.observe(robot_1(22.0), now=0, data_id=1))
+        self.assertIsNotNone(self.detector.observe(robot_2(30.0), now=0, data_id=2))
+        self.assertIsNone(self.detector.observe(robot_1(22.2), now=1, data_id=3))
+        self.assertIsNone(self.detector.observe(robot_2(30.1), now=1, data_id=4))
+        self.assertEqual(self.detector.reference_id(robot_1(22.0)), 1)
+        self.assertEqual(self.detector.reference_id(robot_2(30.0)), 2)
+        # Sin dispositivo, el estado se separa por fuente
+        self.assertIsNotNone(self.detector.observe(reading(10.0), now=1, source="http://finca-2/datos", data_id=5))
+        self.assertEqual(self.detector.reference_id(reading(10.0), source="http://finca-2/datos"), 5)
+        self.assertEqual(self.detector.status()["observed"], 5)
+
+    def test_force_and_reset_reference(self):
+        """Un análisis forzado o una referencia reiniciada toman la lectura como nueva referencia."""
+        self.detector.observe(reading(22.0), now=0, data_id=1)
+        self.assertEqual(self.detector.observe(reading(22.0), now=1, data_id=2, force=True), "análisis forzado")
+        self.assertEqual(self.detector.reference_id(reading(22.0)), 2)
+        self.assertIsNone(self.detector.observe(reading(22.1), now=2, data_id=3))
+        self.detector.reset_reference(reading(22.1), "sin análisis", now=2, data_id=3)
+        self.assertEqual(self.detector.reference_id(reading(22.1)), 3)
+        self.assertEqual(self.detector.status()["observed"], 3)
+
+    def test_parse_thresholds(self):
+        """Los umbrales por campo sustituyen a los de por defecto; 0 desactiva el campo."""
+        thresholds = parse_thresholds("temperatura_a=0.5,presion_hPa=cusum:6:1,lux=0,desconocido=1")
+        self.assertEqual(thresholds["temperatura_a"], ("ewma", 0.5, 0.0))
+        self.assertEqual(thresholds["presion_hPa"], ("cusum", 6.0, 1.0))
+        self.assertNotIn("lux", thresholds)
+        self.assertNotIn("desconocido", thresholds)
+
+if __name__ == "__main__":
+    unittest.main()
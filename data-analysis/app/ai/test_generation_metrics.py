@@ -0,0 +1,52 @@
+import unittest
+from app.ai.generation_metrics import GenerationMetrics
+from app.ai.ollama_client import OllamaClient
+from app.utils.prompt_generator import generate_prompt
+from app.utils.prompt_templates import get_template
+
+class TestGenerationMetrics(unittest.TestCase):
+
+    def test_prefill_and_generation_averaged(self):
+        """Se acumulan por modelo los tiempos de prefill y de generación."""
+        metrics = GenerationMetrics()
+        metrics.record("m", {"prompt_eval_count": 600, "prompt_eval_duration": 3_000_000_000,
+                             "eval_count": 100, "eval_duration": 5_000_000_000, "load_duration": 2_000_000_000})
+        metrics.record("m", {"prompt_eval_count": 40, "prompt_eval_duration": 200_000_000,
+                             "eval_count": 100, "eval_duration": 5_000_000_000, "load_duration": 5_000_000})
+        metrics.record("m", {"response": "sin estadísticas"})
+        summary = metrics.snapshot()["m"]
+        self.assertEqual(summary["generaciones"], 2)
+        self.assertEqual(summary["cargas_modelo"], 1)
+        self.assertEqual(summary["prefill_ms_medio"], 1600.0)
+        self.assertEqual(summary["generacion_ms_medio"], 5000.0)
+        self.assertEqual(summary["tokens_prompt_medio"], 320.0)
+        self.assertEqual(summary["generacion_tokens_s"], 20.0)
+        self.assertEqual(summary["ultima"]["tokens_prompt"], 40)
+
+class TestChatRequest(unittest.TestCase):
+
+    def test_template_prefix_sent_as_system_message(self):
+        """El texto fijo de la plantilla va como mensaje de sistema y los datos como mensaje de usuario."""
+        prompt = generate_prompt({"sensor_bmp390": {"temperatura_a": 21.5}})
+        path, data = OllamaClient()._build_request(prompt, "m", stream=False)
+        self.assertEqual(path, "/api/chat")
+        system, user = data["messages"]
+        self.assertEqual(system["content"], get_template("analisis").prefix)
+        self.assertIn('"temperatura": 21.5', user["content"])
+        self.assertEqual(system["content"] + user["content"], prompt)
+        self.assertIn("keep_alive", data)
+
+    def test_free_prompt_uses_generate(self):
+        """Un prompt que no viene de una plantilla se envía completo a /api/generate."""
+        path, data = OllamaClient()._build_request("Hola", "m", stream=True)
+        self.assertEqual(path, "/api/generate")
+        self.assertEqual(data["prompt"], "Hola")
+
+    def test_chat_response_normalized(self):
+        """Las respuestas de /api/chat se leen igual que las de /api/generate."""
+        chunk = OllamaClient._as_generate({"message": {"role": "assistant", "content": "ok"}, "done": True})
+        self.assertEqual(chunk["response"], "ok")
+        self.assertTrue(chunk["done"])
+
+if __name__ == "__main__":
+    unittest.main()
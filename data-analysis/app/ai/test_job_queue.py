@@ -0,0 +1,162 @@
+import unittest
+import asyncio
+from app.db.manager import DBManager
+from app.ai.job_queue import AnalysisJobQueue
+from app.ai.analysis_cache import AnalysisCache
+
+class FakeOllamaClient:
+    """Cliente de Ollama simulado con latencia configurable."""
+
+    def __init__(self, delay=0.05, fail=False):
+        self.model = "modelo-prueba"
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_response_async(self, prompt, model=None):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise Exception("Ollama no disponible")
+            return f"Análisis con {model}"
+        finally:
+            self.in_flight -= 1
+
+class TestAnalysisJobQueue(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Configura una base de datos en memoria con una lectura."""
+        self.db_manager = DBManager(db_path=":memory:")
+        self.data_id = self.db_manager.save_sensor_data({"sensor_bmp390": {"temperatura_a": 22.0}})
+
+    def tearDown(self):
+        """Cierra la base de datos."""
+        self.db_manager.close()
+
+    async def wait_for_status(self, job_id, status, timeout=5):
+        """Esperar a que un trabajo alcance un estado."""
+        for _ in range(int(timeout / 0.02)):
+            job = self.db_manager.get_job(job_id)
+            if job["status"] == status:
+                return job
+            await asyncio.sleep(0.02)
+        self.fail(f"El trabajo {job_id} no llegó al estado {status}")
+
+    async def test_jobs_processed_with_bounded_workers(self):
+        """Los trabajos se procesan sin superar el número de workers."""
+        client = FakeOllamaClient()
+        queue = AnalysisJobQueue(self.db_manager, client, workers=2, poll_seconds=0.1)
+        await queue.start()
+        try:
+            data_ids = [
+                self.db_manager.save_sensor_data({"sensor_bmp390": {"temperatura_a": 20.0 + n}})
+                for n in range(5)
+            ]
+            job_ids = [await queue.enqueue(data_id) for data_id in data_ids]
+            for job_id in job_ids:
+                job = await self.wait_for_status(job_id, "done")
+                self.assertEqual(job["response"], "Análisis con modelo-prueba")
+                self.assertIsNotNone(job["response_id"])
+        finally:
+            await queue.stop()
+        self.assertEqual(client.calls, 5)
+        self.assertLessEqual(client.max_in_flight, 2)
+
+    async def test_reading_analysis_follows_its_job(self):
+        """El análisis de una lectura es el de su último trabajo, no el último de la tabla."""
+        self.assertIsNone(self.db_manager.get_reading_analysis(self.data_id))
+        other_id = self.db_manager.save_sensor_data({"sensor_bmp390": {"temperatura_a": 30.0}})
+        queue = AnalysisJobQueue(self.db_manager, FakeOllamaClient(), workers=1, poll_seconds=0.1)
+        await queue.start()
+        try:
+            job_id = await queue.enqueue(self.data_id)
+            self.assertIn(self.db_manager.get_reading_analysis(self.data_id)["status"], ("queued", "running"))
+            job = await self.wait_for_status(job_id, "done")
+        finally:
+            await queue.stop()
+        self.db_manager.save_analysis_result(other_id, "Análisis de otro robot")
+        analysis = self.db_manager.get_reading_analysis(self.data_id)
+        self.assertEqual(analysis["job_id"], job_id)
+        self.assertEqual(analysis["response_id"], job["response_id"])
+        self.assertEqual(analysis["response"], "Análisis con modelo-prueba")
+        self.assertEqual(self.db_manager.get_reading_analysis(other_id)["response"], "Análisis de otro robot")
+
+    async def test_failed_job_records_error(self):
+        """Un fallo de Ollama deja el trabajo en estado de error."""
+        queue = AnalysisJobQueue(self.db_manager, FakeOllamaClient(fail=True), workers=1, poll_seconds=0.1)
+        await queue.start()
+        try:
+            job_id = await queue.enqueue(self.data_id)
+            job = await self.wait_for_status(job_id, "error")
+            self.assertIn("Ollama no disponible", job["error"])
+        finally:
+            await queue.stop()
+
+    async def test_cached_analysis_reused(self):
+        """Una lectura equivalente a otra ya analizada no vuelve a llamar a Ollama."""
+        client = FakeOllamaClient()
+        cache = AnalysisCache(self.db_manager, ttl=3600, max_entries=10)
+        queue = AnalysisJobQueue(self.db_manager, client, workers=1, poll_seconds=0.1, cache=cache)
+        await queue.start()
+        try:
+            first = await queue.enqueue(self.data_id)
+            await self.wait_for_status(first, "done")
+            second = await queue.enqueue(self.data_id)
+            job = await self.wait_for_status(second, "done")
+        finally:
+            await queue.stop()
+        self.assertEqual(client.calls, 1)
+        self.assertEqual(job["response"], "Análisis con modelo-prueba")
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    async def test_concurrent_identical_jobs_share_generation(self):
+        """Trabajos simultáneos con el mismo prompt comparten generación y respuesta."""
+        client = FakeOllamaClient(delay=0.2)
+        queue = AnalysisJobQueue(self.db_manager, client, workers=3, poll_seconds=0.1)
+        await queue.start()
+        try:
+            job_ids = [await queue.enqueue(self.data_id) for _ in range(3)]
+            jobs = [await self.wait_for_status(job_id, "done") for job_id in job_ids]
+        finally:
+            await queue.stop()
+        self.assertEqual(client.calls, 1)
+        self.assertEqual(len({job["response_id"] for job in jobs}), 1)
+        self.assertEqual(queue.flights.coalesced, 2)
+
+    async def test_shared_generation_saved_per_reading(self):
+        """Lecturas distintas con el mismo prompt comparten generación, pero no la fila de análisis."""
+        client = FakeOllamaClient(delay=0.2)
+        reading = {"sensor_bmp390": {"temperatura_a": 22.0}}
+        data_ids = [self.data_id] + [self.db_manager.save_sensor_data(reading) for _ in range(2)]
+        queue = AnalysisJobQueue(self.db_manager, client, poll_seconds=0.1)
+        await queue.start()
+        try:
+            job_ids = [await queue.enqueue(data_id) for data_id in data_ids]
+            jobs = [await self.wait_for_status(job_id, "done") for job_id in job_ids]
+        finally:
+            await queue.stop()
+        self.assertEqual(client.calls, 1)
+        for job, data_id in zip(jobs, data_ids):
+            self.assertEqual(self.db_manager.get_analysis_result(job["response_id"])["data_id"], data_id)
+            self.assertEqual(job["response"], "Análisis con modelo-prueba")
+
+    async def test_interrupted_jobs_resume_after_restart(self):
+        """Un trabajo que quedó en ejecución se reanuda al arrancar de nuevo."""
+        job_id = self.db_manager.create_job(self.data_id, "modelo-prueba")
+        self.assertEqual(self.db_manager.claim_next_job()["id"], job_id)
+
+        queue = AnalysisJobQueue(self.db_manager, FakeOllamaClient(), workers=1, poll_seconds=0.1)
+        await queue.start()
+        try:
+            job = await self.wait_for_status(job_id, "done")
+            self.assertEqual(job["attempts"], 2)
+        finally:
+            await queue.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import asyncio
+from app.ai.model_catalog import ModelCatalog
+
+class FakeOllamaClient:
+    """Cliente de Ollama simulado que cuenta las consultas."""
+
+    def __init__(self, names):
+        self.model = "modelo-a"
+        self.names = names
+        self.fail = False
+        self.show_fail = set()
+        self.show_info = {"details": {"family": "gemma"}, "modelfile": "FROM ...", "license": "..."}
+        self.tag_calls = 0
+        self.show_calls = []
+
+    def get_models(self):
+        self.tag_calls += 1
+        if self.fail:
+            raise Exception("Ollama no disponible")
+        return list(self.names)
+
+    def get_model_info(self, name):
+        self.show_calls.append(name)
+        if name in self.show_fail:
+            raise Exception(f"Error al obtener información del modelo {name}")
+        return dict(self.show_info)
+
+class TestModelCatalog(unittest.IsolatedAsyncioTestCase):
+
+    async def test_served_from_memory_with_details(self):
+        """El catálogo se carga una vez y guarda sólo los detalles relevantes."""
+        client = FakeOllamaClient(["modelo-a", "modelo-b"])
+        catalog = ModelCatalog(client, ttl=60)
+        models = catalog.models()
+        catalog.models()
+        self.assertEqual(client.tag_calls, 1)
+        self.assertEqual(models["modelo-a"], {"details": {"family": "gemma"}})
+
+    async def test_refresh_only_fetches_new_details(self):
+        """Al refrescar sólo se piden detalles de los modelos nuevos."""
+        client = FakeOllamaClient(["modelo-a"])
+        catalog = ModelCatalog(client, ttl=60)
+        catalog.models()
+        client.names.append("modelo-b")
+        self.assertTrue(catalog.has_model("modelo-b"))
+        self.assertEqual(client.show_calls, ["modelo-a", "modelo-b"])
+
+    async def test_details_failure_isolated_per_model(self):
+        """Un fallo de /api/show no descarta el refresco; el modelo se reintenta en el siguiente."""
+        client = FakeOllamaClient(["modelo-a", "modelo-b"])
+        client.show_fail.add("modelo-b")
+        catalog = ModelCatalog(client, ttl=60)
+        self.assertEqual(catalog.refresh(), ["modelo-a", "modelo-b"])
+        self.assertEqual(catalog.models()["modelo-a"], {"details": {"family": "gemma"}})
+        self.assertEqual(catalog.models()["modelo-b"], {})
+        self.assertIn("modelo-b", catalog.last_error)
+        client.show_fail.clear()
+        catalog.refresh()
+        self.assertEqual(catalog.models()["modelo-b"], {"details": {"family": "gemma"}})
+        self.assertIsNone(catalog.last_error)
+        self.assertEqual(client.show_calls, ["modelo-a", "modelo-b", "modelo-b"])
+
+    async def test_empty_details_not_refetched(self):
+        """Un modelo sin detalles relevantes ({}) no se vuelve a consultar en cada refresco."""
+        client = FakeOllamaClient(["modelo-a"])
+        client.show_info = {"modelfile": "FROM ..."}
+        catalog = ModelCatalog(client, ttl=60)
+        catalog.refresh()
+        catalog.refresh()
+        self.assertEqual(catalog.models()["modelo-a"], {})
+        self.assertEqual(client.show_calls, ["modelo-a"])
+
+    async def test_last_catalog_kept_when_refresh_fails(self):
+        """Si Ollama no responde, se sigue sirviendo el último catálogo."""
+        client = FakeOllamaClient(["modelo-a"])
+        catalog = ModelCatalog(client, ttl=0.05)
+        await catalog.start()
+        try:
+            await asyncio.sleep(0.02)
+            client.fail = True
+            await asyncio.sleep(0.1)
+            self.assertEqual(list(catalog.models()), ["modelo-a"])
+            self.assertIn("Ollama no disponible", catalog.last_error)
+        finally:
+            await catalog.stop()
+        self.assertGreater(client.tag_calls, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import PropertyMock, patch
+import httpx
+from app.ai.ollama_client import OllamaClient
+from app.ai.ollama_router import OllamaRouter
+from app.ai.ollama_transport import OllamaTransport
+
+URL = "http://ollama-prueba:11434"
+
+def make_handler(status=200, timeout=False):
+    """Crear un manejador httpx que simula las generaciones de Ollama."""
+
+    def handler(request):
+        if timeout:
+            raise httpx.ReadTimeout("tiempo de espera agotado", request=request)
+        if status != 200:
+            return httpx.Response(status, text="fallo simulado")
+        return httpx.Response(200, json={"response": "Análisis simulado", "done": True})
+
+    return handler
+
+class TestOllamaClient(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Configura un enrutador con un único host sin reintentos."""
+        self.router = OllamaRouter([URL])
+        self.transport = OllamaTransport(URL, retries=0)
+        self.router.backends[0].transport = self.transport
+        patcher = patch.object(OllamaClient, "router", new_callable=PropertyMock, return_value=self.router)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = OllamaClient()
+
+    def get_sync(self, handler):
+        """Generar con la versión síncrona sobre un transporte simulado."""
+        self.transport._client = httpx.Client(transport=httpx.MockTransport(handler))
+        try:
+            return self.client.get_response("Analiza los datos", model="modelo-prueba")
+        finally:
+            self.transport.close()
+
+    async def get_async(self, handler):
+        """Generar con la versión asíncrona sobre un transporte simulado."""
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            with patch("app.ai.ollama_transport.get_async_client", return_value=client):
+                return await self.client.get_response_async("Analiza los datos", model="modelo-prueba")
+
+    async def test_success(self):
+        """Las dos versiones devuelven el texto generado."""
+        self.assertEqual(self.get_sync(make_handler()), "Análisis simulado")
+        self.assertEqual(await self.get_async(make_handler()), "Análisis simulado")
+
+    async def test_timeout(self):
+        """Un timeout se traduce en un error de comunicación."""
+        with self.assertRaisesRegex(Exception, "Error de comunicación con Ollama"):
+            self.get_sync(make_handler(timeout=True))
+        with self.assertRaisesRegex(Exception, "Error de comunicación con Ollama"):
+            await self.get_async(make_handler(timeout=True))
+
+    async def test_http_errors(self):
+        """Los errores 4xx y 5xx se traducen en un error de comunicación."""
+        for status in (404, 503):
+            with self.subTest(status=status):
+                with self.assertRaisesRegex(Exception, "Error de comunicación con Ollama"):
+                    self.get_sync(make_handler(status=status))
+                with self.assertRaisesRegex(Exception, "Error de comunicación con Ollama"):
+                    await self.get_async(make_handler(status=status))
+
+if __name__ == "__main__":
+    unittest.main()
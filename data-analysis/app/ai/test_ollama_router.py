@@ -0,0 +1,123 @@
+import unittest
+import json
+import time
+import socket
+import asyncio
+import threading
+from unittest.mock import patch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.ai.ollama_router import OllamaRouter
+from app.ai.ollama_transport import OPERATIONS, OllamaTransportError
+
+def stub_handler(models, delay=0.2):
+    """Crear un manejador que simula un host de Ollama con ciertos modelos."""
+
+    class StubOllama(BaseHTTPRequestHandler):
+        generated = 0
+
+        def do_GET(self):
+            self.reply({"models": [{"name": name} for name in models]})
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            type(self).generated += 1
+            time.sleep(delay)
+            self.reply({"response": "ok"})
+
+        def reply(self, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubOllama
+
+def free_port():
+    """Puerto local sin ningún servidor escuchando."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class TestOllamaRouter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Arranca dos hosts de Ollama simulados."""
+        self.servers = []
+        self.handlers = []
+        for models in (["modelo-a", "modelo-b"], ["modelo-a"]):
+            handler = stub_handler(models)
+            server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.servers.append(server)
+            self.handlers.append(handler)
+        self.urls = [f"http://127.0.0.1:{s.server_address[1]}" for s in self.servers]
+
+    def tearDown(self):
+        """Detiene los hosts simulados."""
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    async def generate(self, router, model):
+        """Enviar una generación a través del enrutador."""
+        response = await router.call_async(
+            model, lambda t: t.request_async("POST", "/api/generate", "generate", json={"model": model})
+        )
+        return response.json()["response"]
+
+    async def test_least_loaded_dispatch(self):
+        """Las generaciones simultáneas se reparten entre los hosts."""
+        router = OllamaRouter(self.urls)
+        results = await asyncio.gather(*[self.generate(router, "modelo-a") for _ in range(4)])
+        self.assertEqual(results, ["ok"] * 4)
+        self.assertEqual([h.generated for h in self.handlers], [2, 2])
+        self.assertTrue(all(b["in_flight"] == 0 for b in router.status()))
+
+    async def test_model_routed_to_host_that_has_it(self):
+        """Un modelo sólo se envía a los hosts que lo tienen."""
+        router = OllamaRouter(self.urls)
+        router.check_health()
+        await asyncio.gather(*[self.generate(router, "modelo-b") for _ in range(3)])
+        self.assertEqual([h.generated for h in self.handlers], [3, 0])
+        with self.assertRaises(OllamaTransportError):
+            router.pick("modelo-c")
+
+    async def test_unhealthy_host_drained_and_failover(self):
+        """Un host caído deja de recibir tráfico y sus peticiones pasan a otro host."""
+        dead = f"http://127.0.0.1:{free_port()}"
+        router = OllamaRouter([dead, self.urls[1]])
+        router.backends[0].transport.retries = 0
+
+        # Sin comprobación de salud todavía: el fallo de conexión se reintenta en el otro host
+        self.assertEqual(await self.generate(router, "modelo-a"), "ok")
+
+        router.check_health()
+        status = {b["url"]: b for b in router.status()}
+        self.assertFalse(status[dead]["healthy"])
+        self.assertEqual(router.pick("modelo-a").url, self.urls[1])
+
+    async def test_generation_read_timeout_not_failed_over(self):
+        """Una generación que llegó al host y agotó el tiempo no se reenvía a otro host."""
+        handler = stub_handler(["modelo-a"], delay=1.0)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.servers.append(server)
+        router = OllamaRouter([f"http://127.0.0.1:{server.server_address[1]}", self.urls[1]])
+        with patch.dict(OPERATIONS["generate"], timeout=0.2):
+            with self.assertRaises(OllamaTransportError) as ctx:
+                await self.generate(router, "modelo-a")
+        self.assertFalse(ctx.exception.retryable)
+        self.assertEqual(handler.generated, 1)
+        self.assertEqual(self.handlers[1].generated, 0)
+
+    async def test_model_names_union(self):
+        """La lista de modelos es la unión de los de todos los hosts."""
+        router = OllamaRouter(self.urls)
+        self.assertEqual(router.model_names(), ["modelo-a", "modelo-b"])
+
+if __name__ == '__main__':
+    unittest.main()
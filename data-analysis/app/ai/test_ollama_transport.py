@@ -0,0 +1,102 @@
+import unittest
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.ai.ollama_transport import CircuitBreaker, CircuitOpenError, OllamaTransport, OllamaTransportError
+
+class StubOllama(BaseHTTPRequestHandler):
+    """Servidor de Ollama simulado: falla con 503 las primeras peticiones."""
+
+    failures_left = 0
+    requests = 0
+
+    def do_GET(self):
+        cls = type(self)
+        cls.requests += 1
+        if cls.failures_left > 0:
+            cls.failures_left -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = json.dumps({"models": [{"name": "modelo-prueba"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def free_port():
+    """Puerto local sin ningún servidor escuchando."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class TestOllamaTransport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Arranca el servidor simulado."""
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        """Detiene el servidor simulado."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        """Reinicia el estado del servidor simulado."""
+        StubOllama.failures_left = 0
+        StubOllama.requests = 0
+
+    def test_transient_errors_retried(self):
+        """Un 503 transitorio se reintenta y la petición acaba bien."""
+        StubOllama.failures_left = 2
+        transport = OllamaTransport(self.url, retries=2, backoff=0.01)
+        response = transport.request("GET", "/api/tags", "tags")
+        self.assertEqual(response.json()["models"][0]["name"], "modelo-prueba")
+        self.assertEqual(StubOllama.requests, 3)
+        self.assertEqual(transport.breaker.state, "closed")
+        transport.close()
+
+    def test_breaker_opens_and_fails_fast(self):
+        """Con el host caído, el circuito se abre y las peticiones fallan sin conectar."""
+        breaker = CircuitBreaker(threshold=3, reset_timeout=60)
+        transport = OllamaTransport(f"http://127.0.0.1:{free_port()}", retries=1, backoff=0.01, breaker=breaker)
+        with self.assertRaises(OllamaTransportError):
+            transport.request("GET", "/api/tags", "tags")
+        with self.assertRaises(OllamaTransportError):
+            transport.request("GET", "/api/tags", "tags")
+        self.assertEqual(breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            transport.request("GET", "/api/tags", "tags")
+        transport.close()
+
+    def test_half_open_trial_closes_breaker(self):
+        """Pasado el tiempo de espera, una petición correcta cierra el circuito."""
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        transport = OllamaTransport(self.url, retries=0, breaker=breaker)
+        transport.request("GET", "/api/tags", "tags")
+        self.assertEqual(breaker.state, "closed")
+        transport.close()
+
+    def test_half_open_allows_single_trial(self):
+        """En semiabierto sólo se deja pasar una petición de prueba."""
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        breaker.allow()
+        with self.assertRaises(CircuitOpenError):
+            breaker.allow()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import asyncio
+from app.ai.single_flight import SingleFlight
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+
+    async def test_same_key_runs_once(self):
+        """Las llamadas concurrentes con la misma clave comparten una ejecución."""
+        flights = SingleFlight()
+        calls = []
+
+        async def work(value):
+            calls.append(value)
+            await asyncio.sleep(0.05)
+            return value * 2
+
+        results = await asyncio.gather(
+            flights.do("a", lambda: work(1)),
+            flights.do("a", lambda: work(1)),
+            flights.do("b", lambda: work(5)),
+        )
+        self.assertEqual(results, [2, 2, 10])
+        self.assertEqual(calls, [1, 5])
+        self.assertEqual((flights.executions, flights.coalesced, flights.in_flight), (2, 1, 0))
+
+    async def test_error_shared_and_not_cached(self):
+        """Un error se propaga a todos los que esperan y la siguiente llamada reintenta."""
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.02)
+            raise Exception("Ollama no disponible")
+
+        results = await asyncio.gather(flights.do("a", fail), flights.do("a", fail), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, Exception) for r in results))
+
+        async def ok():
+            return "texto"
+
+        self.assertEqual(await flights.do("a", ok), "texto")
+
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        """Si el llamante que inició la operación se cancela, el resto recibe el resultado."""
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "texto"
+
+        first = asyncio.create_task(flights.do("a", work))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flights.do("a", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, "texto")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import asyncio
+import json
+from app.db.manager import DBManager
+from app.ai.streaming import stream_analysis
+
+class FakeStreamingClient:
+    """Cliente de Ollama simulado que emite la respuesta por fragmentos."""
+
+    def __init__(self, tokens, fail_after=None):
+        self.model = "modelo-prueba"
+        self.tokens = tokens
+        self.fail_after = fail_after
+
+    async def stream_response(self, prompt, model=None):
+        for n, token in enumerate(self.tokens):
+            if self.fail_after is not None and n == self.fail_after:
+                raise Exception("Ollama no disponible")
+            await asyncio.sleep(0.01)
+            yield {"response": token, "done": False}
+        yield {"response": "", "done": True, "eval_count": len(self.tokens)}
+
+def parse_events(raw_events):
+    """Convertir eventos SSE en tuplas (evento, datos)."""
+    parsed = []
+    for raw in raw_events:
+        lines = raw.strip().split("\n")
+        parsed.append((lines[0][len("event: "):], json.loads(lines[1][len("data: "):])))
+    return parsed
+
+class TestStreamAnalysis(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Configura una base de datos en memoria con una lectura."""
+        self.db_manager = DBManager(db_path=":memory:")
+        self.data_id = self.db_manager.save_sensor_data({"sensor_bmp390": {"temperatura_a": 22.0}})
+
+    def tearDown(self):
+        """Cierra la base de datos."""
+        self.db_manager.close()
+
+    async def test_tokens_relayed_and_result_saved(self):
+        """Los tokens se emiten en orden y el texto completo queda guardado."""
+        client = FakeStreamingClient(["Tempera", "tura ", "estable."])
+        events = parse_events([e async for e in stream_analysis(self.db_manager, client, "prompt", self.data_id)])
+
+        self.assertEqual(events[0], ("start", {"data_id": self.data_id, "model": "modelo-prueba"}))
+        self.assertEqual([d["text"] for e, d in events if e == "token"], ["Tempera", "tura ", "estable."])
+        name, done = events[-1]
+        self.assertEqual(name, "done")
+        self.assertEqual(done["eval_count"], 3)
+        saved = self.db_manager.get_analysis_result(done["response_id"])
+        self.assertEqual(saved["result"], "Temperatura estable.")
+
+    async def test_result_saved_after_client_disconnects(self):
+        """Si el cliente se va a mitad del stream, la generación se completa y se guarda."""
+        client = FakeStreamingClient(["a", "b", "c", "d"])
+        stream = stream_analysis(self.db_manager, client, "prompt", self.data_id)
+        await stream.__anext__()
+        await stream.__anext__()
+        await stream.aclose()
+
+        for _ in range(100):
+            if self.db_manager.get_analysis_results(1):
+                break
+            await asyncio.sleep(0.02)
+        self.assertEqual(self.db_manager.get_analysis_results(1)[0]["result"], "abcd")
+
+    async def test_error_event(self):
+        """Un fallo de Ollama termina el stream con un evento de error."""
+        client = FakeStreamingClient(["a", "b"], fail_after=1)
+        events = parse_events([e async for e in stream_analysis(self.db_manager, client, "prompt", self.data_id)])
+        self.assertEqual(events[-1][0], "error")
+        self.assertIn("Ollama no disponible", events[-1][1]["detail"])
+        self.assertEqual(self.db_manager.get_analysis_results(1), [])
+
+if __name__ == '__main__':
+    unittest.main()
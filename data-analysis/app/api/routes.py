@@ -2,16 +2,43 @@
 Rutas de la API para la aplicación.
 """
 import os
+import math
 import logging
-from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import Dict, Any, List, Optional
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, Any, List, Optional, Tuple
 import json
+import asyncio
 
-from app.models.schemas import SensorData, AnalysisResponse, ModelInfo, ModelList
-from app.db.manager import DBManager
+from app.models.schemas import (
+    SensorData,
+    AnalysisResponse,
+    ModelInfo,
+    ModelList,
+    BatchIngestResponse,
+    JobResponse,
+    JobStatus,
+    BatchAnalysisRequest,
+    BatchAnalysisResponse,
+)
+from app.db.manager import DBManager, encode_cursor
+from app.db.rollups import RESOLUTIONS
+from app.db.writer import GroupCommitWriter, IngestQueueFull
 from app.ai.ollama_client import OllamaClient
+from app.ai.generation_metrics import generation_metrics
+from app.ai.job_queue import AnalysisJobQueue
+from app.ai.analysis_cache import AnalysisCache
+from app.ai.model_catalog import ModelCatalog
+from app.ai.change_detector import ChangeDetector
+from app.ai.streaming import stream_analysis
+from app.utils.data_fetcher import get_sensor_data_async
+from app.utils.ingest_scheduler import IngestScheduler
+from app.utils.sensor_payload import PayloadError, parse_readings
+from app.utils import sensor_analytics
+from app.utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry as metrics_registry
 from app.utils.prompt_generator import generate_prompt
-from app.utils.data_fetcher import get_sensor_data
 
 logger = logging.getLogger(__name__)
 
@@ -20,12 +47,99 @@ router = APIRouter()
 # Configuración
 db_manager = DBManager()
 ollama_client = OllamaClient()
+ingest_writer = GroupCommitWriter(db_manager)
+analysis_cache = AnalysisCache(db_manager)
+model_catalog = ModelCatalog(ollama_client)
+job_queue = AnalysisJobQueue(db_manager, ollama_client, cache=analysis_cache)
+change_detector = ChangeDetector()
+# Sin detección de cambios, la ingesta programada analiza a intervalo fijo
+ingest_scheduler = IngestScheduler(
+    ingest_writer, job_queue, detector=change_detector if change_detector.enabled else None
+)
 SENSOR_API_URL = os.getenv("SENSOR_API_URL", "http://0.0.0.0:8080/datos")
 DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "gemma3:4b")
+INGEST_MAX_BATCH = int(os.getenv("INGEST_MAX_BATCH", "10000"))
+SERIES_DEFAULT_RANGE = int(os.getenv("SERIES_DEFAULT_RANGE", str(24 * 3600)))
+SERIES_MAX_POINTS = int(os.getenv("SERIES_MAX_POINTS", "5000"))
+ANALYSIS_BATCH_MAX_IDS = int(os.getenv("ANALYSIS_BATCH_MAX_IDS", "100"))
+
+def parse_time_bound(value: Optional[str], name: str) -> Optional[int]:
+    """
+    Convertir un límite temporal de la query a segundos epoch.
+    
+    Acepta segundos epoch o una fecha ISO 8601 (sin zona = hora local).
+    
+    Args:
+        value: Valor recibido en la query
+        name: Nombre del parámetro (para el mensaje de error)
+        
+    Returns:
+        Segundos epoch o None si no se indicó
+    """
+    if value is None or value == "":
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = None
+    try:
+        if seconds is None:
+            return int(datetime.fromisoformat(value).timestamp())
+        # "inf", "nan" o 1e400 no son marcas de tiempo; tampoco lo que no cabe en un INTEGER de SQLite
+        if math.isfinite(seconds) and abs(seconds) < 2 ** 63:
+            return int(seconds)
+    except (ValueError, OverflowError, OSError):
+        pass
+    raise HTTPException(
+        status_code=400,
+        detail=f"Parámetro '{name}' no válido: use segundos epoch o fecha ISO 8601"
+    )
+
+def _analytics_window(
+    db: DBManager,
+    campos: Optional[str],
+    desde: Optional[str],
+    hasta: Optional[str],
+    fields: Optional[List[str]] = None
+) -> Tuple[int, int, "sensor_analytics.SensorWindow"]:
+    """
+    Leer la ventana de lecturas de un endpoint de /analytics.
+    
+    Sin rango explícito se usan las últimas SERIES_DEFAULT_RANGE segundos.
+    
+    Args:
+        db: Gestor de base de datos
+        campos: Campos separados por comas (por defecto, sensor_analytics.DEFAULT_FIELDS)
+        desde: Inicio opcional del rango temporal
+        hasta: Fin opcional del rango temporal
+        fields: Campos fijos (ignora `campos`)
+        
+    Returns:
+        Inicio, fin y ventana de lecturas
+    """
+    if fields is None:
+        fields = [field.strip() for field in (campos or "").split(",") if field.strip()]
+        fields = fields or list(sensor_analytics.DEFAULT_FIELDS)
+    end = parse_time_bound(hasta, "to")
+    if end is None:
+        end = int(datetime.now().timestamp())
+    start = parse_time_bound(desde, "from")
+    if start is None:
+        start = end - SERIES_DEFAULT_RANGE
+    try:
+        return start, end, sensor_analytics.load_window(db, fields, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Error al leer el historial de sensores: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al leer el historial de sensores: {str(e)}"
+        )
 
 def get_db():
-    """Obtener instancia de la base de datos."""
-    return DBManager()
+    """Obtener la instancia compartida de la base de datos."""
+    return db_manager
 
 def get_ollama_client():
     """Obtener instancia del cliente de Ollama."""
@@ -36,101 +150,252 @@ async def root():
     """Endpoint raíz que muestra información básica sobre la API"""
     return {"message": "API de Análisis de Datos de Sensores"}
 
-@router.get("/procesar-datos", response_model=AnalysisResponse, summary="Procesar datos de sensores")
+@router.get("/procesar-datos", response_model=JobResponse, status_code=202, summary="Procesar datos de sensores")
 async def procesar_datos(
-    db: DBManager = Depends(get_db),
-    ollama_client: OllamaClient = Depends(get_ollama_client)
+    response: Response,
+    forzar: bool = Query(False, description="Encolar el análisis aunque las condiciones no hayan cambiado"),
+    db: DBManager = Depends(get_db)
 ):
     """
-    Endpoint para procesar datos de sensores, guardarlos en la base de datos
-    y generar una respuesta con un modelo de IA.
+    Endpoint para obtener datos de sensores, guardarlos en la base de datos
+    y encolar su análisis con un modelo de IA.
+    
+    La respuesta es inmediata: el análisis lo genera en segundo plano la
+    cola de trabajos y su estado se consulta en GET /jobs/{job_id}. Si el
+    detector de cambios considera que las condiciones no han variado desde
+    el análisis vigente de ese dispositivo o fuente, no se encola nada y se
+    devuelve el análisis de la lectura que fijó la referencia (o su trabajo,
+    si aún está en curso).
     
     Returns:
-        Resultado del análisis
+        Trabajo de análisis encolado, o el análisis vigente si no hay cambios
     """
     try:
         # Obtener datos de los sensores
-        logger.info("1. Obteniendo datos de sensores...")
-        data = get_sensor_data()
+        logger.debug("1. Obteniendo datos de sensores...")
+        data = await get_sensor_data_async()
         
         # Depuración: verificar el tipo de dato
-        logger.info(f"2. Tipo de datos recibidos: {type(data)}")
+        logger.debug("2. Tipo de datos recibidos: %s", type(data).__name__)
         if isinstance(data, str):
-            logger.info("Datos recibidos como string, intentando convertir a JSON")
+            logger.debug("Datos recibidos como string, intentando convertir a JSON")
             try:
                 data = json.loads(data)
-                logger.info("Conversión a JSON exitosa")
+                logger.debug("Conversión a JSON exitosa")
             except json.JSONDecodeError as e:
-                logger.error(f"Error al decodificar JSON: {str(e)}")
+                logger.error("Error al decodificar JSON: %s", e)
                 raise Exception(f"Error al decodificar JSON: {str(e)}")
         
         # Guardar datos en la base de datos
-        logger.info("3. Guardando datos en la base de datos...")
-        data_str = json.dumps(data) if not isinstance(data, str) else data
-        data_id = db.save_sensor_data(data_str)
-        logger.info(f"4. Datos guardados con ID: {data_id}")
+        logger.debug("3. Guardando datos en la base de datos...")
+        data_id = await run_in_threadpool(ingest_writer.save, data)
+        logger.debug("4. Datos guardados con ID: %s", data_id)
         
-        # Generar prompt para Ollama
-        logger.info("5. Generando prompt...")
-        try:
-            prompt = generate_prompt(data)
-            logger.info("6. Prompt generado correctamente")
-        except Exception as e:
-            logger.error(f"Error al generar prompt: {str(e)}")
-            raise Exception(f"Error al generar prompt: {str(e)}")
-        
-        # Obtener respuesta de Ollama
-        logger.info("7. Obteniendo respuesta de Ollama...")
-        try:
-            response = ollama_client.get_response(prompt)
-            logger.info("8. Respuesta obtenida correctamente")
-        except Exception as e:
-            logger.error(f"Error al obtener respuesta de Ollama: {str(e)}")
-            raise Exception(f"Error al obtener respuesta de Ollama: {str(e)}")
-        
-        # Guardar respuesta en la base de datos
-        logger.info("9. Guardando respuesta en la base de datos...")
-        response_id = db.save_analysis_result(data_id, response)
-        logger.info(f"10. Respuesta guardada con ID: {response_id}")
-        
-        return AnalysisResponse(
-            message="Datos procesados correctamente",
+        # Decidir si las condiciones justifican un análisis nuevo (estado por dispositivo o fuente)
+        reason = change_detector.observe(data, source=SENSOR_API_URL, data_id=data_id, force=forzar)
+        if reason is None:
+            reference_id = change_detector.reference_id(data, source=SENSOR_API_URL)
+            analysis = await run_in_threadpool(db.get_reading_analysis, reference_id) if reference_id else None
+            if analysis and analysis["status"] == "done" and analysis["response_id"] is not None:
+                logger.info("5. Sin cambios significativos, se devuelve el análisis %s", analysis["response_id"])
+                response.status_code = 200
+                return JobResponse(
+                    message="Datos guardados, sin cambios desde el último análisis",
+                    data_id=data_id,
+                    status="unchanged",
+                    response_id=analysis["response_id"],
+                    response=analysis["response"]
+                )
+            if analysis and analysis["status"] in ("queued", "running"):
+                logger.info("5. Sin cambios significativos, el análisis de referencia sigue en curso (trabajo %s)", analysis["job_id"])
+                return JobResponse(
+                    message="Datos guardados, sin cambios; el análisis de referencia está en curso",
+                    job_id=analysis["job_id"],
+                    data_id=data_id,
+                    status="queued",
+                    reason="análisis de referencia en curso"
+                )
+            # El análisis de referencia falló o no existe: esta lectura pasa a ser la referencia
+            reason = change_detector.reset_reference(
+                data, "análisis de referencia no disponible", source=SENSOR_API_URL, data_id=data_id
+            )
+        
+        # Encolar el análisis
+        logger.debug("5. Encolando análisis...")
+        job_id = await job_queue.enqueue(data_id)
+        logger.info("6. Análisis encolado con ID de trabajo: %s", job_id)
+        
+        return JobResponse(
+            message="Datos guardados, análisis en cola",
+            job_id=job_id,
             data_id=data_id,
-            response_id=response_id,
-            response=response
+            status="queued",
+            reason=reason
         )
     except Exception as e:
-        logger.error(f"Error al procesar datos: {str(e)}")
+        logger.error("Error al procesar datos: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error al procesar datos: {str(e)}"
         )
 
+@router.get("/jobs/{job_id}", response_model=JobStatus, summary="Estado de un trabajo de análisis")
+def obtener_trabajo(
+    job_id: int,
+    db: DBManager = Depends(get_db)
+) -> JobStatus:
+    """
+    Obtener el estado de un trabajo de análisis y, si terminó, su resultado.
+    
+    Args:
+        job_id: ID del trabajo
+        
+    Returns:
+        Estado del trabajo ('queued', 'running', 'done' o 'error')
+    """
+    try:
+        job = db.get_job(job_id)
+    except Exception as e:
+        logger.error("Error al obtener trabajo: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al obtener trabajo: {str(e)}"
+        )
+    if not job:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Trabajo con ID {job_id} no encontrado"
+        )
+    return JobStatus(**job)
+
+@router.post("/analisis/lote", response_model=BatchAnalysisResponse, status_code=202, summary="Analizar varias lecturas juntas")
+async def analizar_lote(
+    peticion: BatchAnalysisRequest
+) -> BatchAnalysisResponse:
+    """
+    Encolar el análisis conjunto de varias lecturas ya guardadas.
+    
+    Las lecturas se analizan en prompts de hasta ANALYSIS_BATCH_SIZE
+    lecturas y cada una recibe su propio trabajo y su propia respuesta.
+    
+    Args:
+        peticion: IDs de las lecturas y modelo opcional
+        
+    Returns:
+        Lote encolado con un trabajo por lectura
+    """
+    if not peticion.data_ids:
+        raise HTTPException(status_code=400, detail="La lista de data_ids está vacía")
+    if len(peticion.data_ids) > ANALYSIS_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El lote supera el máximo de {ANALYSIS_BATCH_MAX_IDS} lecturas"
+        )
+    try:
+        batch_id, job_ids = await job_queue.enqueue_batch(peticion.data_ids, peticion.modelo)
+        return BatchAnalysisResponse(
+            message="Análisis por lotes en cola",
+            batch_id=batch_id,
+            job_ids=job_ids,
+            data_ids=peticion.data_ids,
+            status="queued"
+        )
+    except Exception as e:
+        logger.error("Error al encolar el análisis por lotes: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al encolar el análisis por lotes: {str(e)}"
+        )
+
+@router.get("/procesar-datos/stream", summary="Procesar datos de sensores con respuesta en streaming")
+async def procesar_datos_stream(
+    data_id: Optional[int] = Query(None, description="ID de una lectura ya guardada; si se omite, se obtiene una nueva"),
+    db: DBManager = Depends(get_db)
+) -> StreamingResponse:
+    """
+    Generar el análisis de unos datos de sensores y enviarlo token a token
+    como Server-Sent Events.
+
+    Eventos: "start", "token" (texto parcial), "done" (ID de la respuesta
+    guardada) y "error". El texto completo se guarda en la base de datos al
+    terminar, aunque el cliente se desconecte antes.
+
+    Args:
+        data_id: ID opcional de una lectura existente
+
+    Returns:
+        Flujo text/event-stream
+    """
+    try:
+        if data_id is None:
+            data = await get_sensor_data_async()
+            if isinstance(data, str):
+                data = json.loads(data)
+            data_id = await run_in_threadpool(ingest_writer.save, data)
+            logger.debug("Datos guardados con ID: %s", data_id)
+        else:
+            data = await run_in_threadpool(db.get_sensor_reading, data_id)
+    except Exception as e:
+        logger.error("Error al procesar datos: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al procesar datos: {str(e)}"
+        )
+    if data is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Datos de sensores con ID {data_id} no encontrados"
+        )
+
+    prompt = generate_prompt(data, model=ollama_client.model)
+    return StreamingResponse(
+        stream_analysis(db, ollama_client, prompt, data_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/respuestas", response_model=List[Dict[str, Any]], summary="Obtener todas las respuestas")
-async def obtener_respuestas(
+def obtener_respuestas(
+    response: Response,
     limit: int = 10,
+    desde: Optional[str] = Query(None, alias="from", description="Inicio del rango (epoch o ISO 8601)"),
+    hasta: Optional[str] = Query(None, alias="to", description="Fin del rango (epoch o ISO 8601)"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página siguiente"),
     db: DBManager = Depends(get_db)
 ) -> List[Dict[str, Any]]:
     """
-    Obtener respuestas de análisis.
+    Obtener respuestas de análisis, de la más reciente a la más antigua.
+    
+    Si hay más resultados, el cursor de la página siguiente se devuelve en
+    la cabecera X-Next-Cursor.
     
     Args:
         limit: Número máximo de respuestas a obtener
+        desde: Inicio opcional del rango temporal
+        hasta: Fin opcional del rango temporal
+        cursor: Cursor devuelto por la página anterior
         
     Returns:
         Lista de respuestas
     """
+    start = parse_time_bound(desde, "from")
+    end = parse_time_bound(hasta, "to")
     try:
-        return db.get_analysis_results(limit)
+        results = db.get_analysis_results(limit, start, end, cursor)
+        if results and len(results) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(results[-1]["epoch"], results[-1]["id"])
+        return results
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error al obtener respuestas: {str(e)}")
+        logger.error("Error al obtener respuestas: %s", e)
         raise HTTPException(
             status_code=500, 
             detail=f"Error al obtener respuestas: {str(e)}"
         )
 
 @router.get("/respuestas/{response_id}", response_model=Dict[str, Any], summary="Obtener respuesta por ID")
-async def obtener_respuesta(
+def obtener_respuesta(
     response_id: int,
     db: DBManager = Depends(get_db)
 ) -> Dict[str, Any]:
@@ -154,45 +419,117 @@ async def obtener_respuesta(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error al obtener respuesta: {str(e)}")
+        logger.error("Error al obtener respuesta: %s", e)
         raise HTTPException(
             status_code=500, 
             detail=f"Error al obtener respuesta: {str(e)}"
         )
 
+@router.get("/cache/estadisticas", response_model=Dict[str, Any], summary="Estadísticas de la caché de análisis")
+def estadisticas_cache() -> Dict[str, Any]:
+    """
+    Obtener los contadores de la caché de análisis.
+    
+    Returns:
+        Aciertos, fallos, tasa de aciertos, entradas y configuración de la caché
+    """
+    try:
+        return analysis_cache.stats()
+    except Exception as e:
+        logger.error("Error al obtener estadísticas de la caché: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al obtener estadísticas de la caché: {str(e)}"
+        )
+
+@router.get("/analisis/detector", response_model=Dict[str, Any], summary="Estado del detector de cambios")
+def estado_detector() -> Dict[str, Any]:
+    """
+    Obtener el estado del detector de cambios que decide qué lecturas se analizan.
+    
+    Returns:
+        Lecturas observadas, análisis disparados, último motivo y media
+        suavizada y referencia de cada métrica
+    """
+    return change_detector.status()
+
+@router.get("/ingesta/estado", response_model=Dict[str, Any], summary="Estado de la ingesta programada")
+def estado_ingesta() -> Dict[str, Any]:
+    """
+    Obtener el estado de la ingesta continua de lecturas.
+    
+    Returns:
+        Fuentes consultadas con sus contadores y errores, última lectura
+        guardada y última lectura enviada al análisis programado
+    """
+    return ingest_scheduler.status()
+
+@router.get("/ollama/hosts", response_model=List[Dict[str, Any]], summary="Estado de los hosts de Ollama")
+def estado_hosts_ollama() -> List[Dict[str, Any]]:
+    """
+    Obtener el estado de los hosts de Ollama entre los que se reparten las peticiones.
+    
+    Returns:
+        Salud, circuito, peticiones en curso, latencia media y modelos de cada host
+    """
+    return ollama_client.router.status()
+
+@router.get("/ollama/metricas", response_model=Dict[str, Dict[str, Any]], summary="Tiempos de prefill y generación")
+def metricas_ollama() -> Dict[str, Dict[str, Any]]:
+    """
+    Obtener los tiempos de las generaciones de Ollama por modelo.
+    
+    Returns:
+        Tiempo medio de prefill (procesado del prompt) y de generación,
+        tokens por segundo de cada fase y datos de la última generación
+    """
+    return generation_metrics.snapshot()
+
+@router.get("/metrics", response_class=PlainTextResponse, summary="Métricas en formato Prometheus")
+def metricas_prometheus() -> PlainTextResponse:
+    """
+    Exponer las métricas de la API en el formato de texto de Prometheus.
+    
+    Returns:
+        Duración y errores de cada etapa del análisis, tiempos de prefill,
+        generación y carga de Ollama, tokens y generaciones en curso
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 @router.get("/modelos", response_model=ModelList)
-async def listar_modelos(
+def listar_modelos(
     ollama_client: OllamaClient = Depends(get_ollama_client)
 ) -> ModelList:
     """
     Listar los modelos disponibles en Ollama.
     
+    Se sirve desde el catálogo en memoria, que se refresca en segundo plano.
+    
     Returns:
         Lista de modelos disponibles
     """
     try:
-        models_list = ollama_client.get_models()
-        logger.info(f"Modelos obtenidos: {models_list}")
+        catalog = model_catalog.models()
         
         models = []
-        for model_name in models_list:
+        for model_name, details in catalog.items():
             model_info = ModelInfo(
                 nombre=model_name,
                 activo=(model_name == ollama_client.model),
-                detalles={}
+                detalles=details
             )
             models.append(model_info)
         
         return ModelList(modelos=models, modelo_activo=ollama_client.model)
     except Exception as e:
-        logger.error(f"Error al obtener los modelos: {str(e)}")
+        logger.error("Error al obtener los modelos: %s", e)
         raise HTTPException(
             status_code=500, 
             detail=f"Error al obtener los modelos: {str(e)}"
         )
 
 @router.post("/cambiar-modelo/{nombre_modelo}")
-async def cambiar_modelo(
+def cambiar_modelo(
     nombre_modelo: str,
     descargar: bool = Query(False, description="Descargar el modelo si no está disponible"),
     ollama_client: OllamaClient = Depends(get_ollama_client)
@@ -209,8 +546,7 @@ async def cambiar_modelo(
     """
     try:
         # Comprobar si el modelo existe
-        models_list = ollama_client.get_models()
-        model_exists = nombre_modelo in models_list
+        model_exists = model_catalog.has_model(nombre_modelo)
         
         if not model_exists and descargar:
             # Descargar manualmente no es posible desde aquí
@@ -226,7 +562,7 @@ async def cambiar_modelo(
         
         # Cambiar el modelo activo
         ollama_client.model = nombre_modelo
-        logger.info(f"Modelo cambiado a {nombre_modelo}")
+        logger.info("Modelo cambiado a %s", nombre_modelo)
         
         return {
             "mensaje": f"Modelo cambiado correctamente a {nombre_modelo}",
@@ -235,7 +571,7 @@ async def cambiar_modelo(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error al cambiar el modelo: {str(e)}")
+        logger.error("Error al cambiar el modelo: %s", e)
         raise HTTPException(
             status_code=500, 
             detail=f"Error al cambiar el modelo: {str(e)}"
@@ -253,29 +589,47 @@ def fetch_sensor_data() -> Dict[str, Any]:
         response.raise_for_status()
         return response.json()
     except requests.RequestException as e:
-        logger.error(f"Error al obtener datos de sensores: {str(e)}")
+        logger.error("Error al obtener datos de sensores: %s", e)
         raise Exception(f"Error al obtener datos de sensores: {str(e)}")
 
 @router.get("/sensor-data", summary="Obtener datos de sensores para la app Expo")
-async def get_sensor_data_for_expo(
+def get_sensor_data_for_expo(
     limit: int = Query(5, description="Número de registros a obtener"),
+    desde: Optional[str] = Query(None, alias="from", description="Inicio del rango (epoch o ISO 8601)"),
+    hasta: Optional[str] = Query(None, alias="to", description="Fin del rango (epoch o ISO 8601)"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página siguiente"),
     db: DBManager = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Endpoint para proporcionar datos de sensores a la aplicación Expo.
     
+    Los registros se devuelven del más reciente al más antiguo. Para recorrer
+    el historial se pasa el "next_cursor" de la respuesta como "cursor".
+    
     Args:
         limit: Número máximo de registros a obtener
+        desde: Inicio opcional del rango temporal
+        hasta: Fin opcional del rango temporal
+        cursor: Cursor devuelto por la página anterior
         
     Returns:
         Datos de sensores procesados para la app
     """
+    start = parse_time_bound(desde, "from")
+    end = parse_time_bound(hasta, "to")
     try:
-        # Obtener los últimos registros de datos de sensores
-        sensor_records = db.get_sensor_records(limit)
+        # Obtener los registros de datos de sensores de la página pedida
+        try:
+            sensor_records = db.get_sensor_records(limit, start, end, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         if not sensor_records:
-            return {"message": "No hay datos de sensores disponibles", "data": []}
+            return {"message": "No hay datos de sensores disponibles", "data": [], "next_cursor": None}
+        
+        next_cursor = None
+        if len(sensor_records) == limit:
+            next_cursor = encode_cursor(sensor_records[-1]["epoch"], sensor_records[-1]["id"])
         
         # Preparar datos para la app
         processed_records = []
@@ -290,18 +644,369 @@ async def get_sensor_data_for_expo(
                 
                 processed_records.append(data_dict)
             except json.JSONDecodeError:
-                logger.error(f"Error al decodificar datos del registro {record['id']}")
+                logger.error("Error al decodificar datos del registro %s", record['id'])
                 continue
         
         return {
             "message": "Datos obtenidos correctamente",
             "count": len(processed_records),
-            "data": processed_records
+            "data": processed_records,
+            "next_cursor": next_cursor
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error al obtener datos para Expo: {str(e)}")
+        logger.error("Error al obtener datos para Expo: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error al obtener datos para Expo: {str(e)}"
-        ) 
\ No newline at end of file
+        ) 
+
+@router.post("/sensor-data", response_model=BatchIngestResponse, status_code=201, summary="Recibir lecturas enviadas por un robot")
+async def recibir_lecturas(request: Request) -> BatchIngestResponse:
+    """
+    Recibir una lectura o una lista de lecturas enviadas por un robot.
+    
+    El cuerpo puede ir en JSON, MessagePack (application/msgpack) o CBOR
+    (application/cbor) y comprimido con gzip o deflate (Content-Encoding).
+    Las lecturas se validan contra el esquema SensorData y se guardan con el
+    escritor por lotes, que agrupa en una transacción las lecturas de
+    peticiones concurrentes.
+    
+    Returns:
+        IDs de los registros insertados
+    """
+    body = await request.body()
+    try:
+        # Descomprimir y validar hasta INGEST_MAX_BODY_BYTES no debe bloquear el event loop
+        readings = await run_in_threadpool(
+            parse_readings,
+            body,
+            request.headers.get("content-type"),
+            request.headers.get("content-encoding"),
+        )
+    except PayloadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if not readings:
+        raise HTTPException(status_code=400, detail="El lote de lecturas está vacío")
+    if len(readings) > INGEST_MAX_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El lote supera el máximo de {INGEST_MAX_BATCH} lecturas"
+        )
+    try:
+        # Las lecturas de la petición se encolan como una unidad: se guardan
+        # todas o ninguna, y un reintento del cliente no crea duplicados
+        future = await run_in_threadpool(ingest_writer.submit_many, readings)
+        ids = await asyncio.wrap_future(future)
+        
+        # Un único análisis por petición: el de la última lectura que supone un cambio
+        source = f"sensor-data:{request.client.host}" if request.client else "sensor-data"
+        changed = [
+            data_id for data_id, reading in zip(ids, readings)
+            if change_detector.observe(reading, source=source, data_id=data_id)
+        ]
+        if changed:
+            await job_queue.enqueue(changed[-1])
+        
+        return BatchIngestResponse(
+            message="Lecturas guardadas correctamente",
+            count=len(ids),
+            ids=list(ids)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IngestQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error("Error al guardar lecturas recibidas: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al guardar lecturas recibidas: {str(e)}"
+        )
+
+@router.post("/sensor-data/batch", response_model=BatchIngestResponse, summary="Guardar un lote de lecturas de sensores")
+def guardar_lote_sensores(readings: List[Dict[str, Any]]) -> BatchIngestResponse:
+    """
+    Guardar en una sola transacción un lote de lecturas acumuladas por un robot.
+    
+    El lote pasa por el escritor por lotes como una sola unidad: se guarda
+    completo o no se guarda. Si una lectura incluye su campo "timestamp" se
+    conserva como marca de tiempo.
+    
+    Args:
+        readings: Lista de lecturas de sensores
+        
+    Returns:
+        IDs de los registros insertados
+    """
+    if not readings:
+        raise HTTPException(status_code=400, detail="El lote de lecturas está vacío")
+    if len(readings) > INGEST_MAX_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El lote supera el máximo de {INGEST_MAX_BATCH} lecturas"
+        )
+    try:
+        ids = ingest_writer.save_many(readings)
+        return BatchIngestResponse(
+            message="Lote guardado correctamente",
+            count=len(ids),
+            ids=ids
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IngestQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error("Error al guardar lote de sensores: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al guardar lote de sensores: {str(e)}"
+        )
+
+@router.get("/sensor-data/estadisticas", summary="Estadísticas de campos de sensores")
+def estadisticas_sensores(
+    campos: str = Query(..., description="Campos separados por comas (p. ej. temperatura_a,lux,co2_ppm,T2M)"),
+    desde: Optional[str] = Query(None, alias="from", description="Inicio del rango (epoch o ISO 8601)"),
+    hasta: Optional[str] = Query(None, alias="to", description="Fin del rango (epoch o ISO 8601)"),
+    db: DBManager = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Obtener mínimo, máximo, media y conteo de campos de sensores, calculados en SQLite.
+    
+    Args:
+        campos: Lista de campos separados por comas
+        desde: Marca de tiempo inicial opcional
+        hasta: Marca de tiempo final opcional
+        
+    Returns:
+        Estadísticas por campo
+    """
+    fields = [field.strip() for field in campos.split(",") if field.strip()]
+    start = parse_time_bound(desde, "from")
+    end = parse_time_bound(hasta, "to")
+    try:
+        stats = db.get_sensor_stats(fields, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Error al obtener estadísticas de sensores: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al obtener estadísticas de sensores: {str(e)}"
+        )
+    return {"from": start, "to": end, "estadisticas": stats}
+
+@router.get("/sensor-data/series", summary="Series de sensores agregadas o reducidas para gráficas")
+def series_sensores(
+    campos: str = Query(..., description="Métricas separadas por comas (p. ej. temperatura_a,lux)"),
+    desde: Optional[str] = Query(None, alias="from", description="Inicio del rango (epoch o ISO 8601)"),
+    hasta: Optional[str] = Query(None, alias="to", description="Fin del rango (epoch o ISO 8601)"),
+    modo: str = Query("aggregate", alias="mode", description="'aggregate' (min/max/avg/count por bucket) o 'lttb'"),
+    resolucion: str = Query("auto", alias="resolution", description="'1m', '5m', '1h' o 'auto'"),
+    puntos: int = Query(500, alias="points", ge=3, description="Número de puntos objetivo por métrica"),
+    db: DBManager = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Obtener series de métricas de sensores listas para graficar.
+    
+    En modo "aggregate" se leen los rollups precalculados en la ingesta; en
+    modo "lttb" se reduce la serie a `points` puntos conservando su forma.
+    Sin rango explícito se devuelven las últimas 24 horas.
+    
+    Args:
+        campos: Lista de métricas separadas por comas
+        desde: Inicio opcional del rango temporal
+        hasta: Fin opcional del rango temporal
+        modo: Modo de reducción
+        resolucion: Resolución de los buckets en modo "aggregate"
+        puntos: Número de puntos objetivo por métrica
+        
+    Returns:
+        Series por métrica
+    """
+    metrics = [metric.strip() for metric in campos.split(",") if metric.strip()]
+    end = parse_time_bound(hasta, "to")
+    if end is None:
+        end = int(datetime.now().timestamp())
+    start = parse_time_bound(desde, "from")
+    if start is None:
+        start = end - SERIES_DEFAULT_RANGE
+    points = min(puntos, SERIES_MAX_POINTS)
+    
+    if modo not in ("aggregate", "lttb"):
+        raise HTTPException(status_code=400, detail=f"Modo no válido: {modo}")
+    if modo == "aggregate" and resolucion == "auto":
+        # La resolución más fina que no supere el número de puntos pedido
+        by_size = sorted(RESOLUTIONS.items(), key=lambda item: item[1])
+        resolucion = next(
+            (name for name, seconds in by_size if (end - start) / seconds <= points),
+            by_size[-1][0]
+        )
+    
+    try:
+        if modo == "aggregate":
+            series = db.get_sensor_series(metrics, start, end, resolucion)
+        else:
+            series = db.get_sensor_downsampled(metrics, start, end, points)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Error al obtener series de sensores: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al obtener series de sensores: {str(e)}"
+        )
+    
+    return {
+        "from": start,
+        "to": end,
+        "mode": modo,
+        "resolution": resolucion if modo == "aggregate" else None,
+        "series": series
+    }
+
+@router.get("/analytics/resumen", summary="Resumen estadístico de una ventana de lecturas")
+def analytics_resumen(
+    campos: Optional[str] = Query(None, description="Campos separados por comas (por defecto, los principales)"),
+    desde: Optional[str] = Query(None, alias="from", description="Inicio del rango (epoch o ISO 8601)"),
+    hasta: Optional[str] = Query(None, alias="to", description="Fin del rango (epoch o ISO 8601)"),
+    db: DBManager = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Obtener conteo, extremos, media, desviación, último valor y tendencia por hora de cada campo.
+    
+    Args:
+        campos: Lista de campos separados por comas
+        desde: Inicio opcional del rango temporal
+        hasta: Fin opcional del rango temporal
+        
+    Returns:
+        Resumen por campo
+    """
+    start, end, window = _analytics_window(db, campos, desde, hasta)
+    return {
+        "from": start,
+        "to": end,
+        "lecturas": len(window.epoch),
+        "campos": sensor_analytics.summarize_window(window)
+    }
+
+@router.get("/analytics/rolling", summary="Media y desviación móviles")
+def analytics_rolling(
+    campos: Optional[str] = Query(None, description="Campos separados por comas (por defecto, los principales)"),
+    desde: Optional[str] = Query(None, alias="from", description="Inicio del rango (epoch o ISO 8601)"),
+    hasta: Optional[str] = Query(None, alias="to", description="Fin del rango (epoch o ISO 8601)"),
+    ventana: int = Query(30, ge=2, description="Número de lecturas de la ventana móvil"),
+    puntos: int = Query(500, alias="points", ge=3, description="Número máximo de puntos devueltos"),
+    db: DBManager = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Obtener la media y la desviación típica móviles de cada campo.
+    
+    Se calculan sobre todas las lecturas de la ventana y se devuelven como
+    mucho `points` puntos equiespaciados.
+    
+    Args:
+        campos: Lista de campos separados por comas
+        desde: Inicio opcional del rango temporal
+        hasta: Fin opcional del rango temporal
+        ventana: Número de lecturas de la ventana móvil
+        puntos: Número máximo de puntos devueltos
+        
+    Returns:
+        Instantes y, por campo, valor, media y desviación móviles
+    """
+    start, end, window = _analytics_window(db, campos, desde, hasta)
+    keep = sensor_analytics.decimate(len(window.epoch), min(puntos, SERIES_MAX_POINTS))
+    series = {}
+    for field, values in window.values.items():
+        mean, std = sensor_analytics.rolling_stats(values, ventana)
+        series[field] = {
+            "valor": sensor_analytics.to_json_list(values[keep]),
+            "media": sensor_analytics.to_json_list(mean[keep]),
+            "desv": sensor_analytics.to_json_list(std[keep]),
+        }
+    return {"from": start, "to": end, "ventana": ventana, "t": window.epoch[keep].tolist(), "series": series}
+
+@router.get("/analytics/anomalias", summary="Lecturas anómalas por z-score")
+def analytics_anomalias(
+    campos: Optional[str] = Query(None, description="Campos separados por comas (por defecto, los principales)"),
+    desde: Optional[str] = Query(None, alias="from", description="Inicio del rango (epoch o ISO 8601)"),
+    hasta: Optional[str] = Query(None, alias="to", description="Fin del rango (epoch o ISO 8601)"),
+    ventana: int = Query(30, ge=2, description="Número de lecturas anteriores de referencia"),
+    umbral: float = Query(3.0, gt=0, description="Umbral de |z-score|"),
+    db: DBManager = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Obtener las lecturas que se desvían de las anteriores más de `umbral` desviaciones típicas.
+    
+    Args:
+        campos: Lista de campos separados por comas
+        desde: Inicio opcional del rango temporal
+        hasta: Fin opcional del rango temporal
+        ventana: Número de lecturas anteriores con las que se compara cada una
+        umbral: Umbral de |z-score|
+        
+    Returns:
+        Anomalías ordenadas por tiempo
+    """
+    start, end, window = _analytics_window(db, campos, desde, hasta)
+    anomalies = sensor_analytics.find_anomalies(window, ventana, umbral)
+    return {"from": start, "to": end, "lecturas": len(window.epoch), "anomalias": anomalies}
+
+@router.get("/analytics/derivadas", summary="Punto de rocío, VPD y altitud")
+def analytics_derivadas(
+    desde: Optional[str] = Query(None, alias="from", description="Inicio del rango (epoch o ISO 8601)"),
+    hasta: Optional[str] = Query(None, alias="to", description="Fin del rango (epoch o ISO 8601)"),
+    puntos: int = Query(500, alias="points", ge=3, description="Número máximo de puntos devueltos"),
+    db: DBManager = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Obtener las variables derivadas de temperatura, humedad y presión.
+    
+    Punto de rocío (Magnus), déficit de presión de vapor (Tetens) y altitud
+    estimada con la fórmula barométrica, con su resumen y como mucho
+    `points` puntos de cada serie.
+    
+    Args:
+        desde: Inicio opcional del rango temporal
+        hasta: Fin opcional del rango temporal
+        puntos: Número máximo de puntos devueltos
+        
+    Returns:
+        Resumen y series de cada variable derivada
+    """
+    start, end, window = _analytics_window(db, None, desde, hasta, list(sensor_analytics.DERIVED_FIELDS))
+    derived = sensor_analytics.SensorWindow(window.epoch, sensor_analytics.derived_series(window))
+    keep = sensor_analytics.decimate(len(window.epoch), min(puntos, SERIES_MAX_POINTS))
+    return {
+        "from": start,
+        "to": end,
+        "resumen": sensor_analytics.summarize_window(derived),
+        "t": window.epoch[keep].tolist(),
+        "series": {name: sensor_analytics.to_json_list(values[keep]) for name, values in derived.values.items()}
+    }
+
+@router.get("/analytics/diario", summary="Agregados diarios")
+def analytics_diario(
+    campos: Optional[str] = Query(None, description="Campos separados por comas (por defecto, los principales)"),
+    desde: Optional[str] = Query(None, alias="from", description="Inicio del rango (epoch o ISO 8601)"),
+    hasta: Optional[str] = Query(None, alias="to", description="Fin del rango (epoch o ISO 8601)"),
+    db: DBManager = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Obtener mínimo, máximo, media y conteo por día local de cada campo.
+    
+    Args:
+        campos: Lista de campos separados por comas
+        desde: Inicio opcional del rango temporal (por defecto, las últimas 24 horas)
+        hasta: Fin opcional del rango temporal
+        
+    Returns:
+        Agregados de cada día
+    """
+    start, end, window = _analytics_window(db, campos, desde, hasta)
+    return {"from": start, "to": end, "dias": sensor_analytics.daily_aggregates(window)}
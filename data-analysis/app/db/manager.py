@@ -3,13 +3,116 @@ Gestor de base de datos SQLite.
 """
 import os
 import json
-import sqlite3
+import base64
 import logging
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.db.pool import get_pool
+from app.db.rollups import RESOLUTIONS, ROLLUP_METRICS, lttb, setup_rollups, update_rollups
+from app.db.sensor_schema import (
+    EPOCH_FROM_TEXT_SQL,
+    INSERT_SQL,
+    SENSOR_COLUMNS,
+    build_reading,
+    flatten_reading,
+    migrate_legacy_sensor_data,
+    reading_columns,
+    sensor_data_ddl,
+)
+from app.utils.metrics import timed
 
 logger = logging.getLogger(__name__)
 
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _timestamp_pair(moment: Optional[datetime] = None) -> Tuple[str, int]:
+    """
+    Obtener la marca de tiempo textual (hora local) y en segundos epoch.
+    
+    Args:
+        moment: Instante a convertir (por defecto, ahora)
+        
+    Returns:
+        Tupla (texto "%Y-%m-%d %H:%M:%S", segundos epoch)
+    """
+    moment = moment or datetime.now()
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.strftime(TIMESTAMP_FORMAT), int(moment.timestamp())
+
+
+def _reading_timestamp(record: Dict[str, Any], default: Tuple[str, int]) -> Tuple[str, int]:
+    """Obtener la marca de tiempo propia de una lectura en el formato de la BD."""
+    value = record.get("timestamp") if isinstance(record, dict) else None
+    if isinstance(value, str):
+        try:
+            return _timestamp_pair(datetime.fromisoformat(value))
+        except ValueError:
+            pass
+    return default
+
+
+def encode_cursor(epoch: int, row_id: int) -> str:
+    """
+    Codificar un cursor de paginación por conjunto de claves (epoch, id).
+    
+    Args:
+        epoch: Marca de tiempo epoch del último elemento de la página
+        row_id: ID del último elemento de la página
+        
+    Returns:
+        Cursor opaco para pedir la página siguiente
+    """
+    raw = f"{epoch}:{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """
+    Decodificar un cursor generado por encode_cursor.
+    
+    Args:
+        cursor: Cursor opaco
+        
+    Returns:
+        Tupla (epoch, id)
+        
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        epoch, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+        return int(epoch), int(row_id)
+    except Exception:
+        raise ValueError(f"Cursor no válido: {cursor}")
+
+
+def _range_filter(
+    alias: str,
+    start: Optional[int],
+    end: Optional[int],
+    cursor: Optional[str]
+) -> Tuple[str, List[Any]]:
+    """Construir la cláusula WHERE de rango temporal y cursor sobre (epoch, id)."""
+    prefix = f"{alias}." if alias else ""
+    where = []
+    params: List[Any] = []
+    if start is not None:
+        where.append(f"{prefix}epoch >= ?")
+        params.append(start)
+    if end is not None:
+        where.append(f"{prefix}epoch <= ?")
+        params.append(end)
+    if cursor:
+        where.append(f"({prefix}epoch, {prefix}id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    return (" WHERE " + " AND ".join(where)) if where else "", params
+
+
 class DBManager:
     """Gestor de base de datos SQLite."""
     
@@ -26,18 +129,19 @@ class DBManager:
         if self.db_path != ":memory:":
             os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
-        # Inicializar la conexión con check_same_thread=False para permitir su uso en diferentes threads
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+        # Pool compartido por proceso: un escritor y varios lectores en modo WAL
+        self.pool = get_pool(self.db_path)
+        logger.info("Base de datos inicializada en: %s", self.db_path)
         
-        # Configurar la base de datos
-        logger.info(f"Base de datos inicializada en: {self.db_path}")
-        self.setup_database()
+        # Configurar el esquema una sola vez por proceso y base de datos
+        with self.pool.schema_lock:
+            if not self.pool.schema_ready:
+                self.setup_database()
     
     def close(self):
-        """Cerrar la conexión a la base de datos."""
-        if hasattr(self, 'conn'):
-            self.conn.close()
+        """Cerrar las conexiones del pool de la base de datos."""
+        if hasattr(self, 'pool'):
+            self.pool.close()
             logger.info("Conexión a la base de datos cerrada")
     
     def setup_database(self):
@@ -47,38 +151,101 @@ class DBManager:
             if self.db_path != ":memory:":
                 os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
             
-            cursor = self.conn.cursor()
-            
-            # Crear tablas si no existen
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS sensor_data (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    data TEXT NOT NULL
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS analysis_results (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    data_id INTEGER NOT NULL,
-                    result TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
-                    FOREIGN KEY (data_id) REFERENCES sensor_data (id)
-                )
-            ''')
-            
-            # Crear índice para optimizar búsquedas por data_id
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_analysis_data_id ON analysis_results (data_id)
-            ''')
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                
+                # Migrar tablas antiguas con la lectura como JSON al esquema tipado
+                migrate_legacy_sensor_data(conn)
+                
+                # Crear tablas si no existen
+                cursor.execute(sensor_data_ddl())
+                
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS analysis_results (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        data_id INTEGER NOT NULL,
+                        result TEXT NOT NULL,
+                        timestamp TEXT NOT NULL,
+                        FOREIGN KEY (data_id) REFERENCES sensor_data (id)
+                    )
+                ''')
+                
+                # Crear índice para optimizar búsquedas por data_id
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_analysis_data_id ON analysis_results (data_id)
+                ''')
+                
+                # Marca de tiempo epoch indexada para rangos y paginación por cursor
+                for table in ("sensor_data", "analysis_results"):
+                    self._ensure_epoch_column(conn, table)
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_sensor_data_epoch ON sensor_data (epoch, id)
+                ''')
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_analysis_epoch ON analysis_results (epoch, id)
+                ''')
+                
+                # Agregados precalculados por bucket para las gráficas
+                setup_rollups(conn)
+                
+                # Cola persistente de trabajos de análisis
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS analysis_jobs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        data_id INTEGER NOT NULL,
+                        model TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        response_id INTEGER,
+                        error TEXT,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        created_at TEXT NOT NULL,
+                        started_at TEXT,
+                        finished_at TEXT,
+                        FOREIGN KEY (data_id) REFERENCES sensor_data (id),
+                        FOREIGN KEY (response_id) REFERENCES analysis_results (id)
+                    )
+                ''')
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_jobs_status ON analysis_jobs (status, id)
+                ''')
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_jobs_data_id ON analysis_jobs (data_id, id)
+                ''')
+                # Lote al que pertenece el trabajo (análisis de varias lecturas en un prompt)
+                job_columns = [row[1] for row in conn.execute("PRAGMA table_info(analysis_jobs)").fetchall()]
+                if "batch_id" not in job_columns:
+                    cursor.execute("ALTER TABLE analysis_jobs ADD COLUMN batch_id TEXT")
+                
+                # Caché de análisis por resumen cuantizado de la lectura
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS analysis_cache (
+                        key TEXT PRIMARY KEY,
+                        model TEXT NOT NULL,
+                        result TEXT NOT NULL,
+                        created_epoch INTEGER NOT NULL,
+                        last_used_epoch INTEGER NOT NULL,
+                        hits INTEGER NOT NULL DEFAULT 0
+                    )
+                ''')
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_used ON analysis_cache (last_used_epoch)
+                ''')
             
-            self.conn.commit()
+            self.pool.schema_ready = True
             logger.info("Base de datos configurada correctamente")
         except Exception as e:
-            logger.error(f"Error al configurar la base de datos: {str(e)}")
+            logger.error("Error al configurar la base de datos: %s", e)
             raise Exception(f"Error al configurar la base de datos: {str(e)}")
     
+    def _ensure_epoch_column(self, conn, table: str) -> None:
+        """Añadir y rellenar la columna epoch (segundos epoch) si la tabla no la tiene."""
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+        if "epoch" not in columns:
+            logger.info("Añadiendo columna epoch a la tabla %s", table)
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN epoch INTEGER")
+        conn.execute(f"UPDATE {table} SET epoch = {EPOCH_FROM_TEXT_SQL} WHERE epoch IS NULL")
+    
+    @timed("db_write")
     def save_sensor_data(self, data):
         """
         Guardar datos de sensores en la base de datos.
@@ -91,29 +258,101 @@ class DBManager:
         """
         try:
             # Depuración
-            logger.info(f"Tipo de datos a guardar: {type(data)}")
+            logger.debug("Tipo de datos a guardar: %s", type(data).__name__)
             
-            # Asegurar que data sea un string para guardar en la BD
-            if not isinstance(data, str):
-                logger.info("Convirtiendo datos a JSON string")
-                data = json.dumps(data)
+            # Descomponer la lectura en las columnas tipadas
+            if isinstance(data, str):
+                data = json.loads(data)
                 
-            cursor = self.conn.cursor()
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            timestamp, epoch = _timestamp_pair()
+            row = flatten_reading(data, timestamp, epoch)
             
-            cursor.execute(
-                "INSERT INTO sensor_data (timestamp, data) VALUES (?, ?)",
-                (timestamp, data)
-            )
-            
-            self.conn.commit()
-            new_id = cursor.lastrowid
-            logger.info(f"Datos guardados en la base de datos con ID: {new_id}")
+            with self.pool.writer() as conn:
+                cursor = conn.execute(INSERT_SQL, row)
+                new_id = cursor.lastrowid
+                update_rollups(conn, (row,))
+            logger.debug("Datos guardados en la base de datos con ID: %s", new_id)
             return new_id
         except Exception as e:
-            logger.error(f"Error al guardar datos en la base de datos: {str(e)}")
+            logger.error("Error al guardar datos en la base de datos: %s", e)
             raise Exception(f"Error al guardar datos en la base de datos: {str(e)}")
     
+    def build_sensor_rows(self, records: List[Any]) -> List[Tuple[Any, ...]]:
+        """
+        Convertir lecturas en filas de sensor_data sin tocar la base de datos.
+        
+        Si un registro incluye su propio campo "timestamp" (ISO 8601) se
+        conserva como marca de tiempo.
+        
+        Args:
+            records: Lista de datos de sensores (diccionarios o strings JSON)
+            
+        Returns:
+            Filas listas para insert_sensor_rows, en el mismo orden
+            
+        Raises:
+            ValueError: Si alguna lectura no es válida (p. ej. campos que no se pueden guardar como JSON)
+        """
+        now = _timestamp_pair()
+        rows = []
+        for index, record in enumerate(records):
+            try:
+                if isinstance(record, str):
+                    record = json.loads(record)
+                rows.append(flatten_reading(record, *_reading_timestamp(record, now)))
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Lectura {index} no válida: {str(e)}")
+        return rows
+    
+    @timed("db_write")
+    def insert_sensor_rows(self, rows: List[Tuple[Any, ...]]) -> List[int]:
+        """
+        Guardar filas ya construidas con build_sensor_rows en una sola transacción.
+        
+        Se usa un único executemany y un único commit, de modo que el lote
+        completo cuesta un solo fsync.
+        
+        Args:
+            rows: Filas de sensor_data
+            
+        Returns:
+            Lista de IDs insertados, en el mismo orden que las filas
+        """
+        if not rows:
+            return []
+        try:
+            with self.pool.writer() as conn:
+                conn.executemany(INSERT_SQL, rows)
+                # Con un único escritor y AUTOINCREMENT los IDs del lote son
+                # consecutivos; se leen antes de escribir en otras tablas
+                last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                update_rollups(conn, rows)
+            
+            first_id = last_id - len(rows) + 1
+            logger.debug("Guardados %s registros de sensores (IDs %s-%s)", len(rows), first_id, last_id)
+            return list(range(first_id, last_id + 1))
+        except Exception as e:
+            logger.error("Error al guardar lote de datos en la base de datos: %s", e)
+            raise Exception(f"Error al guardar lote de datos en la base de datos: {str(e)}")
+    
+    def save_sensor_data_many(self, records: List[Any]) -> List[int]:
+        """
+        Guardar varios registros de sensores en una sola transacción.
+        
+        Args:
+            records: Lista de datos de sensores (diccionarios o strings JSON)
+            
+        Returns:
+            Lista de IDs insertados, en el mismo orden que los registros
+        """
+        try:
+            rows = self.build_sensor_rows(records)
+        except ValueError as e:
+            logger.error("Error al guardar lote de datos en la base de datos: %s", e)
+            raise Exception(f"Error al guardar lote de datos en la base de datos: {str(e)}")
+        return self.insert_sensor_rows(rows)
+    
+    @timed("db_write")
     def save_analysis_result(self, data_id: int, result: str) -> int:
         """
         Guardar resultado del análisis en la base de datos.
@@ -126,57 +365,71 @@ class DBManager:
             ID del registro insertado
         """
         try:
-            cursor = self.conn.cursor()
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            cursor.execute(
-                "INSERT INTO analysis_results (data_id, result, timestamp) VALUES (?, ?, ?)",
-                (data_id, result, timestamp)
-            )
+            timestamp, epoch = _timestamp_pair()
             
-            self.conn.commit()
-            new_id = cursor.lastrowid
-            logger.info(f"Resultado guardado en la base de datos con ID: {new_id}")
+            with self.pool.writer() as conn:
+                cursor = conn.execute(
+                    "INSERT INTO analysis_results (data_id, result, timestamp, epoch) VALUES (?, ?, ?, ?)",
+                    (data_id, result, timestamp, epoch)
+                )
+                new_id = cursor.lastrowid
+            logger.debug("Resultado guardado en la base de datos con ID: %s", new_id)
             return new_id
         except Exception as e:
-            logger.error(f"Error al guardar resultado en la base de datos: {str(e)}")
+            logger.error("Error al guardar resultado en la base de datos: %s", e)
             raise Exception(f"Error al guardar resultado en la base de datos: {str(e)}")
     
-    def get_analysis_results(self, limit: int = 10) -> List[Dict[str, Any]]:
+    @timed("db_read")
+    def get_analysis_results(
+        self,
+        limit: int = 10,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         Obtener resultados de análisis almacenados en la base de datos.
         
+        Los resultados se ordenan del más reciente al más antiguo por (epoch, id).
+        
         Args:
             limit: Número máximo de resultados a obtener
+            start: Marca de tiempo epoch inicial inclusiva
+            end: Marca de tiempo epoch final inclusiva
+            cursor: Cursor devuelto por la página anterior (paginación por claves)
             
         Returns:
             Lista de resultados
         """
+        where, params = _range_filter("ar", start, end, cursor)
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT ar.id, ar.data_id, ar.result, ar.timestamp, sd.data 
-                FROM analysis_results ar
-                JOIN sensor_data sd ON ar.data_id = sd.id
-                ORDER BY ar.id DESC LIMIT ?
-            """, (limit,))
+            with self.pool.reader() as conn:
+                rows = conn.execute(f"""
+                    SELECT ar.id, ar.data_id, ar.result, ar.timestamp, ar.epoch, {reading_columns("sd")}
+                    FROM analysis_results ar
+                    JOIN sensor_data sd ON ar.data_id = sd.id
+                    {where}
+                    ORDER BY ar.epoch DESC, ar.id DESC LIMIT ?
+                """, params + [limit]).fetchall()
             
             results = []
-            for row in cursor.fetchall():
+            for row in rows:
                 results.append({
                     "id": row[0],
                     "data_id": row[1],
                     "result": row[2],
                     "timestamp": row[3],
-                    "data": json.loads(row[4]) if row[4] else None
+                    "epoch": row[4],
+                    "data": build_reading(row)
                 })
                 
-            logger.info(f"Obtenidos {len(results)} resultados de análisis")
+            logger.debug("Obtenidos %s resultados de análisis", len(results))
             return results
         except Exception as e:
-            logger.error(f"Error al obtener resultados de análisis: {str(e)}")
+            logger.error("Error al obtener resultados de análisis: %s", e)
             raise Exception(f"Error al obtener resultados de análisis: {str(e)}")
     
+    @timed("db_read")
     def get_analysis_result(self, result_id: int) -> Optional[Dict[str, Any]]:
         """
         Obtener un resultado de análisis específico.
@@ -188,61 +441,639 @@ class DBManager:
             Resultado de análisis o None si no existe
         """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT ar.id, ar.data_id, ar.result, ar.timestamp, sd.data 
-                FROM analysis_results ar
-                JOIN sensor_data sd ON ar.data_id = sd.id
-                WHERE ar.id = ?
-            """, (result_id,))
+            with self.pool.reader() as conn:
+                row = conn.execute(f"""
+                    SELECT ar.id, ar.data_id, ar.result, ar.timestamp, ar.epoch, {reading_columns("sd")}
+                    FROM analysis_results ar
+                    JOIN sensor_data sd ON ar.data_id = sd.id
+                    WHERE ar.id = ?
+                """, (result_id,)).fetchone()
             
-            row = cursor.fetchone()
             if row:
                 result = {
                     "id": row[0],
                     "data_id": row[1],
                     "result": row[2],
                     "timestamp": row[3],
-                    "data": json.loads(row[4]) if row[4] else None
+                    "epoch": row[4],
+                    "data": build_reading(row)
                 }
-                logger.info(f"Obtenido resultado de análisis con ID: {result_id}")
+                logger.debug("Obtenido resultado de análisis con ID: %s", result_id)
                 return result
             else:
-                logger.warning(f"No se encontró resultado de análisis con ID: {result_id}")
+                logger.warning("No se encontró resultado de análisis con ID: %s", result_id)
                 return None
         except Exception as e:
-            logger.error(f"Error al obtener resultado de análisis: {str(e)}")
+            logger.error("Error al obtener resultado de análisis: %s", e)
             raise Exception(f"Error al obtener resultado de análisis: {str(e)}")
     
-    def get_sensor_records(self, limit: int = 5) -> List[Dict[str, Any]]:
+    @timed("db_read")
+    def get_sensor_reading(self, data_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Obtener la lectura de sensores de un registro.
+        
+        Args:
+            data_id: ID del registro de sensores
+            
+        Returns:
+            Lectura reconstruida o None si no existe
+        """
+        try:
+            with self.pool.reader() as conn:
+                row = conn.execute(f"""
+                    SELECT {reading_columns()} FROM sensor_data WHERE id = ?
+                """, (data_id,)).fetchone()
+            return build_reading(row) if row else None
+        except Exception as e:
+            logger.error("Error al obtener lectura de sensores: %s", e)
+            raise Exception(f"Error al obtener lectura de sensores: {str(e)}")
+    
+    @timed("db_read")
+    def get_reading_analysis(self, data_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Obtener el análisis más reciente de una lectura.
+
+        Se busca primero el último trabajo de la lectura (su respuesta puede
+        ser compartida con otras lecturas idénticas) y, si no tiene ninguno,
+        el último resultado guardado con su ID.
+
+        Args:
+            data_id: ID de la lectura
+
+        Returns:
+            ID y estado del trabajo, ID y texto de la respuesta, o None si la
+            lectura no tiene análisis ni trabajo
+        """
+        try:
+            with self.pool.reader() as conn:
+                row = conn.execute("""
+                    SELECT j.id, j.status, j.response_id, ar.result
+                    FROM analysis_jobs j
+                    LEFT JOIN analysis_results ar ON j.response_id = ar.id
+                    WHERE j.data_id = ?
+                    ORDER BY j.id DESC LIMIT 1
+                """, (data_id,)).fetchone()
+                if row is None:
+                    result = conn.execute(
+                        "SELECT id, result FROM analysis_results WHERE data_id = ? ORDER BY id DESC LIMIT 1",
+                        (data_id,)
+                    ).fetchone()
+                    row = (None, "done", result[0], result[1]) if result else None
+            if row is None:
+                return None
+            return {"job_id": row[0], "status": row[1], "response_id": row[2], "response": row[3]}
+        except Exception as e:
+            logger.error("Error al obtener el análisis de la lectura: %s", e)
+            raise Exception(f"Error al obtener el análisis de la lectura: {str(e)}")
+
+    def create_job(self, data_id: int, model: str) -> int:
+        """
+        Encolar un trabajo de análisis.
+        
+        Args:
+            data_id: ID de los datos a analizar
+            model: Modelo de IA con el que se analizará
+            
+        Returns:
+            ID del trabajo
+        """
+        try:
+            timestamp, _ = _timestamp_pair()
+            with self.pool.writer() as conn:
+                cursor = conn.execute(
+                    "INSERT INTO analysis_jobs (data_id, model, status, created_at) VALUES (?, ?, 'queued', ?)",
+                    (data_id, model, timestamp)
+                )
+                job_id = cursor.lastrowid
+            logger.info("Trabajo de análisis encolado con ID: %s", job_id)
+            return job_id
+        except Exception as e:
+            logger.error("Error al encolar trabajo de análisis: %s", e)
+            raise Exception(f"Error al encolar trabajo de análisis: {str(e)}")
+    
+    def create_jobs(self, data_ids: List[int], model: str, batch_id: Optional[str] = None) -> List[int]:
+        """
+        Encolar varios trabajos de análisis en una sola transacción.
+        
+        Args:
+            data_ids: IDs de los datos a analizar
+            model: Modelo de IA con el que se analizarán
+            batch_id: Lote opcional; los trabajos de un lote se analizan juntos
+            
+        Returns:
+            IDs de los trabajos, en el mismo orden que data_ids
+        """
+        try:
+            timestamp, _ = _timestamp_pair()
+            job_ids = []
+            with self.pool.writer() as conn:
+                for data_id in data_ids:
+                    cursor = conn.execute(
+                        "INSERT INTO analysis_jobs (data_id, model, status, created_at, batch_id) VALUES (?, ?, 'queued', ?, ?)",
+                        (data_id, model, timestamp, batch_id)
+                    )
+                    job_ids.append(cursor.lastrowid)
+            logger.info("%s trabajos de análisis encolados (lote: %s)", len(job_ids), batch_id)
+            return job_ids
+        except Exception as e:
+            logger.error("Error al encolar trabajos de análisis: %s", e)
+            raise Exception(f"Error al encolar trabajos de análisis: {str(e)}")
+    
+    def claim_next_job(self) -> Optional[Dict[str, Any]]:
+        """
+        Tomar el trabajo en cola más antiguo y marcarlo como en ejecución.
+        
+        La selección y el cambio de estado se hacen en una única sentencia,
+        de modo que dos workers nunca toman el mismo trabajo.
+        
+        Returns:
+            Trabajo tomado o None si la cola está vacía
+        """
+        try:
+            timestamp, _ = _timestamp_pair()
+            with self.pool.writer() as conn:
+                row = conn.execute("""
+                    UPDATE analysis_jobs
+                    SET status = 'running', started_at = ?, attempts = attempts + 1
+                    WHERE id = (
+                        SELECT id FROM analysis_jobs WHERE status = 'queued' ORDER BY id LIMIT 1
+                    )
+                    RETURNING id, data_id, model, attempts, batch_id
+                """, (timestamp,)).fetchone()
+            if row is None:
+                return None
+            return {"id": row[0], "data_id": row[1], "model": row[2], "attempts": row[3], "batch_id": row[4]}
+        except Exception as e:
+            logger.error("Error al tomar trabajo de análisis: %s", e)
+            raise Exception(f"Error al tomar trabajo de análisis: {str(e)}")
+    
+    def claim_jobs(self, model: str, limit: int, batch_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Tomar varios trabajos en cola del mismo modelo para analizarlos juntos.
+        
+        Args:
+            model: Modelo de los trabajos
+            limit: Número máximo de trabajos
+            batch_id: Si se indica, sólo trabajos de ese lote; si no, sólo trabajos sin lote
+            
+        Returns:
+            Trabajos tomados, del más antiguo al más reciente
+        """
+        if limit <= 0:
+            return []
+        try:
+            timestamp, _ = _timestamp_pair()
+            with self.pool.writer() as conn:
+                rows = conn.execute("""
+                    UPDATE analysis_jobs
+                    SET status = 'running', started_at = ?, attempts = attempts + 1
+                    WHERE id IN (
+                        SELECT id FROM analysis_jobs
+                        WHERE status = 'queued' AND model = ? AND batch_id IS ?
+                        ORDER BY id LIMIT ?
+                    )
+                    RETURNING id, data_id, model, attempts, batch_id
+                """, (timestamp, model, batch_id, limit)).fetchall()
+            jobs = [
+                {"id": row[0], "data_id": row[1], "model": row[2], "attempts": row[3], "batch_id": row[4]}
+                for row in rows
+            ]
+            return sorted(jobs, key=lambda job: job["id"])
+        except Exception as e:
+            logger.error("Error al tomar trabajos de análisis: %s", e)
+            raise Exception(f"Error al tomar trabajos de análisis: {str(e)}")
+    
+    def finish_job(
+        self,
+        job_id: int,
+        response_id: Optional[int] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """
+        Marcar un trabajo como terminado o fallido.
+        
+        Args:
+            job_id: ID del trabajo
+            response_id: ID del resultado guardado si terminó bien
+            error: Mensaje de error si falló
+        """
+        try:
+            timestamp, _ = _timestamp_pair()
+            status = "error" if error is not None else "done"
+            with self.pool.writer() as conn:
+                conn.execute(
+                    "UPDATE analysis_jobs SET status = ?, response_id = ?, error = ?, finished_at = ? WHERE id = ?",
+                    (status, response_id, error, timestamp, job_id)
+                )
+            logger.info("Trabajo de análisis %s finalizado (%s)", job_id, status)
+        except Exception as e:
+            logger.error("Error al finalizar trabajo de análisis: %s", e)
+            raise Exception(f"Error al finalizar trabajo de análisis: {str(e)}")
+    
+    def requeue_interrupted_jobs(self, max_attempts: int) -> int:
+        """
+        Devolver a la cola los trabajos que quedaron en ejecución al detenerse la API.
+        
+        Los que ya agotaron sus intentos se marcan como fallidos.
+        
+        Args:
+            max_attempts: Número máximo de intentos por trabajo
+            
+        Returns:
+            Número de trabajos devueltos a la cola
+        """
+        try:
+            timestamp, _ = _timestamp_pair()
+            with self.pool.writer() as conn:
+                conn.execute("""
+                    UPDATE analysis_jobs
+                    SET status = 'error', error = 'Intentos agotados', finished_at = ?
+                    WHERE status = 'running' AND attempts >= ?
+                """, (timestamp, max_attempts))
+                cursor = conn.execute(
+                    "UPDATE analysis_jobs SET status = 'queued' WHERE status = 'running'"
+                )
+                requeued = cursor.rowcount
+            if requeued:
+                logger.info("%s trabajos de análisis interrumpidos devueltos a la cola", requeued)
+            return requeued
+        except Exception as e:
+            logger.error("Error al reencolar trabajos de análisis: %s", e)
+            raise Exception(f"Error al reencolar trabajos de análisis: {str(e)}")
+    
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Obtener el estado de un trabajo de análisis.
+        
+        Args:
+            job_id: ID del trabajo
+            
+        Returns:
+            Trabajo (con el texto del resultado si terminó) o None si no existe
+        """
+        try:
+            with self.pool.reader() as conn:
+                row = conn.execute("""
+                    SELECT j.id, j.data_id, j.model, j.status, j.response_id, j.error,
+                           j.attempts, j.created_at, j.started_at, j.finished_at, ar.result
+                    FROM analysis_jobs j
+                    LEFT JOIN analysis_results ar ON j.response_id = ar.id
+                    WHERE j.id = ?
+                """, (job_id,)).fetchone()
+            if row is None:
+                return None
+            return {
+                "id": row[0],
+                "data_id": row[1],
+                "model": row[2],
+                "status": row[3],
+                "response_id": row[4],
+                "error": row[5],
+                "attempts": row[6],
+                "created_at": row[7],
+                "started_at": row[8],
+                "finished_at": row[9],
+                "response": row[10]
+            }
+        except Exception as e:
+            logger.error("Error al obtener trabajo de análisis: %s", e)
+            raise Exception(f"Error al obtener trabajo de análisis: {str(e)}")
+    
+    def get_cached_analysis(self, key: str, min_epoch: int) -> Optional[str]:
+        """
+        Buscar un análisis en la caché.
+        
+        Sólo lee (con una conexión de lectura): el uso de la entrada lo
+        acumula quien llama y se escribe con save_cached_analysis.
+        
+        Args:
+            key: Clave de la entrada
+            min_epoch: Antigüedad mínima aceptada (las entradas anteriores se consideran caducadas)
+            
+        Returns:
+            Texto del análisis o None si no hay entrada vigente
+        """
+        try:
+            with self.pool.reader() as conn:
+                row = conn.execute(
+                    "SELECT result FROM analysis_cache WHERE key = ? AND created_epoch >= ?",
+                    (key, min_epoch)
+                ).fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            logger.error("Error al consultar la caché de análisis: %s", e)
+            raise Exception(f"Error al consultar la caché de análisis: {str(e)}")
+    
+    def save_cached_analysis(
+        self,
+        key: str,
+        model: str,
+        result: str,
+        max_entries: int,
+        min_epoch: int,
+        usage: Optional[Dict[str, Tuple[int, int]]] = None
+    ) -> int:
+        """
+        Guardar un análisis en la caché, descartando las entradas caducadas y
+        las menos usadas recientemente por encima del máximo.
+        
+        Args:
+            key: Clave de la entrada
+            model: Modelo que generó el análisis
+            result: Texto del análisis
+            max_entries: Número máximo de entradas
+            min_epoch: Las entradas creadas antes de este momento se eliminan
+            usage: Usos acumulados desde el último guardado, por clave
+                (último uso en segundos epoch, aciertos); se escriben antes de descartar
+            
+        Returns:
+            Número de entradas eliminadas
+        """
+        try:
+            _, now = _timestamp_pair()
+            with self.pool.writer() as conn:
+                # Los usos acumulados deciden qué entradas se descartan
+                if usage:
+                    conn.executemany("""
+                        UPDATE analysis_cache
+                        SET last_used_epoch = MAX(last_used_epoch, ?), hits = hits + ?
+                        WHERE key = ?
+                    """, [(last_used, hits, used_key) for used_key, (last_used, hits) in usage.items()])
+                conn.execute("""
+                    INSERT OR REPLACE INTO analysis_cache (key, model, result, created_epoch, last_used_epoch)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (key, model, result, now, now))
+                expired = conn.execute(
+                    "DELETE FROM analysis_cache WHERE created_epoch < ?", (min_epoch,)
+                ).rowcount
+                evicted = conn.execute("""
+                    DELETE FROM analysis_cache WHERE key IN (
+                        SELECT key FROM analysis_cache
+                        ORDER BY last_used_epoch DESC, rowid DESC LIMIT -1 OFFSET ?
+                    )
+                """, (max_entries,)).rowcount
+            return expired + evicted
+        except Exception as e:
+            logger.error("Error al guardar en la caché de análisis: %s", e)
+            raise Exception(f"Error al guardar en la caché de análisis: {str(e)}")
+    
+    def count_cached_analyses(self) -> int:
+        """
+        Contar las entradas de la caché de análisis.
+        
+        Returns:
+            Número de entradas
+        """
+        try:
+            with self.pool.reader() as conn:
+                return conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+        except Exception as e:
+            logger.error("Error al contar la caché de análisis: %s", e)
+            raise Exception(f"Error al contar la caché de análisis: {str(e)}")
+    
+    @timed("db_read")
+    def get_sensor_records(
+        self,
+        limit: int = 5,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         Obtener registros de datos de sensores.
         
+        Los registros se ordenan del más reciente al más antiguo por (epoch, id),
+        usando el índice idx_sensor_data_epoch, de modo que cada página tiene un
+        coste constante sin importar cuánto historial haya.
+        
         Args:
             limit: Número máximo de registros a obtener
+            start: Marca de tiempo epoch inicial inclusiva
+            end: Marca de tiempo epoch final inclusiva
+            cursor: Cursor devuelto por la página anterior (paginación por claves)
             
         Returns:
             Lista de registros de sensores
         """
+        where, params = _range_filter("", start, end, cursor)
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT id, timestamp, data as raw_data
-                FROM sensor_data
-                ORDER BY id DESC
-                LIMIT ?
-            """, (limit,))
+            with self.pool.reader() as conn:
+                rows = conn.execute(f"""
+                    SELECT id, timestamp, epoch, {reading_columns()}
+                    FROM sensor_data
+                    {where}
+                    ORDER BY epoch DESC, id DESC
+                    LIMIT ?
+                """, params + [limit]).fetchall()
             
             records = []
-            for row in cursor.fetchall():
+            for row in rows:
                 records.append({
                     "id": row[0],
                     "timestamp": row[1],
-                    "raw_data": row[2]
+                    "epoch": row[2],
+                    "raw_data": build_reading(row)
                 })
                 
-            logger.info(f"Obtenidos {len(records)} registros de datos de sensores")
+            logger.debug("Obtenidos %s registros de datos de sensores", len(records))
             return records
         except Exception as e:
-            logger.error(f"Error al obtener registros de sensores: {str(e)}")
-            raise Exception(f"Error al obtener registros de sensores: {str(e)}") 
\ No newline at end of file
+            logger.error("Error al obtener registros de sensores: %s", e)
+            raise Exception(f"Error al obtener registros de sensores: {str(e)}")
+    
+    @timed("db_read")
+    def get_sensor_stats(
+        self,
+        fields: List[str],
+        start: Optional[int] = None,
+        end: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Calcular agregados (mínimo, máximo, media y conteo) de campos de sensores en SQLite.
+        
+        Args:
+            fields: Campos tipados a agregar (p. ej. "temperatura_a", "co2_ppm", "T2M")
+            start: Marca de tiempo epoch inicial inclusiva
+            end: Marca de tiempo epoch final inclusiva
+            
+        Returns:
+            Diccionario campo -> {"min", "max", "avg", "count"}
+        """
+        unknown = [field for field in fields if field not in SENSOR_COLUMNS]
+        if unknown:
+            raise ValueError(f"Campos de sensores desconocidos: {unknown}")
+        if not fields:
+            return {}
+        try:
+            select = ", ".join(
+                f"MIN({f}), MAX({f}), AVG({f}), COUNT({f})" for f in fields
+            )
+            where, params = _range_filter("", start, end, None)
+            sql = f"SELECT {select} FROM sensor_data{where}"
+            
+            with self.pool.reader() as conn:
+                row = conn.execute(sql, params).fetchone()
+            
+            stats = {}
+            for i, field in enumerate(fields):
+                stats[field] = {
+                    "min": row[4 * i],
+                    "max": row[4 * i + 1],
+                    "avg": row[4 * i + 2],
+                    "count": row[4 * i + 3]
+                }
+            logger.debug("Estadísticas calculadas para %s campos", len(fields))
+            return stats
+        except Exception as e:
+            logger.error("Error al calcular estadísticas de sensores: %s", e)
+            raise Exception(f"Error al calcular estadísticas de sensores: {str(e)}")
+    
+    @timed("db_read")
+    def get_sensor_columns(
+        self,
+        fields: List[str],
+        start: int,
+        end: int,
+        max_rows: Optional[int] = None
+    ) -> Dict[str, List[Any]]:
+        """
+        Leer en columnas los valores de varios campos en un rango de tiempo.
+        
+        Una sola consulta ordenada por tiempo; el resultado se transpone a una
+        lista por columna, lista para convertirla en arrays.
+        
+        Args:
+            fields: Campos tipados a leer (p. ej. "temperatura_a", "presion_hPa")
+            start: Marca de tiempo epoch inicial inclusiva
+            end: Marca de tiempo epoch final inclusiva
+            max_rows: Máximo de lecturas (las más recientes del rango)
+            
+        Returns:
+            Diccionario columna -> valores, con "epoch" y un elemento por lectura
+        """
+        unknown = [field for field in fields if field not in SENSOR_COLUMNS]
+        if unknown:
+            raise ValueError(f"Campos de sensores desconocidos: {unknown}")
+        columns = ["epoch"] + list(fields)
+        try:
+            sql = f"""
+                SELECT {", ".join(columns)} FROM sensor_data
+                WHERE epoch BETWEEN ? AND ?
+                ORDER BY epoch DESC, id DESC
+            """
+            params: List[Any] = [start, end]
+            if max_rows:
+                sql += " LIMIT ?"
+                params.append(max_rows)
+            with self.pool.reader() as conn:
+                rows = conn.execute(sql, params).fetchall()
+            rows.reverse()
+            values = list(zip(*rows)) if rows else [()] * len(columns)
+            logger.debug("Leídas %s lecturas en columnas para %s campos", len(rows), len(fields))
+            return {column: list(column_values) for column, column_values in zip(columns, values)}
+        except Exception as e:
+            logger.error("Error al leer columnas de sensores: %s", e)
+            raise Exception(f"Error al leer columnas de sensores: {str(e)}")
+    
+    @timed("db_read")
+    def get_sensor_series(
+        self,
+        metrics: List[str],
+        start: int,
+        end: int,
+        resolution: str
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Obtener series agregadas por bucket desde los rollups precalculados.
+        
+        Args:
+            metrics: Métricas con rollup (ver ROLLUP_METRICS)
+            start: Marca de tiempo epoch inicial inclusiva
+            end: Marca de tiempo epoch final inclusiva
+            resolution: Resolución del bucket ("1m", "5m" o "1h")
+            
+        Returns:
+            Diccionario métrica -> lista de {"t", "min", "max", "avg", "count"}
+        """
+        unknown = [metric for metric in metrics if metric not in ROLLUP_METRICS]
+        if unknown:
+            raise ValueError(f"Métricas sin rollup: {unknown}")
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Resolución no válida: {resolution}")
+        seconds = RESOLUTIONS[resolution]
+        try:
+            series = {}
+            with self.pool.reader() as conn:
+                for metric in metrics:
+                    rows = conn.execute("""
+                        SELECT bucket, min, max, sum / count, count
+                        FROM sensor_rollups
+                        WHERE metric = ? AND resolution = ? AND bucket BETWEEN ? AND ?
+                        ORDER BY bucket
+                    """, (metric, seconds, start - start % seconds, end)).fetchall()
+                    series[metric] = [
+                        {"t": row[0], "min": row[1], "max": row[2], "avg": row[3], "count": row[4]}
+                        for row in rows
+                    ]
+            logger.debug("Series agregadas obtenidas para %s métricas (%s)", len(metrics), resolution)
+            return series
+        except Exception as e:
+            logger.error("Error al obtener series de sensores: %s", e)
+            raise Exception(f"Error al obtener series de sensores: {str(e)}")
+    
+    @timed("db_read")
+    def get_sensor_downsampled(
+        self,
+        metrics: List[str],
+        start: int,
+        end: int,
+        points: int,
+        max_raw: int = 50000
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Obtener series reducidas con LTTB a un número de puntos objetivo.
+        
+        Si el rango tiene más de `max_raw` lecturas, la reducción parte de las
+        medias por minuto de los rollups en lugar de las lecturas crudas.
+        
+        Args:
+            metrics: Métricas con rollup (ver ROLLUP_METRICS)
+            start: Marca de tiempo epoch inicial inclusiva
+            end: Marca de tiempo epoch final inclusiva
+            points: Número de puntos deseado por métrica
+            max_raw: Máximo de lecturas crudas a leer por métrica
+            
+        Returns:
+            Diccionario métrica -> lista de {"t", "v"}
+        """
+        unknown = [metric for metric in metrics if metric not in ROLLUP_METRICS]
+        if unknown:
+            raise ValueError(f"Métricas sin rollup: {unknown}")
+        try:
+            series = {}
+            with self.pool.reader() as conn:
+                raw_count = conn.execute(
+                    "SELECT COUNT(*) FROM sensor_data WHERE epoch BETWEEN ? AND ?",
+                    (start, end)
+                ).fetchone()[0]
+                for metric in metrics:
+                    if raw_count <= max_raw:
+                        rows = conn.execute(f"""
+                            SELECT epoch, {metric} FROM sensor_data
+                            WHERE epoch BETWEEN ? AND ? AND {metric} IS NOT NULL
+                            ORDER BY epoch, id
+                        """, (start, end)).fetchall()
+                    else:
+                        seconds = RESOLUTIONS["1m"]
+                        rows = conn.execute("""
+                            SELECT bucket, sum / count FROM sensor_rollups
+                            WHERE metric = ? AND resolution = ? AND bucket BETWEEN ? AND ?
+                            ORDER BY bucket
+                        """, (metric, seconds, start - start % seconds, end)).fetchall()
+                    sampled = lttb([(row[0], row[1]) for row in rows], points)
+                    series[metric] = [{"t": t, "v": v} for t, v in sampled]
+            logger.debug("Series reducidas con LTTB para %s métricas (%s puntos)", len(metrics), points)
+            return series
+        except Exception as e:
+            logger.error("Error al reducir series de sensores: %s", e)
+            raise Exception(f"Error al reducir series de sensores: {str(e)}")
@@ -0,0 +1,199 @@
+"""
+Pool de conexiones SQLite en modo WAL.
+
+Mantiene una única conexión de escritura (serializada con un lock) y un
+conjunto de conexiones de sólo lectura. Con el journal en modo WAL los
+lectores trabajan sobre la última instantánea confirmada y no quedan
+bloqueados detrás de los commits de la ingesta.
+"""
+import os
+import queue
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuración por defecto (se puede sobrescribir mediante variables de entorno)
+SQLITE_READERS = int(os.getenv("SQLITE_READERS", "4"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-16000"))  # Negativo = KiB (≈16 MB)
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(128 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+class ConnectionPool:
+    """Pool con un escritor y N lectores sobre una misma base de datos SQLite."""
+
+    def __init__(
+        self,
+        db_path: str,
+        readers: Optional[int] = None,
+        synchronous: Optional[str] = None,
+        cache_size: Optional[int] = None,
+        mmap_size: Optional[int] = None,
+        busy_timeout_ms: Optional[int] = None,
+    ):
+        """
+        Inicializar el pool de conexiones.
+
+        Args:
+            db_path: Ruta del archivo de base de datos (o ":memory:")
+            readers: Número máximo de conexiones de lectura
+            synchronous: Valor de PRAGMA synchronous (OFF, NORMAL, FULL, EXTRA)
+            cache_size: Valor de PRAGMA cache_size (negativo = KiB)
+            mmap_size: Valor de PRAGMA mmap_size en bytes
+            busy_timeout_ms: Tiempo máximo de espera ante bloqueos
+        """
+        self.db_path = db_path
+        self.readers = max(1, readers if readers is not None else SQLITE_READERS)
+        self.synchronous = (synchronous or SQLITE_SYNCHRONOUS).upper()
+        if self.synchronous not in _SYNCHRONOUS_MODES:
+            raise ValueError(f"Valor de synchronous no válido: {self.synchronous}")
+        self.cache_size = cache_size if cache_size is not None else SQLITE_CACHE_SIZE
+        self.mmap_size = mmap_size if mmap_size is not None else SQLITE_MMAP_SIZE
+        self.busy_timeout_ms = busy_timeout_ms if busy_timeout_ms is not None else SQLITE_BUSY_TIMEOUT_MS
+
+        # Una base de datos en memoria sólo es visible para su propia conexión,
+        # así que en ese caso los lectores reutilizan la conexión de escritura.
+        self.in_memory = db_path == ":memory:"
+
+        self._write_lock = threading.RLock()
+        self._writer = self._connect(read_only=False)
+        self._idle_readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all_readers = []
+        self._readers_lock = threading.Lock()
+        self._closed = False
+        # Indica si el esquema ya se creó en esta base de datos durante el proceso
+        self.schema_ready = False
+        self.schema_lock = threading.Lock()
+
+        logger.info(
+            f"Pool SQLite inicializado en {db_path} "
+            f"(lectores={self.readers}, synchronous={self.synchronous})"
+        )
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        """Abrir una conexión y aplicar los PRAGMA configurados."""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            timeout=self.busy_timeout_ms / 1000,
+            # Los lectores trabajan en autocommit para no retener instantáneas
+            isolation_level=None if read_only else "DEFERRED",
+        )
+        conn.row_factory = sqlite3.Row
+        if not self.in_memory and not read_only:
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size={int(self.cache_size)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            conn.execute("PRAGMA query_only=1")
+        return conn
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """
+        Obtener la conexión de escritura dentro de una transacción.
+
+        Hace commit al salir del bloque o rollback si se produce una excepción.
+        """
+        with self._write_lock:
+            conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Obtener una conexión de lectura del pool."""
+        if self.in_memory:
+            with self._write_lock:
+                yield self._writer
+            return
+
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._idle_readers.put(conn)
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        """Tomar un lector libre, creando uno nuevo si no se alcanzó el máximo."""
+        try:
+            return self._idle_readers.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._readers_lock:
+            if self._closed:
+                raise RuntimeError("El pool de conexiones está cerrado")
+            if len(self._all_readers) < self.readers:
+                conn = self._connect(read_only=True)
+                self._all_readers.append(conn)
+                return conn
+
+        return self._idle_readers.get()
+
+    def close(self) -> None:
+        """Cerrar todas las conexiones del pool."""
+        with self._readers_lock:
+            if self._closed:
+                return
+            self._closed = True
+            readers = list(self._all_readers)
+            self._all_readers.clear()
+
+        for conn in readers:
+            conn.close()
+        with self._write_lock:
+            self._writer.close()
+        logger.info("Pool SQLite cerrado (%s)", self.db_path)
+
+
+# Pools compartidos por proceso, uno por archivo de base de datos
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """
+    Obtener el pool compartido para una base de datos.
+
+    Las bases de datos en memoria no se comparten: cada llamada crea un pool nuevo.
+
+    Args:
+        db_path: Ruta del archivo de base de datos
+
+    Returns:
+        Pool de conexiones asociado a la ruta
+    """
+    if db_path == ":memory:":
+        return ConnectionPool(db_path)
+
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(db_path)
+            _pools[key] = pool
+        return pool
+
+
+def close_all_pools() -> None:
+    """Cerrar todos los pools compartidos del proceso."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
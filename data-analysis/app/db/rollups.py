@@ -0,0 +1,177 @@
+"""
+Agregados precalculados (rollups) de métricas de sensores para gráficas.
+
+Cada inserción en sensor_data actualiza, dentro de la misma transacción,
+los contadores (count, sum, min, max) del bucket de 1 minuto, 5 minutos y
+1 hora de cada métrica. Así una gráfica de semanas de historial se sirve
+leyendo unos cientos de filas en lugar de cientos de miles de lecturas.
+"""
+import os
+import logging
+import sqlite3
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from app.db.sensor_schema import INSERT_COLUMNS, SENSOR_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Resoluciones disponibles: nombre -> segundos por bucket
+RESOLUTIONS: Dict[str, int] = {"1m": 60, "5m": 300, "1h": 3600}
+
+_DEFAULT_METRICS = (
+    "presion_hPa,temperatura_a,lux,indice_uv,co2_ppm,temperatura_b,humedad_pct,"
+    "T2M,RH2M,PRECTOTCORR,WS10M"
+)
+
+# Métricas con rollup (se puede sobrescribir mediante variable de entorno)
+ROLLUP_METRICS: List[str] = [
+    metric.strip()
+    for metric in os.getenv("ROLLUP_METRICS", _DEFAULT_METRICS).split(",")
+    if metric.strip() in SENSOR_COLUMNS
+]
+
+ROLLUPS_DDL: str = """
+    CREATE TABLE IF NOT EXISTS sensor_rollups (
+        metric TEXT NOT NULL,
+        resolution INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        sum REAL NOT NULL,
+        min REAL NOT NULL,
+        max REAL NOT NULL,
+        PRIMARY KEY (metric, resolution, bucket)
+    ) WITHOUT ROWID
+"""
+
+UPSERT_SQL: str = """
+    INSERT INTO sensor_rollups (metric, resolution, bucket, count, sum, min, max)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (metric, resolution, bucket) DO UPDATE SET
+        count = count + excluded.count,
+        sum = sum + excluded.sum,
+        min = MIN(min, excluded.min),
+        max = MAX(max, excluded.max)
+"""
+
+_EPOCH_INDEX = INSERT_COLUMNS.index("epoch")
+_METRIC_INDEXES = [(metric, INSERT_COLUMNS.index(metric)) for metric in ROLLUP_METRICS]
+
+
+def accumulate(rows: Iterable[Sequence[Any]]) -> List[Tuple[Any, ...]]:
+    """
+    Agregar en memoria las filas de un lote por (métrica, resolución, bucket).
+
+    Args:
+        rows: Filas de sensor_data en el orden de INSERT_COLUMNS
+
+    Returns:
+        Parámetros para ejecutar UPSERT_SQL con executemany
+    """
+    buckets: Dict[Tuple[str, int, int], List[float]] = {}
+    for row in rows:
+        epoch = row[_EPOCH_INDEX]
+        if epoch is None:
+            continue
+        for metric, index in _METRIC_INDEXES:
+            value = row[index]
+            if value is None:
+                continue
+            for seconds in RESOLUTIONS.values():
+                key = (metric, seconds, epoch - epoch % seconds)
+                acc = buckets.get(key)
+                if acc is None:
+                    buckets[key] = [1, value, value, value]
+                else:
+                    acc[0] += 1
+                    acc[1] += value
+                    if value < acc[2]:
+                        acc[2] = value
+                    if value > acc[3]:
+                        acc[3] = value
+    return [key + tuple(acc) for key, acc in buckets.items()]
+
+
+def update_rollups(conn: sqlite3.Connection, rows: Iterable[Sequence[Any]]) -> None:
+    """
+    Actualizar los rollups con filas recién insertadas (en la misma transacción).
+
+    Args:
+        conn: Conexión de escritura
+        rows: Filas insertadas en el orden de INSERT_COLUMNS
+    """
+    params = accumulate(rows)
+    if params:
+        conn.executemany(UPSERT_SQL, params)
+
+
+def setup_rollups(conn: sqlite3.Connection) -> None:
+    """
+    Crear la tabla de rollups y calcular desde el historial existente las métricas sin filas.
+
+    Cubre tanto la primera creación de la tabla como las métricas añadidas
+    después a ROLLUP_METRICS.
+
+    Args:
+        conn: Conexión de escritura
+    """
+    conn.execute(ROLLUPS_DDL)
+    present = {row[0] for row in conn.execute("SELECT DISTINCT metric FROM sensor_rollups")}
+    missing = [metric for metric in ROLLUP_METRICS if metric not in present]
+
+    for metric in missing:
+        for seconds in RESOLUTIONS.values():
+            conn.execute(f"""
+                INSERT INTO sensor_rollups (metric, resolution, bucket, count, sum, min, max)
+                SELECT ?, ?, epoch - epoch % ?, COUNT({metric}), SUM({metric}), MIN({metric}), MAX({metric})
+                FROM sensor_data
+                WHERE {metric} IS NOT NULL AND epoch IS NOT NULL
+                GROUP BY epoch - epoch % ?
+            """, (metric, seconds, seconds, seconds))
+    if missing:
+        logger.info(f"Rollups calculados desde el historial existente: {', '.join(missing)}")
+
+
+def lttb(points: Sequence[Tuple[float, float]], threshold: int) -> List[Tuple[float, float]]:
+    """
+    Reducir una serie con el algoritmo Largest-Triangle-Three-Buckets.
+
+    Conserva la forma visual de la serie (picos y valles) con muchos menos puntos.
+
+    Args:
+        points: Puntos (t, valor) ordenados por t
+        threshold: Número de puntos deseado
+
+    Returns:
+        Serie reducida a como máximo `threshold` puntos
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Media del bucket siguiente
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        span = avg_end - avg_start
+        avg_t = sum(p[0] for p in points[avg_start:avg_end]) / span
+        avg_v = sum(p[1] for p in points[avg_start:avg_end]) / span
+
+        # Punto del bucket actual que forma el triángulo de mayor área
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        at, av = points[a]
+        max_area = -1.0
+        chosen = range_start
+        for j in range(range_start, range_end):
+            area = abs((at - avg_t) * (points[j][1] - av) - (at - points[j][0]) * (avg_v - av))
+            if area > max_area:
+                max_area = area
+                chosen = j
+        sampled.append(points[chosen])
+        a = chosen
+
+    sampled.append(points[-1])
+    return sampled
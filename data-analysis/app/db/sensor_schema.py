@@ -0,0 +1,271 @@
+"""
+Esquema tipado de la tabla sensor_data.
+
+Cada lectura se descompone en columnas REAL/INTEGER para los grupos de
+sensores conocidos (los que emite el servicio fake-data) y una columna
+JSON de desbordamiento (`extra`) para cualquier clave desconocida. Así
+SQLite puede filtrar y agregar sin que Python tenga que parsear JSON.
+"""
+import json
+import logging
+import sqlite3
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Grupos de sensores conocidos: grupo -> ((campo, tipo SQL), ...)
+SENSOR_GROUPS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "sensor_bmp390": (
+        ("presion_hPa", "REAL"),
+        ("temperatura_a", "REAL"),
+    ),
+    "sensor_ltr390": (
+        ("luz_cruda", "INTEGER"),
+        ("uv_crudo", "INTEGER"),
+        ("lux", "REAL"),
+        ("indice_uv", "REAL"),
+    ),
+    "sensor_scd30": (
+        ("co2_ppm", "REAL"),
+        ("temperatura_b", "REAL"),
+        ("humedad_pct", "REAL"),
+    ),
+    "gps": (
+        ("latitud", "REAL"),
+        ("longitud", "REAL"),
+    ),
+    "clima_satelital": tuple(
+        (name, "REAL") for name in (
+            "T2M", "T2M_MAX", "T2M_MIN", "T2M_RANGE", "PRECTOTCORR", "RH2M",
+            "QV2M", "WS10M", "WS10M_MAX", "WS10M_MIN", "T2MDEW", "T2MWET", "TS",
+            "ALLSKY_SFC_LW_DWN", "ALLSKY_SFC_SW_DWN", "CLRSKY_SFC_SW_DWN",
+            "ALLSKY_KT", "EVLAND", "PS",
+        )
+    ),
+}
+
+# Bit de cada grupo en la columna groups_mask (presencia del grupo en la lectura)
+GROUP_BITS: Dict[str, int] = {group: 1 << i for i, group in enumerate(SENSOR_GROUPS)}
+
+# Columna -> (grupo, campo). Los nombres de campo son únicos entre grupos.
+SENSOR_COLUMNS: Dict[str, Tuple[str, str]] = {
+    field: (group, field)
+    for group, fields in SENSOR_GROUPS.items()
+    for field, _ in fields
+}
+
+_COLUMN_NAMES: List[str] = list(SENSOR_COLUMNS)
+
+# Columnas necesarias para reconstruir una lectura y columnas usadas por INSERT
+READING_COLUMNS: List[str] = ["source_timestamp", "groups_mask"] + _COLUMN_NAMES + ["extra"]
+INSERT_COLUMNS: List[str] = ["timestamp", "epoch"] + READING_COLUMNS
+INSERT_SQL: str = (
+    f"INSERT INTO sensor_data ({', '.join(INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in INSERT_COLUMNS)})"
+)
+
+# Conversión en SQL de la marca de tiempo textual (hora local) a segundos epoch
+EPOCH_FROM_TEXT_SQL: str = "CAST(strftime('%s', timestamp, 'utc') AS INTEGER)"
+
+_COLUMN_DEFS: str = ",\n            ".join(
+    f"{field} {sql_type}" for fields in SENSOR_GROUPS.values() for field, sql_type in fields
+)
+
+
+def sensor_data_ddl(table: str = "sensor_data") -> str:
+    """Obtener la sentencia CREATE TABLE del esquema tipado."""
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            epoch INTEGER,
+            source_timestamp TEXT,
+            groups_mask INTEGER NOT NULL DEFAULT 0,
+            {_COLUMN_DEFS},
+            extra TEXT
+        )
+    """
+
+
+_NUMERIC = (int, float)
+
+
+def reading_columns(alias: str = "") -> str:
+    """
+    Obtener la lista SQL de columnas que necesita build_reading.
+
+    Args:
+        alias: Alias de la tabla sensor_data en la consulta (p. ej. "sd")
+
+    Returns:
+        Columnas separadas por comas, con el alias como prefijo si se indica
+    """
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(f"{prefix}{column}" for column in READING_COLUMNS)
+
+
+def _sql_value(value: Any, sql_type: str) -> Tuple[bool, Any]:
+    """Indicar si un valor cabe en una columna tipada y devolverlo adaptado."""
+    if value is None:
+        return True, None
+    if isinstance(value, bool) or not isinstance(value, _NUMERIC):
+        return False, value
+    if sql_type == "INTEGER" and not isinstance(value, int):
+        return False, value
+    return True, value
+
+
+def flatten_reading(reading: Dict[str, Any], timestamp: str, epoch: int) -> Tuple[Any, ...]:
+    """
+    Convertir una lectura anidada en la fila tipada de sensor_data.
+
+    Args:
+        reading: Lectura de sensores tal como la envía el dispositivo
+        timestamp: Marca de tiempo del registro en formato de la BD
+        epoch: Marca de tiempo del registro en segundos epoch (columna indexada)
+
+    Returns:
+        Tupla de valores en el orden de INSERT_COLUMNS
+    """
+    if not isinstance(reading, dict):
+        raise ValueError("Los datos de sensores deben ser un objeto JSON")
+
+    mask = 0
+    values: Dict[str, Any] = {}
+    extra: Dict[str, Any] = {}
+
+    for key, group_value in reading.items():
+        fields = SENSOR_GROUPS.get(key)
+        if fields is None or not isinstance(group_value, dict):
+            if key != "timestamp":
+                extra[key] = group_value
+            continue
+
+        mask |= GROUP_BITS[key]
+        leftover: Dict[str, Any] = {}
+        types = dict(fields)
+        for field, value in group_value.items():
+            sql_type = types.get(field)
+            if sql_type is not None:
+                fits, adapted = _sql_value(value, sql_type)
+                if fits:
+                    values[field] = adapted
+                    continue
+            leftover[field] = value
+        if leftover:
+            extra[key] = leftover
+
+    source_ts = reading.get("timestamp")
+    if source_ts is not None and not isinstance(source_ts, str):
+        extra["timestamp"] = source_ts
+        source_ts = None
+
+    return (
+        (timestamp, epoch, source_ts, mask)
+        + tuple(values.get(column) for column in _COLUMN_NAMES)
+        + (json.dumps(extra) if extra else None,)
+    )
+
+
+def build_reading(row: sqlite3.Row) -> Dict[str, Any]:
+    """
+    Reconstruir la lectura anidada original a partir de una fila tipada.
+
+    Sólo se parsea JSON cuando la fila tiene claves de desbordamiento.
+
+    Args:
+        row: Fila que incluya las columnas de READING_COLUMNS
+
+    Returns:
+        Diccionario con la misma estructura que la lectura original
+        (los campos conocidos de un grupo presente que faltaban quedan como None)
+    """
+    reading: Dict[str, Any] = {}
+    if row["source_timestamp"] is not None:
+        reading["timestamp"] = row["source_timestamp"]
+
+    mask = row["groups_mask"]
+    for group, fields in SENSOR_GROUPS.items():
+        if mask & GROUP_BITS[group]:
+            reading[group] = {field: row[field] for field, _ in fields}
+
+    extra = row["extra"]
+    if extra:
+        for key, value in json.loads(extra).items():
+            if isinstance(value, dict) and isinstance(reading.get(key), dict):
+                reading[key].update(value)
+            else:
+                reading[key] = value
+
+    return reading
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    """Obtener los nombres de columna de una tabla."""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def migrate_legacy_sensor_data(conn: sqlite3.Connection, chunk_size: int = 5000) -> int:
+    """
+    Migrar una tabla sensor_data antigua (JSON en `data` o `raw_data`) al esquema tipado.
+
+    La migración conserva los IDs, de modo que las referencias desde
+    analysis_results siguen siendo válidas. Debe ejecutarse dentro de una
+    transacción de escritura.
+
+    Args:
+        conn: Conexión de escritura
+        chunk_size: Registros leídos y reinsertados por iteración
+
+    Returns:
+        Número de registros migrados (0 si no había nada que migrar)
+    """
+    columns = _table_columns(conn, "sensor_data")
+    if not columns or "groups_mask" in columns:
+        return 0
+
+    json_column = "data" if "data" in columns else "raw_data" if "raw_data" in columns else None
+    if json_column is None:
+        raise Exception("Formato de la tabla sensor_data no reconocido, no se puede migrar")
+
+    logger.info("Migrando sensor_data al esquema tipado (columna origen: %s)", json_column)
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    # Se copia a una tabla nueva y luego se renombra: renombrar la tabla antigua
+    # reescribiría las claves foráneas de analysis_results hacia el nombre temporal.
+    conn.execute("DROP TABLE IF EXISTS sensor_data_typed")
+    conn.execute(sensor_data_ddl("sensor_data_typed"))
+
+    migrated = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT id, timestamp, {EPOCH_FROM_TEXT_SQL}, {json_column} FROM sensor_data "
+            f"WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, chunk_size)
+        ).fetchall()
+        if not rows:
+            break
+
+        batch = []
+        for row in rows:
+            try:
+                reading = json.loads(row[3]) if row[3] else {}
+            except json.JSONDecodeError:
+                reading = {"_raw": row[3]}
+            if not isinstance(reading, dict):
+                reading = {"_raw": reading}
+            batch.append((row[0],) + flatten_reading(reading, row[1], row[2]))
+
+        conn.executemany(
+            f"INSERT INTO sensor_data_typed (id, {', '.join(INSERT_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in range(len(INSERT_COLUMNS) + 1))})",
+            batch
+        )
+        migrated += len(batch)
+        last_id = rows[-1][0]
+
+    conn.execute("DROP TABLE sensor_data")
+    conn.execute("ALTER TABLE sensor_data_typed RENAME TO sensor_data")
+    logger.info("Migración de sensor_data completada (%s registros)", migrated)
+    return migrated
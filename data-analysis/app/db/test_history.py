@@ -0,0 +1,57 @@
+import unittest
+from datetime import datetime, timedelta
+from app.db.manager import DBManager, encode_cursor
+
+class TestHistoryPagination(unittest.TestCase):
+
+    def setUp(self):
+        """Configura una base de datos en memoria con 50 lecturas, una por minuto."""
+        self.db_manager = DBManager(db_path=":memory:")
+        self.base = datetime(2024, 5, 7, 6, 0, 0)
+        readings = [
+            {"timestamp": (self.base + timedelta(minutes=i)).isoformat(), "sensor_bmp390": {"temperatura_a": float(i)}}
+            for i in range(50)
+        ]
+        self.ids = self.db_manager.save_sensor_data_many(readings)
+
+    def tearDown(self):
+        """Cierra la base de datos."""
+        self.db_manager.close()
+
+    def test_time_range_filter(self):
+        """El rango temporal es inclusivo en ambos extremos."""
+        start = int((self.base + timedelta(minutes=10)).timestamp())
+        end = int((self.base + timedelta(minutes=19)).timestamp())
+        records = self.db_manager.get_sensor_records(limit=100, start=start, end=end)
+        self.assertEqual(len(records), 10)
+        self.assertEqual(records[0]["raw_data"]["sensor_bmp390"]["temperatura_a"], 19.0)
+        self.assertEqual(records[-1]["raw_data"]["sensor_bmp390"]["temperatura_a"], 10.0)
+
+    def test_keyset_pagination_walks_history(self):
+        """Recorrer el historial por cursores devuelve cada registro una sola vez."""
+        seen = []
+        cursor = None
+        while True:
+            page = self.db_manager.get_sensor_records(limit=7, cursor=cursor)
+            seen.extend(record["id"] for record in page)
+            if len(page) < 7:
+                break
+            cursor = encode_cursor(page[-1]["epoch"], page[-1]["id"])
+        self.assertEqual(seen, list(reversed(self.ids)))
+
+    def test_invalid_cursor_rejected(self):
+        """Un cursor mal formado produce ValueError."""
+        with self.assertRaises(ValueError):
+            self.db_manager.get_sensor_records(limit=5, cursor="no-es-un-cursor")
+
+    def test_range_query_uses_index(self):
+        """Las consultas por rango usan el índice sobre (epoch, id)."""
+        with self.db_manager.pool.reader() as conn:
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM sensor_data WHERE epoch >= ? ORDER BY epoch DESC, id DESC LIMIT 5",
+                (0,)
+            ).fetchall()
+        self.assertTrue(any("idx_sensor_data_epoch" in row[3] for row in plan))
+
+if __name__ == '__main__':
+    unittest.main()
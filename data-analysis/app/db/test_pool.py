@@ -0,0 +1,72 @@
+import unittest
+import os
+import json
+import tempfile
+import threading
+from app.db.manager import DBManager
+from app.db.pool import ConnectionPool
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        """Crea una base de datos temporal en disco (WAL no aplica a :memory:)."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "sensores.db")
+        self.db_manager = DBManager(db_path=self.db_path)
+
+    def tearDown(self):
+        """Cierra el pool y elimina los archivos temporales."""
+        self.db_manager.close()
+        self.tmpdir.cleanup()
+
+    def test_wal_mode_enabled(self):
+        """La base de datos en disco debe usar journal WAL."""
+        with self.db_manager.pool.reader() as conn:
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode.lower(), "wal")
+
+    def test_shared_pool_and_schema_once(self):
+        """Dos gestores sobre el mismo archivo comparten pool y esquema."""
+        other = DBManager(db_path=self.db_path)
+        self.assertIs(other.pool, self.db_manager.pool)
+        self.assertTrue(other.pool.schema_ready)
+
+    def test_readers_not_blocked_by_open_write(self):
+        """Un lector debe poder leer mientras el escritor mantiene una transacción abierta."""
+        data_id = self.db_manager.save_sensor_data(json.dumps({"sensor": "test", "value": 1}))
+        self.db_manager.save_analysis_result(data_id, "Análisis inicial")
+
+        write_started = threading.Event()
+        release_write = threading.Event()
+
+        def long_write():
+            with self.db_manager.pool.writer() as conn:
+                conn.execute(
+                    "INSERT INTO sensor_data (timestamp) VALUES (?)",
+                    ("2024-01-01 00:00:00",)
+                )
+                write_started.set()
+                release_write.wait(5)
+
+        writer = threading.Thread(target=long_write)
+        writer.start()
+        try:
+            self.assertTrue(write_started.wait(5))
+            results = self.db_manager.get_analysis_results(limit=10)
+            self.assertEqual(len(results), 1)
+            # El lector ve la última instantánea confirmada, sin la fila pendiente
+            records = self.db_manager.get_sensor_records(limit=10)
+            self.assertEqual(len(records), 1)
+        finally:
+            release_write.set()
+            writer.join()
+
+        self.assertEqual(len(self.db_manager.get_sensor_records(limit=10)), 2)
+
+    def test_invalid_synchronous_rejected(self):
+        """Un valor de synchronous no válido debe rechazarse."""
+        with self.assertRaises(ValueError):
+            ConnectionPool(":memory:", synchronous="SOMETIMES")
+
+if __name__ == '__main__':
+    unittest.main()
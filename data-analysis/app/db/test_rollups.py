@@ -0,0 +1,85 @@
+import unittest
+import math
+from datetime import datetime, timedelta
+from app.db.manager import DBManager
+from app.db.rollups import lttb
+
+class TestRollups(unittest.TestCase):
+
+    def setUp(self):
+        """Configura una base de datos en memoria con 2 horas de lecturas cada 10 s."""
+        self.db_manager = DBManager(db_path=":memory:")
+        self.base = datetime(2024, 5, 7, 6, 0, 0)
+        self.readings = [
+            {
+                "timestamp": (self.base + timedelta(seconds=10 * i)).isoformat(),
+                "sensor_bmp390": {"temperatura_a": 20.0 + (i % 6)},
+            }
+            for i in range(720)
+        ]
+        self.start = int(self.base.timestamp())
+        self.end = self.start + 2 * 3600 - 1
+
+    def tearDown(self):
+        """Cierra la base de datos."""
+        self.db_manager.close()
+
+    def test_rollups_match_raw_aggregates(self):
+        """Los buckets precalculados coinciden con los agregados de las lecturas."""
+        # Mezcla de inserción por lotes e individual
+        self.db_manager.save_sensor_data_many(self.readings[:400])
+        for reading in self.readings[400:]:
+            self.db_manager.save_sensor_data_many([reading])
+
+        series = self.db_manager.get_sensor_series(["temperatura_a"], self.start, self.end, "5m")
+        buckets = series["temperatura_a"]
+        self.assertEqual(len(buckets), 24)
+        self.assertTrue(all(b["count"] == 30 for b in buckets))
+        self.assertTrue(all(b["min"] == 20.0 and b["max"] == 25.0 for b in buckets))
+        self.assertAlmostEqual(buckets[0]["avg"], 22.5)
+
+        hourly = self.db_manager.get_sensor_series(["temperatura_a"], self.start, self.end, "1h")
+        self.assertEqual([b["count"] for b in hourly["temperatura_a"]], [360, 360])
+
+    def test_rollups_backfilled_for_existing_history(self):
+        """Si la tabla de rollups se crea sobre datos existentes, se calcula desde ellos."""
+        self.db_manager.save_sensor_data_many(self.readings)
+        with self.db_manager.pool.writer() as conn:
+            conn.execute("DROP TABLE sensor_rollups")
+        self.db_manager.setup_database()
+
+        series = self.db_manager.get_sensor_series(["temperatura_a"], self.start, self.end, "1h")
+        self.assertEqual([b["count"] for b in series["temperatura_a"]], [360, 360])
+
+    def test_rollups_backfilled_for_new_metric(self):
+        """Una métrica configurada sin filas de rollup se calcula sin duplicar las demás."""
+        for reading in self.readings:
+            reading["sensor_bmp390"]["presion_hPa"] = 885.0
+        self.db_manager.save_sensor_data_many(self.readings)
+        with self.db_manager.pool.writer() as conn:
+            conn.execute("DELETE FROM sensor_rollups WHERE metric = 'presion_hPa'")
+        self.db_manager.setup_database()
+
+        series = self.db_manager.get_sensor_series(
+            ["temperatura_a", "presion_hPa"], self.start, self.end, "1h"
+        )
+        self.assertEqual([b["count"] for b in series["temperatura_a"]], [360, 360])
+        self.assertEqual([b["count"] for b in series["presion_hPa"]], [360, 360])
+
+    def test_unknown_metric_rejected(self):
+        """Una métrica sin rollup produce ValueError."""
+        with self.assertRaises(ValueError):
+            self.db_manager.get_sensor_series(["latitud"], self.start, self.end, "1m")
+
+    def test_lttb_keeps_endpoints_and_peaks(self):
+        """LTTB reduce al número pedido conservando extremos y el pico."""
+        points = [(float(i), math.sin(i / 50.0)) for i in range(1000)]
+        points[500] = (500.0, 10.0)
+        sampled = lttb(points, 100)
+        self.assertEqual(len(sampled), 100)
+        self.assertEqual(sampled[0], points[0])
+        self.assertEqual(sampled[-1], points[-1])
+        self.assertIn((500.0, 10.0), sampled)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+import os
+import json
+import sqlite3
+import tempfile
+from app.db.manager import DBManager
+
+READING = {
+    "timestamp": "2024-05-01T06:30:00",
+    "sensor_bmp390": {"presion_hPa": 885.7, "temperatura_a": 24.2},
+    "sensor_ltr390": {"luz_cruda": 90, "uv_crudo": 1, "lux": 81.3, "indice_uv": 0.69},
+    "sensor_scd30": {"co2_ppm": None, "temperatura_b": 23.1, "humedad_pct": None},
+    "gps": {"latitud": 9.8893941, "longitud": -84.0899409},
+    "clima_satelital": {"T2M": 22.5, "RH2M": 92.3, "PRECTOTCORR": 14.7, "WS10M": 0.99},
+    "bateria": {"voltaje": 12.4},
+}
+
+class TestSensorSchema(unittest.TestCase):
+
+    def setUp(self):
+        """Configura una base de datos en memoria."""
+        self.db_manager = DBManager(db_path=":memory:")
+
+    def tearDown(self):
+        """Cierra la base de datos."""
+        self.db_manager.close()
+
+    def test_roundtrip_preserves_reading(self):
+        """Una lectura guardada se reconstruye con la misma estructura."""
+        self.db_manager.save_sensor_data(READING)
+        stored = self.db_manager.get_sensor_records(limit=1)[0]["raw_data"]
+
+        self.assertEqual(stored["sensor_bmp390"], READING["sensor_bmp390"])
+        self.assertEqual(stored["sensor_ltr390"], READING["sensor_ltr390"])
+        self.assertIsInstance(stored["sensor_ltr390"]["luz_cruda"], int)
+        self.assertEqual(stored["sensor_scd30"], READING["sensor_scd30"])
+        self.assertEqual(stored["bateria"], {"voltaje": 12.4})
+        self.assertEqual(stored["clima_satelital"]["RH2M"], 92.3)
+        self.assertEqual(stored["timestamp"], READING["timestamp"])
+
+    def test_typed_columns_queryable(self):
+        """Los campos conocidos se guardan como columnas y se agregan en SQL."""
+        for temperature in (20.0, 22.0, 24.0):
+            reading = dict(READING, sensor_bmp390={"presion_hPa": 885.0, "temperatura_a": temperature})
+            self.db_manager.save_sensor_data(reading)
+
+        stats = self.db_manager.get_sensor_stats(["temperatura_a", "co2_ppm"])
+        self.assertEqual(stats["temperatura_a"]["min"], 20.0)
+        self.assertEqual(stats["temperatura_a"]["max"], 24.0)
+        self.assertAlmostEqual(stats["temperatura_a"]["avg"], 22.0)
+        self.assertEqual(stats["co2_ppm"]["count"], 0)
+
+        with self.assertRaises(ValueError):
+            self.db_manager.get_sensor_stats(["temperatura_a; DROP TABLE sensor_data"])
+
+class TestLegacyMigration(unittest.TestCase):
+
+    def setUp(self):
+        """Crea una base de datos en disco con el esquema JSON antiguo."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "sensores.db")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE sensor_data (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, data TEXT NOT NULL)")
+        conn.execute("""
+            CREATE TABLE analysis_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                data_id INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                FOREIGN KEY (data_id) REFERENCES sensor_data (id)
+            )
+        """)
+        for i in range(3):
+            conn.execute(
+                "INSERT INTO sensor_data (timestamp, data) VALUES (?, ?)",
+                (f"2024-01-01 00:00:0{i}", json.dumps(READING))
+            )
+        conn.execute(
+            "INSERT INTO analysis_results (data_id, result, timestamp) VALUES (2, 'ok', '2024-01-01 00:00:05')"
+        )
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        """Elimina los archivos temporales."""
+        self.tmpdir.cleanup()
+
+    def test_migration_keeps_ids_and_references(self):
+        """La migración conserva los IDs y los análisis siguen enlazados."""
+        db_manager = DBManager(db_path=self.db_path)
+        try:
+            records = db_manager.get_sensor_records(limit=10)
+            self.assertEqual([r["id"] for r in records], [3, 2, 1])
+            self.assertEqual(records[0]["raw_data"]["sensor_bmp390"]["temperatura_a"], 24.2)
+
+            result = db_manager.get_analysis_result(1)
+            self.assertEqual(result["data_id"], 2)
+            self.assertEqual(result["data"]["gps"]["latitud"], 9.8893941)
+
+            # Los nuevos registros continúan la secuencia de IDs
+            self.assertEqual(db_manager.save_sensor_data(READING), 4)
+
+            with db_manager.pool.reader() as conn:
+                fk_sql = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE name = 'analysis_results'"
+                ).fetchone()[0]
+            self.assertIn("REFERENCES sensor_data", fk_sql)
+            self.assertNotIn("sensor_data_typed", fk_sql)
+        finally:
+            db_manager.close()
+
+if __name__ == '__main__':
+    unittest.main()
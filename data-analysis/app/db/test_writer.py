@@ -0,0 +1,100 @@
+import unittest
+import threading
+from app.db.manager import DBManager
+from app.db.writer import GroupCommitWriter
+
+class FailingDBManager(DBManager):
+    """Base de datos que rechaza los lotes con una lectura marcada como defectuosa."""
+
+    def insert_sensor_rows(self, rows):
+        if any(row[-1] and "defectuosa" in row[-1] for row in rows):
+            raise Exception("fallo simulado")
+        return super().insert_sensor_rows(rows)
+
+class TestGroupCommitWriter(unittest.TestCase):
+
+    def setUp(self):
+        """Configura una base de datos en memoria y un escritor por lotes."""
+        self.db_manager = DBManager(db_path=":memory:")
+        self.writer = GroupCommitWriter(self.db_manager, batch_size=50, flush_ms=20)
+
+    def tearDown(self):
+        """Detiene el escritor y cierra la base de datos."""
+        self.writer.stop(timeout=5)
+        self.db_manager.close()
+
+    def test_save_many_returns_consecutive_ids(self):
+        """El guardado por lotes devuelve un ID por registro, en orden."""
+        ids = self.db_manager.save_sensor_data_many(
+            [{"sensor": "test", "value": i} for i in range(10)]
+        )
+        self.assertEqual(len(ids), 10)
+        self.assertEqual(ids, list(range(ids[0], ids[0] + 10)))
+        records = self.db_manager.get_sensor_records(limit=1)
+        self.assertEqual(records[0]["raw_data"]["value"], 9)
+
+    def test_save_many_keeps_reading_timestamp(self):
+        """Una lectura con timestamp ISO conserva su propia marca de tiempo."""
+        self.db_manager.save_sensor_data_many([{"timestamp": "2024-05-01T06:30:00", "value": 1}])
+        records = self.db_manager.get_sensor_records(limit=1)
+        self.assertEqual(records[0]["timestamp"], "2024-05-01 06:30:00")
+
+    def test_concurrent_submits_are_grouped(self):
+        """Las lecturas de varios hilos se guardan todas con IDs únicos."""
+        results = []
+        lock = threading.Lock()
+
+        def produce(start):
+            for i in range(start, start + 25):
+                new_id = self.writer.save({"value": i}, timeout=5)
+                with lock:
+                    results.append(new_id)
+
+        threads = [threading.Thread(target=produce, args=(n * 25,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 200)
+        self.assertEqual(len(set(results)), 200)
+        self.assertEqual(len(self.db_manager.get_sensor_records(limit=500)), 200)
+
+    def test_save_many_ids_read_before_rollups(self):
+        """Los IDs del lote son los de sensor_data aunque se actualicen los agregados."""
+        reading = {"sensor_bmp390": {"temperatura_a": 21.0}}
+        ids = self.db_manager.save_sensor_data_many([reading, reading])
+        self.assertEqual([r["id"] for r in self.db_manager.get_sensor_records(limit=2)], ids[::-1])
+
+    def test_invalid_reading_rejected_on_submit(self):
+        """Una lectura que no se puede guardar se rechaza antes de encolarla."""
+        with self.assertRaises(ValueError):
+            self.writer.submit({"value": b"binario"})
+        self.assertEqual(self.writer.pending(), 0)
+
+    def test_failed_submission_does_not_fail_batch(self):
+        """Si falla el lote, sólo falla el envío defectuoso y el resto se guarda."""
+        self.writer.stop()
+        db = FailingDBManager(db_path=":memory:")
+        writer = GroupCommitWriter(db, batch_size=50, flush_ms=200)
+        try:
+            good = writer.submit({"value": 1})
+            bad = writer.submit({"value": "defectuosa"})
+            many = writer.submit_many([{"value": 2}, {"value": 3}])
+            self.assertIsInstance(good.result(5), int)
+            self.assertEqual(len(many.result(5)), 2)
+            with self.assertRaisesRegex(Exception, "fallo simulado"):
+                bad.result(5)
+        finally:
+            writer.stop(timeout=5)
+        self.assertEqual(len(db.get_sensor_records(limit=10)), 3)
+
+    def test_stop_flushes_pending(self):
+        """Al detener el escritor se vuelcan las lecturas pendientes."""
+        futures = [self.writer.submit({"value": i}) for i in range(5)]
+        self.writer.stop(timeout=5)
+        self.assertTrue(all(f.done() for f in futures))
+        self.assertEqual(len(self.db_manager.get_sensor_records(limit=10)), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+"""
+Escritor en segundo plano con commit agrupado (group commit).
+
+Las lecturas de sensores que llegan desde peticiones concurrentes se
+encolan en una cola acotada y un hilo dedicado las vuelca en una sola
+transacción cada N registros o cada T milisegundos, lo que ocurra antes.
+
+Las lecturas se convierten en filas en el hilo del productor, de modo que
+una lectura no válida se rechaza antes de entrar en la cola. Si aun así
+falla la transacción de un lote, se reintenta cada envío por separado y
+sólo falla el future del envío que no se puede guardar.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, List, Optional, Tuple
+
+from app.db.manager import DBManager
+
+logger = logging.getLogger(__name__)
+
+# Configuración por defecto (se puede sobrescribir mediante variables de entorno)
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_FLUSH_MS = int(os.getenv("INGEST_FLUSH_MS", "50"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_PUT_TIMEOUT = float(os.getenv("INGEST_PUT_TIMEOUT", "5"))
+
+_STOP = object()
+
+
+class IngestQueueFull(Exception):
+    """La cola de ingesta sigue llena tras el tiempo de espera (contrapresión)."""
+
+
+class GroupCommitWriter:
+    """Agrupa inserciones de lecturas de sensores en transacciones por lotes."""
+
+    def __init__(
+        self,
+        db: DBManager,
+        batch_size: Optional[int] = None,
+        flush_ms: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        put_timeout: Optional[float] = None,
+    ):
+        """
+        Inicializar el escritor.
+
+        Args:
+            db: Gestor de base de datos donde se vuelcan los lotes
+            batch_size: Número máximo de registros por transacción
+            flush_ms: Tiempo máximo (ms) que un registro espera en la cola
+            queue_size: Capacidad de la cola; al llenarse se aplica contrapresión
+            put_timeout: Segundos que espera un productor con la cola llena
+        """
+        self.db = db
+        self.batch_size = max(1, batch_size or INGEST_BATCH_SIZE)
+        self.flush_interval = (flush_ms if flush_ms is not None else INGEST_FLUSH_MS) / 1000
+        self.put_timeout = put_timeout if put_timeout is not None else INGEST_PUT_TIMEOUT
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size or INGEST_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Arrancar el hilo escritor si no está en marcha."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="group-commit-writer", daemon=True
+                )
+                self._thread.start()
+                logger.info(
+                    f"Escritor por lotes iniciado (lote={self.batch_size}, "
+                    f"intervalo={self.flush_interval * 1000:.0f} ms)"
+                )
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Detener el hilo escritor tras volcar los registros pendientes.
+
+        Args:
+            timeout: Segundos máximos de espera para el vaciado
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        logger.info("Escritor por lotes detenido")
+
+    def submit(self, data: Any) -> "Future[int]":
+        """
+        Encolar una lectura para guardarla en el siguiente lote.
+
+        Args:
+            data: Datos de sensores (diccionario o string JSON)
+
+        Returns:
+            Future que se resuelve con el ID del registro insertado
+
+        Raises:
+            ValueError: Si la lectura no es válida
+            IngestQueueFull: Si la cola sigue llena tras el tiempo de espera
+        """
+        return self._enqueue([data], single=True)
+
+    def submit_many(self, records: List[Any]) -> "Future[List[int]]":
+        """
+        Encolar varias lecturas como una unidad: se guardan todas en la misma
+        transacción o no se guarda ninguna.
+
+        Args:
+            records: Lista de datos de sensores (diccionarios o strings JSON)
+
+        Returns:
+            Future que se resuelve con los IDs insertados, en el mismo orden
+
+        Raises:
+            ValueError: Si alguna lectura no es válida
+            IngestQueueFull: Si la cola sigue llena tras el tiempo de espera
+        """
+        return self._enqueue(records, single=False)
+
+    def _enqueue(self, records: List[Any], single: bool) -> Future:
+        """Convertir las lecturas en filas y encolarlas como un solo envío."""
+        rows = self.db.build_sensor_rows(records)
+        self.start()
+        future: Future = Future()
+        try:
+            self._queue.put((rows, future, single), timeout=self.put_timeout)
+        except queue.Full:
+            logger.warning("Cola de ingesta llena, se rechazan %s lecturas", len(rows))
+            raise IngestQueueFull("Cola de ingesta llena, inténtelo más tarde")
+        return future
+
+    def save(self, data: Any, timeout: Optional[float] = None) -> int:
+        """
+        Guardar una lectura esperando a que su lote se confirme.
+
+        Args:
+            data: Datos de sensores (diccionario o string JSON)
+            timeout: Segundos máximos de espera del commit
+
+        Returns:
+            ID del registro insertado
+        """
+        return self.submit(data).result(timeout)
+
+    def save_many(self, records: List[Any], timeout: Optional[float] = None) -> List[int]:
+        """
+        Guardar varias lecturas como una unidad esperando a que su lote se confirme.
+
+        Args:
+            records: Lista de datos de sensores (diccionarios o strings JSON)
+            timeout: Segundos máximos de espera del commit
+
+        Returns:
+            IDs insertados, en el mismo orden que las lecturas
+        """
+        return self.submit_many(records).result(timeout)
+
+    def pending(self) -> int:
+        """Número aproximado de lecturas en espera de ser guardadas."""
+        return self._queue.qsize()
+
+    def _run(self) -> None:
+        """Bucle del hilo escritor: reunir lotes y volcarlos."""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch: List[Tuple[List[Any], Future, bool]] = [item]
+            size = len(item[0])
+            deadline = time.monotonic() + self.flush_interval
+
+            while size < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[List[Any], Future, bool]]) -> None:
+        """Guardar un lote en una transacción y resolver sus futures."""
+        try:
+            ids = self.db.insert_sensor_rows([row for rows, _, _ in batch for row in rows])
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0][1], e)
+                return
+            # Un envío defectuoso no debe hacer perder los de otros clientes
+            logger.warning("Error al volcar lote de %s envíos, se reintenta por separado: %s", len(batch), e)
+            for item in batch:
+                self._flush([item])
+            return
+        offset = 0
+        for rows, future, single in batch:
+            item_ids = ids[offset:offset + len(rows)]
+            offset += len(rows)
+            future.set_result(item_ids[0] if single else item_ids)
+
+    @staticmethod
+    def _fail(future: Future, error: Exception) -> None:
+        """Resolver con error el future de un envío que no se pudo guardar."""
+        logger.error("Error al guardar lecturas: %s", error)
+        future.set_exception(error)
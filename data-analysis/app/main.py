@@ -9,13 +9,37 @@ from fastapi.middleware.cors import CORSMiddleware
 import requests
 
 from app.db.manager import DBManager
+from app.db.pool import close_all_pools
+from app.utils.http_client import close_async_client
 from app.ai.ollama_client import OllamaClient
-from app.api.routes import router
+from app.ai.ollama_transport import close_transports
+from app.utils.prompt_templates import load_templates
+from app.utils.logging_config import configure_logging, parse_mapping
+from app.api.routes import router, ingest_writer, ingest_scheduler, job_queue, model_catalog
 
-# Configuración de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Configuración de logging (se puede sobrescribir mediante variables de entorno)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_FILE = os.getenv("LOG_FILE", "")
+LOG_FILE_MAX_BYTES = int(os.getenv("LOG_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_FILE_BACKUPS = int(os.getenv("LOG_FILE_BACKUPS", "3"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", "50"))
+LOG_RATE_BURST = float(os.getenv("LOG_RATE_BURST", "200"))
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+
+configure_logging(
+    level=LOG_LEVEL,
+    fmt=LOG_FORMAT,
+    log_file=LOG_FILE or None,
+    file_max_bytes=LOG_FILE_MAX_BYTES,
+    file_backups=LOG_FILE_BACKUPS,
+    queue_size=LOG_QUEUE_SIZE,
+    rate_limit=LOG_RATE_LIMIT,
+    burst=LOG_RATE_BURST,
+    sample_rates={name: float(rate) for name, rate in parse_mapping(LOG_SAMPLING).items()},
+    levels=parse_mapping(LOG_LEVELS),
 )
 logger = logging.getLogger(__name__)
 
@@ -33,6 +57,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Incluir router
@@ -46,19 +71,23 @@ DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "gemma3:4b")
 @app.on_event("startup")
 async def startup_event():
     """Configuración inicial al iniciar la aplicación."""
-    logger.info("Inicializando la base de datos...")
-    db_manager.setup_database()
+    # El esquema ya se configuró al crear el DBManager (una vez por proceso)
+    logger.info("Base de datos lista en: %s", db_manager.db_path)
+    
+    # Leer y compilar las plantillas de prompts una sola vez
+    load_templates()
+    
+    # Comprobar periódicamente la salud de los hosts de Ollama
+    await ollama_client.router.start()
+    
+    # Cargar el catálogo de modelos en segundo plano (avisa si falta el modelo por defecto)
+    await model_catalog.start()
     
-    # Verificar si el modelo está disponible
-    logger.info(f"Verificando si el modelo {DEFAULT_MODEL} está disponible...")
-    models = ollama_client.get_models()
-    logger.info(f"Modelos disponibles: {models}")
+    # Arrancar los workers de análisis (reanuda los trabajos pendientes)
+    await job_queue.start()
     
-    if DEFAULT_MODEL in models:
-        logger.info(f"Modelo {DEFAULT_MODEL} encontrado en la lista de modelos")
-    else:
-        logger.info(f"Modelo {DEFAULT_MODEL} no encontrado. Por favor, descárgalo manualmente.")
-        logger.info(f"Puede usar: 'ollama pull {DEFAULT_MODEL}' en la máquina host")
+    # Consultar las fuentes de lecturas y programar los análisis
+    await ingest_scheduler.start()
     
     logger.info("Aplicación inicializada correctamente")
 
@@ -66,7 +95,14 @@ async def startup_event():
 async def shutdown_event():
     """Limpieza al detener la aplicación."""
     logger.info("Cerrando conexiones...")
-    # Cerrar cualquier conexión pendiente si es necesario
+    await ingest_scheduler.stop()
+    await job_queue.stop()
+    await model_catalog.stop()
+    await ollama_client.router.stop()
+    await close_async_client()
+    close_transports()
+    ingest_writer.stop(timeout=10)
+    close_all_pools()
     
     logger.info("Aplicación detenida correctamente")
 
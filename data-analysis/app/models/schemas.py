@@ -1,12 +1,47 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Dict, Any, List, Optional
 
+class GPSData(BaseModel):
+    """Posición del robot."""
+    model_config = ConfigDict(extra="allow")
+    latitud: Optional[float] = Field(None, ge=-90, le=90)
+    longitud: Optional[float] = Field(None, ge=-180, le=180)
+
+class BMP390Data(BaseModel):
+    """Lectura del sensor de presión y temperatura BMP390."""
+    model_config = ConfigDict(extra="allow")
+    presion_hPa: Optional[float] = None
+    temperatura_a: Optional[float] = None
+
+class LTR390Data(BaseModel):
+    """Lectura del sensor de luz y ultravioleta LTR390."""
+    model_config = ConfigDict(extra="allow")
+    luz_cruda: Optional[int] = None
+    uv_crudo: Optional[int] = None
+    lux: Optional[float] = None
+    indice_uv: Optional[float] = None
+
+class SCD30Data(BaseModel):
+    """Lectura del sensor de CO2, temperatura y humedad SCD30."""
+    model_config = ConfigDict(extra="allow")
+    co2_ppm: Optional[float] = None
+    temperatura_b: Optional[float] = None
+    humedad_pct: Optional[float] = None
+
 class SensorData(BaseModel):
-    """Modelo de datos de sensores."""
-    gps: Dict[str, Any]
-    sensor_bmp390: Dict[str, Any]
-    sensor_ltr390: Dict[str, Any]
-    clima_satelital: Dict[str, Any]
+    """
+    Modelo de datos de sensores.
+    
+    Todos los grupos son opcionales (un robot puede no llevar algún sensor)
+    y se admiten claves adicionales, que se guardan en la columna extra.
+    """
+    model_config = ConfigDict(extra="allow")
+    timestamp: Optional[str] = None
+    gps: Optional[GPSData] = None
+    sensor_bmp390: Optional[BMP390Data] = None
+    sensor_ltr390: Optional[LTR390Data] = None
+    sensor_scd30: Optional[SCD30Data] = None
+    clima_satelital: Optional[Dict[str, Optional[float]]] = None
 
 class AnalysisResponse(BaseModel):
     """Modelo de respuesta de análisis."""
@@ -15,6 +50,54 @@ class AnalysisResponse(BaseModel):
     response_id: int
     response: str
 
+class JobResponse(BaseModel):
+    """
+    Modelo de respuesta al encolar un análisis.
+    
+    Si las condiciones no han cambiado desde el último análisis no se encola
+    ningún trabajo (status "unchanged") y se devuelve el último análisis.
+    """
+    message: str
+    job_id: Optional[int] = None
+    data_id: int
+    status: str
+    reason: Optional[str] = None
+    response_id: Optional[int] = None
+    response: Optional[str] = None
+
+class JobStatus(BaseModel):
+    """Estado de un trabajo de análisis."""
+    id: int
+    data_id: int
+    model: str
+    status: str
+    response_id: Optional[int] = None
+    response: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+class BatchAnalysisRequest(BaseModel):
+    """Petición de análisis conjunto de varias lecturas."""
+    data_ids: List[int]
+    modelo: Optional[str] = None
+
+class BatchAnalysisResponse(BaseModel):
+    """Modelo de respuesta al encolar un análisis por lotes."""
+    message: str
+    batch_id: str
+    job_ids: List[int] = Field(default_factory=list)
+    data_ids: List[int] = Field(default_factory=list)
+    status: str
+
+class BatchIngestResponse(BaseModel):
+    """Modelo de respuesta de la ingesta por lotes."""
+    message: str
+    count: int
+    ids: List[int] = Field(default_factory=list)
+
 class ModelInfo(BaseModel):
     """Información de un modelo de IA."""
     nombre: str
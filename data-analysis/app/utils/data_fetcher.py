@@ -2,36 +2,83 @@
 Utilidades para obtener datos de sensores.
 """
 import os
-import requests
+import httpx
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from app.utils.http_client import get_async_client
+from app.utils.metrics import timed
 
 logger = logging.getLogger(__name__)
 
 # URL de la API de sensores (se puede configurar mediante variable de entorno)
 SENSOR_API_URL = os.getenv("SENSOR_API_URL", "http://0.0.0.0:8080/datos")
 
-def get_sensor_data() -> Dict[str, Any]:
+def _parse_response(response: httpx.Response) -> Dict[str, Any]:
+    """
+    Comprobar el estado HTTP de la respuesta de la API de sensores y leer su JSON.
+
+    Args:
+        response: Respuesta de la API de sensores
+
+    Returns:
+        Diccionario con los datos de los sensores
+    """
+    response.raise_for_status()
+    data = response.json()
+    logger.info("Datos obtenidos correctamente: %s bytes", len(response.content))
+    return data
+
+
+def _fetch_error(error: Exception) -> Exception:
+    """Traducir un fallo de la consulta al error que ven los llamantes."""
+    logger.error("Error al obtener datos de sensores: %s", error)
+    return Exception(f"Error al obtener datos de sensores: {str(error)}")
+
+
+@timed("sensor_fetch")
+def get_sensor_data(url: Optional[str] = None, timeout: float = 30) -> Dict[str, Any]:
     """
     Obtener datos de los sensores desde la API.
     
+    Args:
+        url: URL de la API de sensores (por defecto, SENSOR_API_URL)
+        timeout: Segundos máximos de espera de la respuesta
+    
+    Returns:
+        Diccionario con los datos de los sensores
+    
+    Raises:
+        Exception: Si ocurre un error al obtener los datos
+    """
+    url = url or SENSOR_API_URL
+    logger.debug("Obteniendo datos de sensores desde: %s", url)
+    try:
+        return _parse_response(httpx.get(url, timeout=timeout))
+    except (httpx.HTTPError, ValueError) as e:
+        raise _fetch_error(e)
+
+
+@timed("sensor_fetch")
+async def get_sensor_data_async(url: Optional[str] = None, timeout: float = 30) -> Dict[str, Any]:
+    """
+    Obtener datos de los sensores desde la API sin bloquear el event loop.
+    
+    Usa el cliente HTTP asíncrono compartido (conexiones keep-alive).
+    
+    Args:
+        url: URL de la API de sensores (por defecto, SENSOR_API_URL)
+        timeout: Segundos máximos de espera de la respuesta
+    
     Returns:
         Diccionario con los datos de los sensores
     
     Raises:
         Exception: Si ocurre un error al obtener los datos
     """
+    url = url or SENSOR_API_URL
+    logger.debug("Obteniendo datos de sensores desde: %s", url)
     try:
-        logger.info(f"Obteniendo datos de sensores desde: {SENSOR_API_URL}")
-        response = requests.get(SENSOR_API_URL, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        
-        logger.info(f"Datos obtenidos correctamente: {len(str(data))} bytes")
-        return data
-    except requests.RequestException as e:
-        logger.error(f"Error al obtener datos de sensores: {str(e)}")
-        raise Exception(f"Error al obtener datos de sensores: {str(e)}")
-    except Exception as e:
-        logger.error(f"Error inesperado al obtener datos: {str(e)}")
-        raise 
\ No newline at end of file
+        return _parse_response(await get_async_client().get(url, timeout=timeout))
+    except (httpx.HTTPError, ValueError) as e:
+        raise _fetch_error(e)
@@ -0,0 +1,51 @@
+"""
+Cliente HTTP asíncrono compartido.
+
+Todas las llamadas salientes desde el event loop (API de sensores, Ollama)
+reutilizan un único httpx.AsyncClient con pool de conexiones keep-alive,
+en lugar de abrir una conexión TCP por petición.
+"""
+import os
+import logging
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Configuración del pool (se puede sobrescribir mediante variables de entorno)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Obtener el cliente HTTP asíncrono compartido, creándolo si no existe.
+
+    Returns:
+        Cliente httpx con pool de conexiones keep-alive
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(30.0),
+        )
+        logger.info("Cliente HTTP asíncrono creado (conexiones máx.: %s)", HTTP_MAX_CONNECTIONS)
+    return _client
+
+
+async def close_async_client() -> None:
+    """Cerrar el cliente HTTP asíncrono compartido."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("Cliente HTTP asíncrono cerrado")
+    _client = None
@@ -0,0 +1,260 @@
+"""
+Ingesta continua de lecturas de sensores en segundo plano.
+
+Cada fuente (una URL de la API de sensores) se consulta en su propia tarea
+asíncrona cada cierto intervalo con el cliente HTTP compartido, y las
+lecturas se guardan a través del escritor por lotes (GroupCommitWriter).
+El análisis con IA va desacoplado de la ingesta: con un detector de
+cambios (ver app/ai/change_detector.py), cada lectura pasa por él y sólo
+se encola su análisis si las condiciones han cambiado o el último análisis
+es demasiado antiguo. Sin detector, cada ANALYSIS_SCHEDULE_SECONDS se
+encola el análisis de la lectura más reciente si ha llegado alguna desde
+el último análisis programado.
+
+Las fuentes se configuran en INGEST_SOURCES con el formato
+"url@segundos,url@segundos"; si no se indican, se consulta SENSOR_API_URL
+cada INGEST_POLL_SECONDS segundos.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.db.writer import GroupCommitWriter
+from app.ai.job_queue import AnalysisJobQueue
+from app.ai.change_detector import ChangeDetector
+from app.utils.data_fetcher import SENSOR_API_URL, get_sensor_data_async
+
+logger = logging.getLogger(__name__)
+
+# Configuración (se puede sobrescribir mediante variables de entorno)
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "60"))
+INGEST_FETCH_TIMEOUT = float(os.getenv("INGEST_FETCH_TIMEOUT", "10"))
+INGEST_MAX_BACKOFF = float(os.getenv("INGEST_MAX_BACKOFF", "300"))
+ANALYSIS_SCHEDULE_SECONDS = float(os.getenv("ANALYSIS_SCHEDULE_SECONDS", "3600"))
+
+
+class SensorSource:
+    """Fuente de lecturas consultada periódicamente."""
+
+    def __init__(self, url: str, interval: float):
+        """
+        Inicializar la fuente.
+
+        Args:
+            url: URL de la API de sensores
+            interval: Segundos entre consultas
+        """
+        self.url = url
+        self.interval = interval
+        self.polls = 0
+        self.readings = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_id: Optional[int] = None
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def status(self) -> Dict[str, Any]:
+        """Estado de la fuente para el endpoint de ingesta."""
+        return {
+            "url": self.url,
+            "interval": self.interval,
+            "polls": self.polls,
+            "readings": self.readings,
+            "failures": self.failures,
+            "last_id": self.last_id,
+            "last_success": self.last_success,
+            "last_error": self.last_error,
+        }
+
+
+def parse_sources(spec: Optional[str], default_interval: Optional[float] = None) -> List[SensorSource]:
+    """
+    Leer la lista de fuentes de lecturas.
+
+    Args:
+        spec: Texto con el formato "url@segundos,url@segundos" (el intervalo es opcional)
+        default_interval: Intervalo de las fuentes que no lo indican
+
+    Returns:
+        Fuentes configuradas (SENSOR_API_URL si no se indica ninguna)
+    """
+    interval = default_interval if default_interval is not None else INGEST_POLL_SECONDS
+    sources = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, seconds = item.rpartition("@")
+        try:
+            sources.append(SensorSource(url, float(seconds)))
+        except ValueError:
+            # Sin intervalo (la "@" puede ser parte de la URL)
+            sources.append(SensorSource(item, interval))
+    return sources or [SensorSource(SENSOR_API_URL, interval)]
+
+
+class IngestScheduler:
+    """Consulta periódica de las fuentes de lecturas y análisis programado."""
+
+    def __init__(
+        self,
+        writer: GroupCommitWriter,
+        job_queue: AnalysisJobQueue,
+        sources: Optional[List[SensorSource]] = None,
+        analysis_interval: Optional[float] = None,
+        fetch: Optional[Callable[..., Any]] = None,
+        detector: Optional[ChangeDetector] = None,
+    ):
+        """
+        Inicializar el planificador.
+
+        Args:
+            writer: Escritor por lotes donde se guardan las lecturas
+            job_queue: Cola de trabajos de análisis
+            sources: Fuentes a consultar (por defecto, INGEST_SOURCES)
+            analysis_interval: Segundos entre análisis programados (0 = sin análisis programado)
+            fetch: Función asíncrona que obtiene una lectura de una URL
+            detector: Detector de cambios que decide qué lecturas se analizan
+                (sustituye al análisis a intervalo fijo)
+        """
+        self.writer = writer
+        self.job_queue = job_queue
+        self.sources = sources if sources is not None else parse_sources(os.getenv("INGEST_SOURCES"))
+        self.analysis_interval = analysis_interval if analysis_interval is not None else ANALYSIS_SCHEDULE_SECONDS
+        self.fetch = fetch or get_sensor_data_async
+        self.detector = detector
+        self.latest_id: Optional[int] = None
+        self.last_analyzed_id: Optional[int] = None
+        self.listeners: List[Callable[[int, Dict[str, Any]], Any]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def add_listener(self, listener: Callable[[int, Dict[str, Any]], Any]) -> None:
+        """
+        Registrar una función que recibe cada lectura guardada.
+
+        Args:
+            listener: Función (o corrutina) llamada con el ID y los datos de la lectura
+        """
+        self.listeners.append(listener)
+
+    async def start(self) -> None:
+        """Arrancar una tarea por fuente y la del análisis programado."""
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._poll_loop(source), name=f"ingest-{n}")
+            for n, source in enumerate(self.sources)
+            if source.interval > 0
+        ]
+        if self.analysis_interval > 0 and self.detector is None:
+            self._tasks.append(asyncio.create_task(self._analysis_loop(), name="scheduled-analysis"))
+        analysis = "por cambios" if self.detector is not None else f"cada {self.analysis_interval:.0f} s"
+        logger.info(
+            f"Ingesta programada iniciada: {[(s.url, s.interval) for s in self.sources]}, análisis {analysis}"
+        )
+
+    async def stop(self) -> None:
+        """Detener la ingesta y el análisis programado."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if tasks:
+            logger.info("Ingesta programada detenida")
+
+    async def poll(self, source: SensorSource) -> int:
+        """
+        Obtener y guardar una lectura de una fuente.
+
+        Args:
+            source: Fuente a consultar
+
+        Returns:
+            ID de la lectura guardada
+        """
+        source.polls += 1
+        data = await self.fetch(source.url, timeout=INGEST_FETCH_TIMEOUT)
+        data_id = await run_in_threadpool(self.writer.save, data)
+        source.readings += 1
+        source.last_id = data_id
+        source.last_success = time.time()
+        source.last_error = None
+        source.consecutive_failures = 0
+        if self.latest_id is None or data_id > self.latest_id:
+            self.latest_id = data_id
+        if self.detector is not None:
+            reason = self.detector.observe(data, source=source.url, data_id=data_id)
+            if reason:
+                try:
+                    job_id = await self.job_queue.enqueue(data_id)
+                    self.last_analyzed_id = data_id
+                    logger.info("Análisis de la lectura %s encolado (trabajo %s): %s", data_id, job_id, reason)
+                except Exception as e:
+                    logger.error("Error al encolar el análisis de la lectura %s: %s", data_id, e)
+        for listener in self.listeners:
+            try:
+                result = listener(data_id, data)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error("Error al notificar la lectura %s: %s", data_id, e)
+        return data_id
+
+    async def analyze_latest(self) -> Optional[int]:
+        """
+        Encolar el análisis de la lectura más reciente si no se ha analizado ya.
+
+        Returns:
+            ID del trabajo encolado, o None si no hay lecturas nuevas
+        """
+        data_id = self.latest_id
+        if data_id is None or data_id == self.last_analyzed_id:
+            return None
+        job_id = await self.job_queue.enqueue(data_id)
+        self.last_analyzed_id = data_id
+        logger.info("Análisis programado de la lectura %s encolado (trabajo %s)", data_id, job_id)
+        return job_id
+
+    def status(self) -> Dict[str, Any]:
+        """Estado de la ingesta programada."""
+        return {
+            "running": bool(self._tasks),
+            "analysis_interval": self.analysis_interval,
+            "latest_id": self.latest_id,
+            "last_analyzed_id": self.last_analyzed_id,
+            "pending_writes": self.writer.pending(),
+            "sources": [source.status() for source in self.sources],
+        }
+
+    async def _poll_loop(self, source: SensorSource) -> None:
+        """Consultar una fuente a intervalo fijo; tras un fallo, esperar con backoff exponencial."""
+        next_run = time.monotonic()
+        while True:
+            try:
+                await self.poll(source)
+                delay = source.interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                source.failures += 1
+                source.consecutive_failures += 1
+                source.last_error = str(e)
+                delay = min(source.interval * 2 ** source.consecutive_failures, max(INGEST_MAX_BACKOFF, source.interval))
+                logger.warning("Fallo al consultar %s (%s seguidos), reintento en %.0f s", source.url, source.consecutive_failures, delay)
+            # Intervalo fijo entre inicios de consulta, sin acumular el tiempo de cada petición
+            next_run = max(next_run + delay, time.monotonic())
+            await asyncio.sleep(next_run - time.monotonic())
+
+    async def _analysis_loop(self) -> None:
+        """Encolar el análisis de la última lectura cada analysis_interval segundos."""
+        while True:
+            await asyncio.sleep(self.analysis_interval)
+            try:
+                await self.analyze_latest()
+            except Exception as e:
+                logger.error("Error al encolar el análisis programado: %s", e)
@@ -0,0 +1,237 @@
+"""
+Configuración de logging: líneas JSON, muestreo y escritura en segundo plano.
+
+Los módulos siguen usando `logging.getLogger(__name__)` con argumentos
+perezosos (`logger.info("... %s", valor)`). Aquí se configura el logger
+raíz para que:
+
+- Cada registro pase por SamplingFilter, que descarta una fracción de
+  los mensajes DEBUG/INFO de los loggers indicados (muestreo) y limita
+  los registros por segundo de cada logger (token bucket). El siguiente
+  registro que pasa lleva el número de registros suprimidos.
+- Los registros que pasan se encolan sin bloquear (QueueHandler) y un
+  hilo propio (QueueListener) los formatea y los escribe en stderr y, si
+  se indica, en un fichero rotado; los hilos de las peticiones nunca
+  esperan al disco. Con la cola llena el registro se descarta.
+
+El mensaje se formatea en el hilo del listener, así que los argumentos
+no deben modificarse después de llamar al logger. Los descartes se
+cuentan en la métrica log_records_dropped_total de GET /metrics.
+"""
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional
+
+from app.utils.metrics import Counter, registry
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Atributos propios de LogRecord; el resto (extra=...) se añade al JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+dropped_records = registry.register(Counter(
+    "log_records_dropped_total",
+    "Registros de log descartados por muestreo, límite de frecuencia o cola llena",
+    ("logger", "reason"),
+))
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+
+
+def parse_mapping(spec: Optional[str]) -> Dict[str, str]:
+    """
+    Leer una asignación de valores por logger.
+
+    Args:
+        spec: Texto con el formato "logger=valor,logger=valor"
+
+    Returns:
+        Valor por nombre de logger
+    """
+    mapping = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, value = item.rsplit("=", 1)
+            mapping[name.strip()] = value.strip()
+    return mapping
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatear cada registro como una línea JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _LoggerState:
+    """Muestreo y token bucket de un logger."""
+
+    __slots__ = ("sample", "tokens", "updated", "suppressed")
+
+    def __init__(self, sample: float, burst: float, now: float):
+        self.sample = sample
+        self.tokens = burst
+        self.updated = now
+        self.suppressed = 0
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Muestreo y límite de frecuencia por logger.
+
+    Los avisos y errores no se muestrean, pero sí cuentan para el límite
+    de frecuencia, para que un fallo repetido en bucle no sature el disco.
+    """
+
+    def __init__(self, rate_limit: float = 0, burst: float = 0, sample_rates: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            rate_limit: Registros por segundo de cada logger; 0 sin límite
+            burst: Registros seguidos permitidos antes de aplicar el límite
+            sample_rates: Fracción de registros DEBUG/INFO que se conservan, por
+                logger (se aplica también a sus hijos, p. ej. "app.db")
+        """
+        super().__init__()
+        self.rate_limit = rate_limit
+        self.burst = max(burst, 1.0)
+        self.sample_rates = sample_rates or {}
+        self._loggers: Dict[str, _LoggerState] = {}
+        self._lock = threading.Lock()
+
+    def _sample_rate(self, name: str) -> float:
+        """Fracción a conservar del logger o de su antecesor más cercano."""
+        while name:
+            if name in self.sample_rates:
+                return self.sample_rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        with self._lock:
+            state = self._loggers.get(record.name)
+            if state is None:
+                state = self._loggers[record.name] = _LoggerState(
+                    self._sample_rate(record.name), self.burst, record.created
+                )
+            if record.levelno < logging.WARNING and state.sample < 1.0 and random.random() >= state.sample:
+                dropped_records.inc(record.name, "sample")
+                return False
+            if self.rate_limit > 0:
+                state.tokens = min(self.burst, state.tokens + (record.created - state.updated) * self.rate_limit)
+                state.updated = record.created
+                if state.tokens < 1.0:
+                    state.suppressed += 1
+                    dropped_records.inc(record.name, "rate_limit")
+                    return False
+                state.tokens -= 1.0
+            if state.suppressed:
+                record.suprimidos = state.suppressed
+                state.suppressed = 0
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Encolar registros sin formatearlos ni esperar si la cola está llena."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # La cola es del mismo proceso: el listener formatea el registro
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc(record.name, "queue_full")
+
+
+def configure_logging(
+    level: str = "INFO",
+    fmt: str = "json",
+    log_file: Optional[str] = None,
+    file_max_bytes: int = 10 * 1024 * 1024,
+    file_backups: int = 3,
+    queue_size: int = 10000,
+    rate_limit: float = 0,
+    burst: float = 0,
+    sample_rates: Optional[Dict[str, float]] = None,
+    levels: Optional[Dict[str, str]] = None,
+) -> QueueListener:
+    """
+    Configurar el logger raíz con escritura en segundo plano.
+
+    Se puede llamar más de una vez: la configuración anterior se sustituye.
+
+    Args:
+        level: Nivel del logger raíz
+        fmt: "json" (una línea JSON por registro) o "text"
+        log_file: Fichero adicional donde escribir, rotado por tamaño
+        file_max_bytes: Tamaño máximo del fichero antes de rotarlo
+        file_backups: Ficheros rotados que se conservan
+        queue_size: Registros máximos pendientes de escribir
+        rate_limit: Registros por segundo de cada logger; 0 sin límite
+        burst: Registros seguidos permitidos antes de aplicar el límite
+        sample_rates: Fracción de registros DEBUG/INFO que se conservan, por logger
+        levels: Nivel de loggers concretos, p. ej. {"app.db.manager": "WARNING"}
+
+    Returns:
+        Listener que escribe los registros
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    formatter = JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        handlers.append(RotatingFileHandler(log_file, maxBytes=file_max_bytes, backupCount=file_backups, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    _queue_handler.addFilter(SamplingFilter(rate_limit, burst, sample_rates))
+    _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level.upper())
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level.upper())
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """Escribir los registros pendientes y detener el listener."""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+# Escribir lo pendiente al salir del proceso
+atexit.register(shutdown_logging)
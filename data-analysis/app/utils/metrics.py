@@ -0,0 +1,355 @@
+"""
+Métricas de la API en formato de texto de Prometheus.
+
+Contadores, histogramas y medidores propios, sin dependencias externas,
+pensados para que registrar una observación cueste un par de
+microsegundos: cada serie (combinación de etiquetas) se crea la primera
+vez que se usa y después sólo se busca en un diccionario y se actualiza
+bajo un lock. El texto de GET /metrics se genera al consultarlo.
+
+Las etapas del análisis (lectura de sensores, escritura y lectura de la
+BD, construcción del prompt y llamada a Ollama) se miden con el
+decorador `timed`, que además cuenta los errores de cada etapa. Los
+tiempos de prefill y generación se toman de los campos que devuelve
+Ollama. Con METRICS_ENABLED=0 no se registra nada.
+"""
+import os
+import time
+import bisect
+import inspect
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Configuración (se puede sobrescribir mediante variables de entorno)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+# Límites de los buckets en segundos: de operaciones de BD (ms) a generaciones (minutos)
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    """Escapar el valor de una etiqueta."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Formatear las etiquetas de una serie como {a="x",b="y"}."""
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    """Formatear un valor numérico (enteros sin decimales)."""
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """Base de las métricas: nombre, ayuda, etiquetas y series."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Texto de la métrica en formato de Prometheus."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def clear(self) -> None:
+        """Borrar todas las series."""
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(_Metric):
+    """Contador monótono."""
+
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """
+        Incrementar el contador.
+
+        Args:
+            *labels: Valores de las etiquetas, en el orden de labelnames
+            amount: Cantidad a sumar
+        """
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        """Valor actual de una serie."""
+        return self._series.get(labels, 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = list(self._series.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in series]
+
+
+class Gauge(_Metric):
+    """Medidor que sube y baja (p. ej. generaciones en curso)."""
+
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """Sumar al medidor."""
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        """Restar al medidor."""
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        """Fijar el valor del medidor."""
+        with self._lock:
+            self._series[labels] = value
+
+    def value(self, *labels: str) -> float:
+        """Valor actual de una serie."""
+        return self._series.get(labels, 0.0)
+
+    @contextmanager
+    def track(self, *labels: str) -> Iterator[None]:
+        """Sumar uno mientras dura el bloque."""
+        if not METRICS_ENABLED:
+            yield
+            return
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = list(self._series.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in series]
+
+
+class Histogram(_Metric):
+    """Histograma con buckets acumulativos, suma y número de observaciones."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        """
+        Registrar una observación.
+
+        Args:
+            value: Valor observado (segundos, en los histogramas de duración)
+            *labels: Valores de las etiquetas, en el orden de labelnames
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Conteo por bucket (el último es +Inf), suma y total
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        """Número de observaciones de una serie."""
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def total(self, *labels: str) -> float:
+        """Suma de las observaciones de una serie."""
+        series = self._series.get(labels)
+        return series[1] if series else 0.0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = [(labels, list(counts), total, n) for labels, (counts, total, n) in self._series.items()]
+        lines = []
+        for labels, counts, total, n in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {n}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas que se exponen juntas."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Añadir una métrica al registro y devolverla."""
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Texto de todas las métricas en formato de Prometheus."""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+    def clear(self) -> None:
+        """Borrar las series de todas las métricas."""
+        for metric in self._metrics:
+            metric.clear()
+
+
+# Registro y métricas compartidas por todo el proceso
+registry = Registry()
+
+stage_duration = registry.register(Histogram(
+    "pipeline_stage_duration_seconds",
+    "Duración de cada etapa del análisis (sensor_fetch, db_write, db_read, prompt_build, ollama)",
+    ("stage", "operation"),
+))
+stage_errors = registry.register(Counter(
+    "pipeline_stage_errors_total",
+    "Errores por etapa del análisis",
+    ("stage", "operation"),
+))
+ollama_prefill = registry.register(Histogram(
+    "ollama_prefill_duration_seconds",
+    "Tiempo de procesado del prompt según Ollama (prompt_eval_duration)",
+    ("model",),
+))
+ollama_eval = registry.register(Histogram(
+    "ollama_eval_duration_seconds",
+    "Tiempo de generación de tokens según Ollama (eval_duration)",
+    ("model",),
+))
+ollama_load = registry.register(Histogram(
+    "ollama_load_duration_seconds",
+    "Tiempo de carga del modelo según Ollama (load_duration)",
+    ("model",),
+))
+ollama_prompt_tokens = registry.register(Counter(
+    "ollama_prompt_tokens_total",
+    "Tokens de prompt evaluados por Ollama",
+    ("model",),
+))
+ollama_generated_tokens = registry.register(Counter(
+    "ollama_generated_tokens_total",
+    "Tokens generados por Ollama",
+    ("model",),
+))
+generations_in_flight = registry.register(Gauge(
+    "ollama_generations_in_flight",
+    "Generaciones de Ollama en curso",
+    ("model",),
+))
+
+
+def record_generation(model: str, result: Dict[str, Any]) -> None:
+    """
+    Registrar los tiempos y tokens de una generación terminada de Ollama.
+
+    Args:
+        model: Modelo que generó la respuesta
+        result: Respuesta final de Ollama (duraciones en nanosegundos)
+    """
+    if not METRICS_ENABLED:
+        return
+    for histogram, field in ((ollama_prefill, "prompt_eval_duration"), (ollama_eval, "eval_duration"),
+                             (ollama_load, "load_duration")):
+        if result.get(field) is not None:
+            histogram.observe(result[field] / 1e9, model)
+    if result.get("prompt_eval_count"):
+        ollama_prompt_tokens.inc(model, amount=result["prompt_eval_count"])
+    if result.get("eval_count"):
+        ollama_generated_tokens.inc(model, amount=result["eval_count"])
+
+
+@contextmanager
+def stage(name: str, operation: str = "") -> Iterator[None]:
+    """
+    Medir un bloque como una etapa del análisis.
+
+    Args:
+        name: Etapa (sensor_fetch, db_write, db_read, prompt_build, ollama)
+        operation: Operación concreta dentro de la etapa
+    """
+    if not METRICS_ENABLED:
+        yield
+        return
+    began = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(name, operation)
+        raise
+    finally:
+        stage_duration.observe(time.perf_counter() - began, name, operation)
+
+
+def timed(name: str, operation: Optional[str] = None) -> Callable:
+    """
+    Decorador que mide una función (síncrona o asíncrona) como una etapa.
+
+    Args:
+        name: Etapa del análisis
+        operation: Operación (por defecto, el nombre de la función)
+    """
+    def decorator(func: Callable) -> Callable:
+        label = operation or func.__name__
+        if not METRICS_ENABLED:
+            return func
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                began = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    stage_errors.inc(name, label)
+                    raise
+                finally:
+                    stage_duration.observe(time.perf_counter() - began, name, label)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            began = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                stage_errors.inc(name, label)
+                raise
+            finally:
+                stage_duration.observe(time.perf_counter() - began, name, label)
+        return wrapper
+
+    return decorator
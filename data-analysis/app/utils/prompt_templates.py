@@ -0,0 +1,185 @@
+"""
+Plantillas de prompts compiladas.
+
+Las plantillas son ficheros de texto en PROMPT_TEMPLATE_DIR (por defecto,
+app/prompts) con marcadores {{nombre}}. Se leen y se compilan una sola vez
+(en una lista de fragmentos fijos y marcadores), de modo que renderizar un
+prompt es un único "".join sin volver a procesar el texto.
+
+Cada plantilla se identifica por tipo e idioma ("analisis_es",
+"analisis_lote_es", "analisis_en"...). El idioma por defecto es
+PROMPT_LANGUAGE y PROMPT_TEMPLATE_OVERRIDES permite asignar otro idioma o
+plantilla a un modelo concreto, con el formato "llama3.2:3b=en,gemma3:4b=es".
+
+Todo el texto fijo va delante de los datos, así que el prefijo del prompt
+es idéntico entre llamadas con la misma plantilla.
+"""
+import os
+import re
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuración (se puede sobrescribir mediante variables de entorno)
+PROMPT_TEMPLATE_DIR = os.getenv(
+    "PROMPT_TEMPLATE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts")
+)
+PROMPT_LANGUAGE = os.getenv("PROMPT_LANGUAGE", "es")
+
+_PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+def parse_overrides(spec: Optional[str]) -> Dict[str, str]:
+    """
+    Leer la asignación de idioma o plantilla por modelo.
+
+    Args:
+        spec: Texto con el formato "modelo=idioma,modelo=plantilla"
+
+    Returns:
+        Idioma o nombre de plantilla por modelo
+    """
+    overrides = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            model, value = item.rsplit("=", 1)
+            overrides[model.strip()] = value.strip()
+    return overrides
+
+
+PROMPT_TEMPLATE_OVERRIDES = parse_overrides(os.getenv("PROMPT_TEMPLATE_OVERRIDES"))
+
+
+class PromptTemplate:
+    """Plantilla compilada en fragmentos fijos y marcadores."""
+
+    def __init__(self, name: str, text: str):
+        """
+        Compilar una plantilla.
+
+        Args:
+            name: Nombre de la plantilla (p. ej. "analisis_es")
+            text: Texto con marcadores {{nombre}}
+        """
+        self.name = name
+        self._parts: List[str] = []
+        self._slots: List[Tuple[int, str]] = []
+        position = 0
+        for match in _PLACEHOLDER_RE.finditer(text):
+            self._parts.append(text[position:match.start()])
+            self._slots.append((len(self._parts), match.group(1)))
+            self._parts.append("")
+            position = match.end()
+        self._parts.append(text[position:])
+        self.fields = {field for _, field in self._slots}
+
+    @property
+    def prefix(self) -> str:
+        """Texto fijo anterior al primer marcador."""
+        return self._parts[0]
+
+    def render(self, **values: str) -> str:
+        """
+        Renderizar la plantilla.
+
+        Args:
+            **values: Valor de cada marcador
+
+        Returns:
+            Texto del prompt
+        """
+        parts = list(self._parts)
+        try:
+            for index, field in self._slots:
+                parts[index] = values[field]
+        except KeyError as e:
+            raise ValueError(f"Falta el valor del marcador {e} en la plantilla {self.name}")
+        return "".join(parts)
+
+
+_templates: Optional[Dict[str, PromptTemplate]] = None
+_templates_lock = threading.Lock()
+
+
+def load_templates(directory: Optional[str] = None) -> Dict[str, PromptTemplate]:
+    """
+    Leer y compilar todas las plantillas del directorio (una sola vez por proceso).
+
+    Args:
+        directory: Directorio de plantillas (por defecto, PROMPT_TEMPLATE_DIR)
+
+    Returns:
+        Plantillas compiladas por nombre
+    """
+    global _templates
+    with _templates_lock:
+        if _templates is None or directory is not None:
+            directory = directory or PROMPT_TEMPLATE_DIR
+            templates = {}
+            for filename in sorted(os.listdir(directory)):
+                name, extension = os.path.splitext(filename)
+                if extension != ".txt":
+                    continue
+                with open(os.path.join(directory, filename), encoding="utf-8") as f:
+                    templates[name] = PromptTemplate(name, f.read())
+            if not templates:
+                raise Exception(f"No se encontraron plantillas de prompts en {directory}")
+            logger.info("Plantillas de prompts cargadas: %s", sorted(templates))
+            _templates = templates
+        return _templates
+
+
+def get_template(kind: str, model: Optional[str] = None, language: Optional[str] = None) -> PromptTemplate:
+    """
+    Elegir la plantilla de un tipo para un modelo e idioma.
+
+    Orden: la asignada al modelo en PROMPT_TEMPLATE_OVERRIDES (un idioma o un
+    nombre de plantilla), la del idioma pedido, la de PROMPT_LANGUAGE y la
+    de español.
+
+    Args:
+        kind: Tipo de plantilla ("analisis" o "analisis_lote")
+        model: Modelo que recibirá el prompt
+        language: Idioma pedido
+
+    Returns:
+        Plantilla compilada
+    """
+    templates = load_templates()
+    candidates = []
+    override = PROMPT_TEMPLATE_OVERRIDES.get(model) if model else None
+    if override:
+        candidates += [override, f"{kind}_{override}"]
+    if language:
+        candidates.append(f"{kind}_{language}")
+    candidates += [f"{kind}_{PROMPT_LANGUAGE}", f"{kind}_es"]
+    for name in candidates:
+        template = templates.get(name)
+        if template is not None and template.name.startswith(kind + "_"):
+            return template
+    raise ValueError(f"No existe ninguna plantilla de prompt de tipo '{kind}'")
+
+
+def split_prompt(text: str) -> Tuple[str, str]:
+    """
+    Separar un prompt en el texto fijo de su plantilla y la parte variable.
+
+    Se busca la plantilla cargada cuyo prefijo (el texto anterior al primer
+    marcador) coincide con el inicio del prompt; ese prefijo se puede enviar
+    como mensaje de sistema para que Ollama reutilice su estado ya procesado.
+
+    Args:
+        text: Prompt renderizado
+
+    Returns:
+        Prefijo fijo ("" si el prompt no viene de ninguna plantilla) y resto del prompt
+    """
+    best = ""
+    for template in load_templates().values():
+        prefix = template.prefix
+        if len(prefix) > len(best) and text.startswith(prefix):
+            best = prefix
+    return best, text[len(best):]
@@ -0,0 +1,343 @@
+"""
+Estadísticas y anomalías sobre el historial de lecturas, vectorizadas con NumPy.
+
+Una ventana de tiempo se lee de sensor_data en una sola consulta por
+columnas (DBManager.get_sensor_columns) y cada campo pasa a ser un array
+float64 con NaN donde la lectura no traía el valor. Sobre esos arrays se
+calculan, sin bucles en Python:
+
+- medias y desviaciones móviles (ventana en número de lecturas),
+- anomalías por z-score respecto a las lecturas anteriores,
+- variables derivadas: punto de rocío, déficit de presión de vapor (VPD)
+  y altitud estimada a partir de la presión,
+- agregados diarios (mínimo, máximo, media y conteo por día local),
+- un resumen compacto de la ventana (con la tendencia por hora) que se
+  puede incluir en un prompt en lugar de una lectura suelta.
+"""
+import os
+import time
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.db.manager import DBManager
+
+logger = logging.getLogger(__name__)
+
+# Configuración (se puede sobrescribir mediante variables de entorno)
+ANALYTICS_MAX_ROWS = int(os.getenv("ANALYTICS_MAX_ROWS", "200000"))
+
+# Campos analizados si la petición no indica ninguno
+DEFAULT_FIELDS = ("temperatura_a", "presion_hPa", "humedad_pct", "co2_ppm", "lux", "indice_uv")
+
+# Campos necesarios para las variables derivadas
+DERIVED_FIELDS = ("temperatura_a", "humedad_pct", "RH2M", "presion_hPa")
+
+# Presión estándar a nivel del mar (hPa)
+SEA_LEVEL_HPA = 1013.25
+
+
+class SensorWindow(NamedTuple):
+    """Ventana de lecturas en columnas: instantes y un array por campo."""
+    epoch: np.ndarray
+    values: Dict[str, np.ndarray]
+
+
+def load_window(
+    db: DBManager,
+    fields: Sequence[str],
+    start: int,
+    end: int,
+    max_rows: Optional[int] = None
+) -> SensorWindow:
+    """
+    Leer una ventana de lecturas como arrays.
+
+    Args:
+        db: Gestor de base de datos
+        fields: Campos tipados a leer
+        start: Marca de tiempo epoch inicial inclusiva
+        end: Marca de tiempo epoch final inclusiva
+        max_rows: Máximo de lecturas (las más recientes; por defecto, ANALYTICS_MAX_ROWS)
+
+    Returns:
+        Ventana con los instantes (int64) y un array float64 por campo
+    """
+    columns = db.get_sensor_columns(list(fields), start, end, max_rows or ANALYTICS_MAX_ROWS)
+    epoch = np.array(columns["epoch"], dtype=np.int64)
+    # None -> NaN al convertir a float64
+    values = {field: np.array(columns[field], dtype=np.float64) for field in fields}
+    return SensorWindow(epoch, values)
+
+
+def rolling_stats(values: np.ndarray, window: int, min_count: int = 2) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Media y desviación típica móviles de las últimas `window` lecturas.
+
+    Se calculan con sumas acumuladas (O(n)) ignorando los NaN; las
+    posiciones con menos de `min_count` valores válidos quedan a NaN.
+
+    Args:
+        values: Serie de valores (puede contener NaN)
+        window: Número de lecturas de la ventana (incluida la actual)
+        min_count: Valores válidos mínimos para dar un resultado
+
+    Returns:
+        Arrays de media y desviación típica (muestral) de la misma longitud que la serie
+    """
+    window = max(1, window)
+    valid = ~np.isnan(values)
+    # Centrar antes de acumular evita perder precisión en la varianza (p. ej. presiones ~900 hPa)
+    offset = np.nanmean(values) if valid.any() else 0.0
+    centered = np.where(valid, values - offset, 0.0)
+
+    def windowed(series: np.ndarray) -> np.ndarray:
+        cumulative = np.concatenate(([0.0], np.cumsum(series)))
+        upper = np.arange(1, len(series) + 1)
+        return cumulative[upper] - cumulative[np.maximum(upper - window, 0)]
+
+    count = windowed(valid.astype(np.float64))
+    total = windowed(centered)
+    squares = windowed(centered * centered)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        variance = (squares - count * mean * mean) / (count - 1)
+    enough = count >= max(min_count, 1)
+    mean = np.where(enough, mean + offset, np.nan)
+    std = np.where(enough & (count > 1), np.sqrt(np.maximum(variance, 0.0)), np.nan)
+    return mean, std
+
+
+def zscores(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Z-score de cada lectura respecto a las `window` lecturas anteriores.
+
+    Args:
+        values: Serie de valores
+        window: Número de lecturas anteriores con las que se compara
+
+    Returns:
+        Z-scores (NaN si no hay historial suficiente o la desviación es nula)
+    """
+    mean, std = rolling_stats(values, window)
+    # Estadísticos de las lecturas anteriores (sin incluir la actual)
+    previous_mean = np.concatenate(([np.nan], mean[:-1]))
+    previous_std = np.concatenate(([np.nan], std[:-1]))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (values - previous_mean) / previous_std
+    return np.where(np.isfinite(z), z, np.nan)
+
+
+def find_anomalies(
+    window: SensorWindow,
+    rolling: int,
+    threshold: float
+) -> List[Dict[str, Any]]:
+    """
+    Buscar lecturas cuyo |z-score| supera el umbral.
+
+    Args:
+        window: Ventana de lecturas
+        rolling: Número de lecturas anteriores usadas como referencia
+        threshold: Umbral de |z|
+
+    Returns:
+        Anomalías ordenadas por tiempo: {"t", "campo", "valor", "z"}
+    """
+    anomalies = []
+    for field, values in window.values.items():
+        z = zscores(values, rolling)
+        indexes = np.flatnonzero(np.abs(np.nan_to_num(z)) > threshold)
+        anomalies.extend(
+            {"t": int(window.epoch[i]), "campo": field, "valor": round(float(values[i]), 3), "z": round(float(z[i]), 2)}
+            for i in indexes
+        )
+    anomalies.sort(key=lambda anomaly: anomaly["t"])
+    return anomalies
+
+
+def dew_point(temperature: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+    """
+    Punto de rocío (°C) con la fórmula de Magnus.
+
+    Args:
+        temperature: Temperatura del aire (°C)
+        humidity: Humedad relativa (%)
+
+    Returns:
+        Punto de rocío (°C)
+    """
+    a, b = 17.62, 243.12
+    with np.errstate(invalid="ignore", divide="ignore"):
+        gamma = np.log(np.clip(humidity, 1e-3, 100.0) / 100.0) + a * temperature / (b + temperature)
+        return b * gamma / (a - gamma)
+
+
+def vapor_pressure_deficit(temperature: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+    """
+    Déficit de presión de vapor (kPa) con la ecuación de Tetens.
+
+    Args:
+        temperature: Temperatura del aire (°C)
+        humidity: Humedad relativa (%)
+
+    Returns:
+        VPD (kPa)
+    """
+    saturation = 0.6108 * np.exp(17.27 * temperature / (temperature + 237.3))
+    return saturation * (1.0 - np.clip(humidity, 0.0, 100.0) / 100.0)
+
+
+def altitude_from_pressure(pressure: np.ndarray, sea_level: float = SEA_LEVEL_HPA) -> np.ndarray:
+    """
+    Altitud aproximada (m) a partir de la presión con la fórmula barométrica.
+
+    Args:
+        pressure: Presión atmosférica (hPa)
+        sea_level: Presión de referencia a nivel del mar (hPa)
+
+    Returns:
+        Altitud (m)
+    """
+    with np.errstate(invalid="ignore"):
+        return 44330.0 * (1.0 - np.power(pressure / sea_level, 1.0 / 5.255))
+
+
+def derived_series(window: SensorWindow) -> Dict[str, np.ndarray]:
+    """
+    Calcular las variables derivadas de una ventana.
+
+    La humedad local (humedad_pct) se completa con la satelital (RH2M)
+    donde falta.
+
+    Args:
+        window: Ventana con los campos de DERIVED_FIELDS
+
+    Returns:
+        Arrays de punto_rocio, vpd_kPa y altitud_m
+    """
+    temperature = window.values["temperatura_a"]
+    humidity = np.where(np.isnan(window.values["humedad_pct"]), window.values["RH2M"], window.values["humedad_pct"])
+    return {
+        "punto_rocio": dew_point(temperature, humidity),
+        "vpd_kPa": vapor_pressure_deficit(temperature, humidity),
+        "altitud_m": altitude_from_pressure(window.values["presion_hPa"]),
+    }
+
+
+def daily_aggregates(window: SensorWindow, utc_offset: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Mínimo, máximo, media y conteo por día local de cada campo.
+
+    Args:
+        window: Ventana de lecturas (ordenada por tiempo)
+        utc_offset: Desfase de la hora local en segundos (por defecto, el del sistema)
+
+    Returns:
+        Un elemento por día con la fecha y los agregados de cada campo
+    """
+    if len(window.epoch) == 0:
+        return []
+    if utc_offset is None:
+        utc_offset = -time.altzone if time.localtime().tm_isdst > 0 else -time.timezone
+    days = (window.epoch + utc_offset) // 86400
+    # La ventana está ordenada, así que cada día es un tramo contiguo
+    starts = np.flatnonzero(np.concatenate(([True], days[1:] != days[:-1])))
+    day_index = np.cumsum(np.concatenate(([False], days[1:] != days[:-1])))
+    result = [
+        {"fecha": time.strftime("%Y-%m-%d", time.gmtime(int(day) * 86400)), "campos": {}}
+        for day in days[starts]
+    ]
+    for field, values in window.values.items():
+        valid = ~np.isnan(values)
+        count = np.bincount(day_index, weights=valid, minlength=len(starts))
+        total = np.bincount(day_index, weights=np.where(valid, values, 0.0), minlength=len(starts))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+        minimum = np.fmin.reduceat(values, starts)
+        maximum = np.fmax.reduceat(values, starts)
+        for n, day in enumerate(result):
+            day["campos"][field] = {
+                "min": _number(minimum[n]),
+                "max": _number(maximum[n]),
+                "avg": _number(mean[n]),
+                "count": int(count[n]),
+            }
+    return result
+
+
+def summarize_window(window: SensorWindow) -> Dict[str, Dict[str, Any]]:
+    """
+    Resumen compacto de cada campo de una ventana.
+
+    Incluye la tendencia (pendiente de la recta de mínimos cuadrados, en
+    unidades por hora), de modo que el resumen describe la evolución de la
+    ventana y no sólo la última lectura.
+
+    Args:
+        window: Ventana de lecturas
+
+    Returns:
+        Por campo: count, min, max, media, desv, ultimo y tendencia_h
+    """
+    summary = {}
+    hours = (window.epoch - (window.epoch[0] if len(window.epoch) else 0)) / 3600.0
+    for field, values in window.values.items():
+        valid = ~np.isnan(values)
+        count = int(valid.sum())
+        if count == 0:
+            summary[field] = {"count": 0}
+            continue
+        x, y = hours[valid], values[valid]
+        spread = x - x.mean()
+        denominator = float(np.dot(spread, spread))
+        slope = float(np.dot(spread, y - y.mean()) / denominator) if denominator > 0 else None
+        summary[field] = {
+            "count": count,
+            "min": _number(y.min()),
+            "max": _number(y.max()),
+            "media": _number(y.mean()),
+            "desv": _number(y.std(ddof=1)) if count > 1 else None,
+            "ultimo": _number(y[-1]),
+            "tendencia_h": _number(slope, 4),
+        }
+    return summary
+
+
+def decimate(length: int, points: int) -> np.ndarray:
+    """
+    Índices equiespaciados para devolver como mucho `points` elementos.
+
+    Args:
+        length: Longitud de la serie
+        points: Número máximo de elementos
+
+    Returns:
+        Índices a conservar (siempre incluye el último)
+    """
+    if length <= points:
+        return np.arange(length)
+    return np.unique(np.linspace(0, length - 1, points).round().astype(np.int64))
+
+
+def to_json_list(values: np.ndarray, decimals: int = 3) -> List[Optional[float]]:
+    """
+    Convertir un array a lista JSON (NaN e infinitos pasan a None).
+
+    Args:
+        values: Array de valores
+        decimals: Decimales a conservar
+
+    Returns:
+        Lista de floats o None
+    """
+    rounded = np.round(values, decimals)
+    return np.where(np.isfinite(rounded), rounded, None).tolist()
+
+
+def _number(value: Optional[float], decimals: int = 3) -> Optional[float]:
+    """Redondear un escalar; NaN, infinito o None pasan a None."""
+    if value is None or not np.isfinite(value):
+        return None
+    return round(float(value), decimals)
@@ -0,0 +1,177 @@
+"""
+Decodificación y validación de las lecturas enviadas por los robots.
+
+POST /sensor-data acepta una lectura o una lista de lecturas en JSON,
+MessagePack (application/msgpack) o CBOR (application/cbor), con el cuerpo
+opcionalmente comprimido (Content-Encoding: gzip o deflate). Las lecturas
+se validan contra SensorData con un validador compilado una sola vez al
+importar el módulo; el JSON se valida directamente desde los bytes, sin
+pasar antes por json.loads.
+
+MessagePack y CBOR son opcionales: sólo se aceptan si está instalada la
+librería correspondiente (msgpack o cbor2). Como pueden llevar valores que
+JSON no admite y las claves desconocidas se guardan como JSON en la columna
+extra, las fechas se convierten a texto ISO 8601 y el resto de valores no
+representables (binarios, etiquetas...) se rechazan con 422.
+"""
+import os
+import zlib
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.models.schemas import SensorData
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependencia opcional
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover - dependencia opcional
+    cbor2 = None
+
+logger = logging.getLogger(__name__)
+
+# Configuración (se puede sobrescribir mediante variables de entorno)
+INGEST_MAX_BODY_BYTES = int(os.getenv("INGEST_MAX_BODY_BYTES", str(16 * 1024 * 1024)))
+
+# Validadores compilados de una lectura y de una lista de lecturas
+_READING = TypeAdapter(SensorData)
+_READINGS = TypeAdapter(List[SensorData])
+
+
+class PayloadError(Exception):
+    """Cuerpo de la petición que no se puede decodificar o validar."""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(detail if isinstance(detail, str) else "Lecturas no válidas")
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _media_type(content_type: Optional[str]) -> str:
+    """Tipo de contenido sin parámetros (charset...)."""
+    return (content_type or "application/json").split(";", 1)[0].strip().lower()
+
+
+def decompress(body: bytes, content_encoding: Optional[str], max_bytes: Optional[int] = None) -> bytes:
+    """
+    Descomprimir el cuerpo de una petición.
+
+    Args:
+        body: Cuerpo recibido
+        content_encoding: Cabecera Content-Encoding ("gzip", "deflate" o vacía)
+        max_bytes: Tamaño máximo del cuerpo descomprimido
+
+    Returns:
+        Cuerpo descomprimido
+    """
+    encoding = (content_encoding or "identity").strip().lower()
+    limit = max_bytes or INGEST_MAX_BODY_BYTES
+    if encoding == "identity":
+        return body
+    if encoding in ("gzip", "x-gzip"):
+        wbits = 16 + zlib.MAX_WBITS
+    elif encoding == "deflate":
+        # zlib (RFC 1950); algunos clientes envían deflate sin cabecera
+        wbits = zlib.MAX_WBITS if body[:1] == b"\x78" else -zlib.MAX_WBITS
+    else:
+        raise PayloadError(415, f"Content-Encoding no soportado: {encoding}")
+    try:
+        decompressor = zlib.decompressobj(wbits)
+        data = decompressor.decompress(body, limit)
+        if decompressor.unconsumed_tail:
+            raise PayloadError(413, f"El cuerpo descomprimido supera {limit} bytes")
+        return data + decompressor.flush()
+    except zlib.error as e:
+        raise PayloadError(400, f"Cuerpo comprimido no válido: {str(e)}")
+
+
+def _to_json(value: Any, loc: Tuple[Any, ...], errors: List[Dict[str, Any]]) -> Any:
+    """
+    Adaptar un valor decodificado de MessagePack o CBOR a tipos JSON.
+
+    Args:
+        value: Valor decodificado
+        loc: Ruta del valor dentro del cuerpo (para el mensaje de error)
+        errors: Lista donde se añaden los valores no representables
+
+    Returns:
+        Valor con sólo tipos JSON (las fechas, como texto ISO 8601)
+    """
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item, loc + (index,), errors) for index, item in enumerate(value)]
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            if not isinstance(key, str):
+                errors.append({"type": "json_type", "loc": list(loc), "msg": f"Clave no admitida: {key!r}"})
+                continue
+            result[key] = _to_json(item, loc + (key,), errors)
+        return result
+    errors.append({"type": "json_type", "loc": list(loc), "msg": f"Tipo no admitido: {type(value).__name__}"})
+    return None
+
+
+def parse_readings(
+    body: bytes,
+    content_type: Optional[str] = None,
+    content_encoding: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Decodificar y validar las lecturas de una petición.
+
+    Args:
+        body: Cuerpo recibido
+        content_type: Cabecera Content-Type
+        content_encoding: Cabecera Content-Encoding
+
+    Returns:
+        Lecturas validadas (sólo con los campos recibidos)
+
+    Raises:
+        PayloadError: Si el cuerpo no se puede decodificar o no es válido
+    """
+    body = decompress(body, content_encoding)
+    media_type = _media_type(content_type)
+    try:
+        if media_type in ("application/json", "text/json"):
+            if body.lstrip()[:1] == b"[":
+                readings = _READINGS.validate_json(body)
+            else:
+                readings = [_READING.validate_json(body)]
+        else:
+            if media_type in ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack"):
+                if msgpack is None:
+                    raise PayloadError(415, "MessagePack no disponible: instale el paquete msgpack")
+                decoded = msgpack.unpackb(body, raw=False)
+            elif media_type == "application/cbor":
+                if cbor2 is None:
+                    raise PayloadError(415, "CBOR no disponible: instale el paquete cbor2")
+                decoded = cbor2.loads(body)
+            else:
+                raise PayloadError(415, f"Content-Type no soportado: {media_type}")
+            errors: List[Dict[str, Any]] = []
+            decoded = _to_json(decoded, (), errors)
+            if errors:
+                raise PayloadError(422, errors)
+            if isinstance(decoded, list):
+                readings = _READINGS.validate_python(decoded)
+            else:
+                readings = [_READING.validate_python(decoded)]
+    except ValidationError as e:
+        raise PayloadError(422, e.errors(include_url=False, include_context=False))
+    except PayloadError:
+        raise
+    except Exception as e:
+        raise PayloadError(400, f"Cuerpo no válido: {str(e)}")
+
+    return _READINGS.dump_python(readings, exclude_unset=True)
@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import patch
+import httpx
+from app.utils import http_client
+from app.utils.data_fetcher import get_sensor_data, get_sensor_data_async
+
+URL = "http://sensores-prueba:8080/datos"
+
+def mock_transport(status=200, payload=None, timeout=False):
+    """Crear un transporte httpx que simula la API de sensores."""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if timeout:
+            raise httpx.ReadTimeout("tiempo de espera agotado", request=request)
+        return httpx.Response(status, json=payload if payload is not None else {})
+
+    transport = httpx.MockTransport(handler)
+    transport.requests = requests
+    return transport
+
+class TestHttpClient(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncTearDown(self):
+        """Cierra el cliente compartido."""
+        await http_client.close_async_client()
+
+    async def test_shared_client_reused(self):
+        """El cliente asíncrono se comparte y se vuelve a crear tras cerrarlo."""
+        client = http_client.get_async_client()
+        self.assertIs(http_client.get_async_client(), client)
+        await http_client.close_async_client()
+        self.assertTrue(client.is_closed)
+        self.assertIsNot(http_client.get_async_client(), client)
+
+    async def fetch_async(self, transport):
+        """Obtener los datos con el cliente asíncrono sobre un transporte simulado."""
+        async with httpx.AsyncClient(transport=transport) as client:
+            with patch("app.utils.data_fetcher.get_async_client", return_value=client):
+                return await get_sensor_data_async(URL)
+
+    def fetch_sync(self, transport):
+        """Obtener los datos con el cliente síncrono sobre un transporte simulado."""
+        with httpx.Client(transport=transport) as client:
+            with patch("app.utils.data_fetcher.httpx.get", side_effect=client.get):
+                return get_sensor_data(URL)
+
+    async def test_sensor_data_success(self):
+        """Las dos versiones devuelven el JSON de la API de sensores."""
+        payload = {"sensor_bmp390": {"temperatura_a": 22.0}}
+        transport = mock_transport(payload=payload)
+        self.assertEqual(await self.fetch_async(transport), payload)
+        self.assertEqual(self.fetch_sync(transport), payload)
+        self.assertEqual([str(r.url) for r in transport.requests], [URL, URL])
+
+    async def test_sensor_data_timeout(self):
+        """Un timeout se traduce en el error de obtención de datos."""
+        with self.assertRaisesRegex(Exception, "Error al obtener datos de sensores"):
+            await self.fetch_async(mock_transport(timeout=True))
+        with self.assertRaisesRegex(Exception, "Error al obtener datos de sensores"):
+            self.fetch_sync(mock_transport(timeout=True))
+
+    async def test_sensor_data_http_error(self):
+        """Una respuesta que no es 2xx se traduce en el error de obtención de datos."""
+        with self.assertRaisesRegex(Exception, "503"):
+            await self.fetch_async(mock_transport(status=503))
+        with self.assertRaisesRegex(Exception, "503"):
+            self.fetch_sync(mock_transport(status=503))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import asyncio
+from app.db.manager import DBManager
+from app.db.writer import GroupCommitWriter
+from app.utils.ingest_scheduler import IngestScheduler, SensorSource, parse_sources
+
+class FakeJobQueue:
+    """Cola de análisis simulada que registra los trabajos encolados."""
+
+    def __init__(self):
+        self.enqueued = []
+
+    async def enqueue(self, data_id, model=None):
+        self.enqueued.append(data_id)
+        return len(self.enqueued)
+
+class TestIngestScheduler(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Configura una base de datos en memoria con su escritor por lotes."""
+        self.db_manager = DBManager(db_path=":memory:")
+        self.writer = GroupCommitWriter(self.db_manager, flush_ms=5)
+        self.jobs = FakeJobQueue()
+
+    def tearDown(self):
+        """Detiene el escritor y cierra la base de datos."""
+        self.writer.stop(timeout=5)
+        self.db_manager.close()
+
+    def test_parse_sources(self):
+        """Cada fuente lleva su intervalo; sin intervalo se usa el de por defecto."""
+        sources = parse_sources("http://a:8080/datos@5, http://b/datos", default_interval=30)
+        self.assertEqual([(s.url, s.interval) for s in sources], [("http://a:8080/datos", 5.0), ("http://b/datos", 30)])
+
+    async def test_sources_polled_concurrently_and_analysis_scheduled(self):
+        """Las fuentes se consultan en paralelo y el análisis programado usa la última lectura."""
+        calls = []
+
+        async def fetch(url, timeout=None):
+            calls.append(url)
+            if url == "http://caida":
+                raise Exception("sin conexión")
+            return {"sensor_bmp390": {"temperatura_a": 20.0 + len(calls)}}
+
+        sources = [SensorSource("http://a", 0.05), SensorSource("http://b", 0.05), SensorSource("http://caida", 0.05)]
+        scheduler = IngestScheduler(self.writer, self.jobs, sources=sources, analysis_interval=0, fetch=fetch)
+        await scheduler.start()
+        await asyncio.sleep(0.2)
+        await scheduler.stop()
+
+        self.assertGreaterEqual(sources[0].readings, 2)
+        self.assertGreaterEqual(sources[1].readings, 2)
+        self.assertEqual((sources[2].readings, sources[2].last_error), (0, "sin conexión"))
+        # Una consulta cancelada al detener puede haber llegado a guardarse
+        saved = len(self.db_manager.get_sensor_records(limit=100))
+        self.assertIn(saved - (sources[0].readings + sources[1].readings), (0, 1, 2))
+
+        self.assertEqual(await scheduler.analyze_latest(), 1)
+        self.assertIsNone(await scheduler.analyze_latest())
+        self.assertEqual(self.jobs.enqueued, [scheduler.latest_id])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import os
+import json
+import queue
+import logging
+import tempfile
+from app.utils.logging_config import (
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    SamplingFilter,
+    configure_logging,
+    dropped_records,
+    parse_mapping,
+    shutdown_logging,
+)
+
+def make_record(name="app.db.manager", level=logging.INFO, created=1000.0, msg="Guardado %s", args=(1,)):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.created = created
+    return record
+
+class TestLoggingConfig(unittest.TestCase):
+
+    def test_json_formatter(self):
+        """Cada registro es una línea JSON con el mensaje formateado y los campos extra."""
+        record = make_record()
+        record.data_id = 7
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual(entry["msg"], "Guardado 1")
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["logger"], "app.db.manager")
+        self.assertEqual(entry["data_id"], 7)
+
+    def test_rate_limit(self):
+        """Por encima del límite se descartan registros y el siguiente que pasa indica cuántos."""
+        limiter = SamplingFilter(rate_limit=1, burst=2)
+        passed = [limiter.filter(make_record(created=1000.0)) for _ in range(5)]
+        self.assertEqual(passed, [True, True, False, False, False])
+        # Otro logger tiene su propio límite
+        self.assertTrue(limiter.filter(make_record(name="app.api.routes", created=1000.0)))
+        record = make_record(created=1001.0)
+        self.assertTrue(limiter.filter(record))
+        self.assertEqual(record.suprimidos, 3)
+
+    def test_sampling_keeps_warnings(self):
+        """El muestreo se aplica a DEBUG/INFO del logger y sus hijos, nunca a avisos y errores."""
+        sampler = SamplingFilter(sample_rates={"app.db": 0.0})
+        self.assertFalse(sampler.filter(make_record()))
+        self.assertTrue(sampler.filter(make_record(level=logging.ERROR)))
+        self.assertTrue(sampler.filter(make_record(name="app.ai.job_queue")))
+        self.assertEqual(parse_mapping("app.db=0.1, app.ai.ollama_client=WARNING"),
+                         {"app.db": "0.1", "app.ai.ollama_client": "WARNING"})
+
+    def test_full_queue_drops(self):
+        """Con la cola llena el registro se descarta sin bloquear."""
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        before = dropped_records.value("app.test", "queue_full")
+        handler.handle(make_record(name="app.test"))
+        handler.handle(make_record(name="app.test"))
+        self.assertEqual(handler.queue.qsize(), 1)
+        self.assertEqual(dropped_records.value("app.test", "queue_full"), before + 1)
+
+    def test_configure_writes_file(self):
+        """Los registros se escriben en segundo plano y se vuelcan al detener el listener."""
+        root = logging.getLogger()
+        previous_handlers, previous_level = list(root.handlers), root.level
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "api.log")
+            configure_logging(level="INFO", log_file=path, levels={"app.silencioso": "ERROR"})
+            try:
+                logging.getLogger("app.prueba").info("Lectura %s guardada", 42, extra={"data_id": 42})
+                logging.getLogger("app.silencioso").info("No se escribe")
+            finally:
+                shutdown_logging()
+                root.handlers[:] = previous_handlers
+                root.setLevel(previous_level)
+            with open(path, encoding="utf-8") as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual([line["msg"] for line in lines], ["Lectura 42 guardada"])
+        self.assertEqual(lines[0]["data_id"], 42)
+
+if __name__ == "__main__":
+    unittest.main()
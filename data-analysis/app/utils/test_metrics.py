@@ -0,0 +1,69 @@
+import unittest
+import asyncio
+from app.utils.metrics import Counter, Histogram, Registry, record_generation, registry, stage, timed
+from app.utils import metrics
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        registry.clear()
+
+    def test_histogram_render(self):
+        """Los buckets son acumulativos y terminan en +Inf con el total de observaciones."""
+        test_registry = Registry()
+        histogram = test_registry.register(Histogram("latencia_seconds", "Latencia", ("stage",), buckets=(0.1, 1.0)))
+        counter = test_registry.register(Counter("errores_total", "Errores", ("stage",)))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe(value, "db")
+        counter.inc('a"b')
+        text = test_registry.render()
+        self.assertIn("# TYPE latencia_seconds histogram", text)
+        self.assertIn('latencia_seconds_bucket{stage="db",le="0.1"} 1', text)
+        self.assertIn('latencia_seconds_bucket{stage="db",le="1"} 3', text)
+        self.assertIn('latencia_seconds_bucket{stage="db",le="+Inf"} 4', text)
+        self.assertIn('latencia_seconds_sum{stage="db"} 4.05', text)
+        self.assertIn('latencia_seconds_count{stage="db"} 4', text)
+        self.assertIn('errores_total{stage="a\\"b"} 1', text)
+
+    def test_timed_counts_errors(self):
+        """El decorador mide funciones síncronas y asíncronas y cuenta sus errores."""
+        @timed("db_write")
+        def guardar(fallar):
+            if fallar:
+                raise ValueError("fallo")
+            return 1
+
+        @timed("ollama", "generar")
+        async def generar():
+            return "ok"
+
+        self.assertEqual(guardar(False), 1)
+        with self.assertRaises(ValueError):
+            guardar(True)
+        self.assertEqual(asyncio.run(generar()), "ok")
+        self.assertEqual(metrics.stage_duration.count("db_write", "guardar"), 2)
+        self.assertEqual(metrics.stage_errors.value("db_write", "guardar"), 1)
+        self.assertEqual(metrics.stage_duration.count("ollama", "generar"), 1)
+        with self.assertRaises(KeyError), stage("db_read", "lectura"):
+            raise KeyError("x")
+        self.assertEqual(metrics.stage_errors.value("db_read", "lectura"), 1)
+
+    def test_record_generation(self):
+        """Los tiempos de Ollama (en nanosegundos) se registran en segundos por modelo."""
+        record_generation("gemma3:4b", {
+            "prompt_eval_duration": 250_000_000,
+            "eval_duration": 2_000_000_000,
+            "load_duration": 1_000_000,
+            "prompt_eval_count": 120,
+            "eval_count": 64,
+        })
+        self.assertAlmostEqual(metrics.ollama_prefill.total("gemma3:4b"), 0.25)
+        self.assertAlmostEqual(metrics.ollama_eval.total("gemma3:4b"), 2.0)
+        self.assertEqual(metrics.ollama_generated_tokens.value("gemma3:4b"), 64)
+        with metrics.generations_in_flight.track("gemma3:4b"):
+            self.assertEqual(metrics.generations_in_flight.value("gemma3:4b"), 1)
+        self.assertEqual(metrics.generations_in_flight.value("gemma3:4b"), 0)
+        self.assertIn('ollama_prompt_tokens_total{model="gemma3:4b"} 120', registry.render())
+
+if __name__ == "__main__":
+    unittest.main()
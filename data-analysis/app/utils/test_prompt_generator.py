@@ -0,0 +1,70 @@
+import unittest
+import json
+import tempfile
+import os
+from app.utils.prompt_generator import generate_batch_prompt, generate_prompt, render_prompt, resolve_data_resumen
+from app.utils.prompt_templates import PromptTemplate, get_template, load_templates
+
+READING = {
+    "gps": {"latitud": 9.9, "longitud": -84.1},
+    "sensor_bmp390": {"temperatura_a": 21.5, "presion_hPa": 880.0},
+    "sensor_ltr390": {"lux": 120.0, "indice_uv": 1.2},
+    "clima_satelital": {"T2M": 20.1, "RH2M": 85.0, "PRECTOTCORR": 3.2, "WS10M": 1.5},
+}
+
+class TestPromptGenerator(unittest.TestCase):
+
+    def test_complete_reading_has_no_defaults(self):
+        """Una lectura completa no usa valores por defecto y sus datos van al final del prompt."""
+        rendered = render_prompt(READING)
+        self.assertEqual(rendered.defaulted, [])
+        self.assertEqual(rendered.template, "analisis_es")
+        self.assertIn('"temperatura": 21.5', rendered.text)
+
+    def test_missing_fields_reported(self):
+        """Los campos ausentes se rellenan por campo y se informan."""
+        data_resumen, defaulted = resolve_data_resumen({"sensor_bmp390": {"temperatura_a": 30.0}})
+        self.assertEqual(data_resumen["clima"]["temperatura"], 30.0)
+        self.assertEqual(data_resumen["clima"]["presion_hPa"], 885.7)
+        self.assertIn("sensor_bmp390.presion_hPa", defaulted)
+        self.assertIn("gps.latitud", defaulted)
+        self.assertNotIn("sensor_bmp390.temperatura_a", defaulted)
+
+    def test_prefix_identical_across_readings(self):
+        """El texto fijo va antes de los datos, así que el prefijo no cambia entre lecturas."""
+        other = json.loads(json.dumps(READING))
+        other["sensor_bmp390"]["temperatura_a"] = 28.0
+        first, second = generate_prompt(READING), generate_prompt(other)
+        prefix = get_template("analisis").prefix
+        self.assertTrue(first.startswith(prefix) and second.startswith(prefix))
+        self.assertGreater(len(prefix), 0.8 * len(first))
+
+    def test_language_selection(self):
+        """Se puede elegir la plantilla por idioma, con español como respaldo."""
+        self.assertIn("Answer in English", generate_prompt(READING, language="en"))
+        self.assertIn("Responde en español", generate_prompt(READING, language="fr"))
+
+    def test_batch_prompt(self):
+        """El prompt por lotes incluye cada lectura con su ID y la cabecera de sección."""
+        prompt = generate_batch_prompt([(7, resolve_data_resumen(READING)[0]), (8, resolve_data_resumen(READING)[0])])
+        self.assertIn("=== LECTURA <id> ===", prompt)
+        self.assertIn('"id": 7', prompt)
+        self.assertIn('"id": 8', prompt)
+
+    def test_template_compilation(self):
+        """Las plantillas se compilan una vez y exigen todos sus marcadores."""
+        template = PromptTemplate("prueba_es", "Hola {{nombre}}, datos: {{ datos }}.")
+        self.assertEqual(template.fields, {"nombre", "datos"})
+        self.assertEqual(template.render(nombre="Ana", datos="[]"), "Hola Ana, datos: [].")
+        with self.assertRaises(ValueError):
+            template.render(nombre="Ana")
+
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "analisis_es.txt"), "w", encoding="utf-8") as f:
+                f.write("X {{datos}}")
+            self.assertEqual(list(load_templates(directory)), ["analisis_es"])
+        # Restaurar las plantillas del proyecto
+        load_templates(os.path.join(os.path.dirname(os.path.dirname(__file__)), "prompts"))
+
+if __name__ == '__main__':
+    unittest.main()
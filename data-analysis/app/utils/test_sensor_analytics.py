@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+from datetime import datetime, timedelta
+from app.db.manager import DBManager
+from app.utils import sensor_analytics
+
+class TestSensorAnalytics(unittest.TestCase):
+
+    def test_rolling_stats_match_naive(self):
+        """La media y la desviación móviles coinciden con el cálculo directo, ignorando NaN."""
+        rng = np.random.default_rng(1)
+        values = 885.0 + rng.normal(0, 0.5, 200)
+        values[[5, 50, 51]] = np.nan
+        mean, std = sensor_analytics.rolling_stats(values, 10)
+        for i in (20, 55, 199):
+            chunk = values[max(0, i - 9):i + 1]
+            self.assertAlmostEqual(mean[i], np.nanmean(chunk), places=9)
+            self.assertAlmostEqual(std[i], np.nanstd(chunk, ddof=1), places=9)
+        self.assertTrue(np.isnan(mean[0]))
+
+    def test_spike_detected_as_anomaly(self):
+        """Un pico aislado supera el umbral de z-score y el resto no."""
+        values = 22.0 + 0.1 * np.sin(np.arange(100))
+        values[70] = 30.0
+        window = sensor_analytics.SensorWindow(np.arange(100) * 60, {"temperatura_a": values})
+        anomalies = sensor_analytics.find_anomalies(window, 20, 4.0)
+        self.assertEqual([anomaly["t"] for anomaly in anomalies], [70 * 60])
+
+    def test_derived_values(self):
+        """Punto de rocío, VPD y altitud en valores de referencia conocidos."""
+        self.assertAlmostEqual(float(sensor_analytics.dew_point(np.array([25.0]), np.array([60.0]))[0]), 16.7, places=1)
+        self.assertAlmostEqual(float(sensor_analytics.vapor_pressure_deficit(np.array([25.0]), np.array([60.0]))[0]), 1.27, places=2)
+        self.assertAlmostEqual(float(sensor_analytics.altitude_from_pressure(np.array([1013.25]))[0]), 0.0)
+        self.assertAlmostEqual(float(sensor_analytics.altitude_from_pressure(np.array([899.0]))[0]), 1000, delta=15)
+
+    def test_window_from_db_and_daily_aggregates(self):
+        """La ventana se lee en columnas de SQLite y se agrega por día."""
+        db_manager = DBManager(db_path=":memory:")
+        try:
+            base = datetime(2025, 5, 1, 20, 0, 0)
+            readings = [
+                {
+                    "timestamp": (base + timedelta(hours=n)).isoformat(),
+                    "sensor_bmp390": {"temperatura_a": 20.0 + n, "presion_hPa": 885.0},
+                }
+                for n in range(6)
+            ]
+            db_manager.save_sensor_data_many(readings)
+            start = int(base.timestamp())
+            window = sensor_analytics.load_window(db_manager, ["temperatura_a", "lux"], start, start + 6 * 3600)
+            self.assertEqual(len(window.epoch), 6)
+            self.assertTrue(np.isnan(window.values["lux"]).all())
+
+            days = sensor_analytics.daily_aggregates(window)
+            self.assertEqual([day["fecha"] for day in days], ["2025-05-01", "2025-05-02"])
+            self.assertEqual(days[0]["campos"]["temperatura_a"], {"min": 20.0, "max": 23.0, "avg": 21.5, "count": 4})
+            self.assertEqual(days[1]["campos"]["lux"]["count"], 0)
+
+            summary = sensor_analytics.summarize_window(window)
+            self.assertAlmostEqual(summary["temperatura_a"]["tendencia_h"], 1.0)
+            self.assertEqual(summary["lux"], {"count": 0})
+        finally:
+            db_manager.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import gzip
+import json
+import zlib
+from datetime import datetime, timezone
+from app.utils.sensor_payload import PayloadError, cbor2, decompress, msgpack, parse_readings
+
+READING = {
+    "timestamp": "2025-05-01T12:00:00",
+    "gps": {"latitud": 9.88, "longitud": -84.08},
+    "sensor_bmp390": {"presion_hPa": 885.2, "temperatura_a": "23.5"},
+    "sensor_nuevo": {"valor": 1},
+}
+
+class TestSensorPayload(unittest.TestCase):
+
+    def test_single_reading_validated(self):
+        """Una lectura se valida, se convierten los tipos y se conservan las claves desconocidas."""
+        readings = parse_readings(json.dumps(READING).encode())
+        self.assertEqual(len(readings), 1)
+        self.assertEqual(readings[0]["sensor_bmp390"]["temperatura_a"], 23.5)
+        self.assertEqual(readings[0]["sensor_nuevo"], {"valor": 1})
+        self.assertNotIn("sensor_scd30", readings[0])
+
+    def test_compressed_list(self):
+        """Se aceptan listas de lecturas comprimidas con gzip o deflate."""
+        body = json.dumps([READING] * 3).encode()
+        self.assertEqual(len(parse_readings(gzip.compress(body), "application/json", "gzip")), 3)
+        self.assertEqual(len(parse_readings(zlib.compress(body), "application/json; charset=utf-8", "deflate")), 3)
+
+    def test_invalid_payloads_rejected(self):
+        """Los cuerpos no válidos se rechazan con el código HTTP adecuado."""
+        bad = dict(READING, gps={"latitud": 200})
+        cases = [
+            (json.dumps(bad).encode(), None, None, 422),
+            (b"{no es json", None, None, 422),
+            (b"\\x00", "text/plain", None, 415),
+            (b"basura", None, "gzip", 400),
+            (gzip.compress(b"[" + b"{}," * 1000 + b"{}]"), None, "br", 415),
+        ]
+        for body, content_type, encoding, status in cases:
+            with self.assertRaises(PayloadError) as ctx:
+                parse_readings(body, content_type, encoding)
+            self.assertEqual(ctx.exception.status_code, status)
+        with self.assertRaises(PayloadError) as ctx:
+            decompress(gzip.compress(b"0" * 1000), "gzip", max_bytes=100)
+        self.assertEqual(ctx.exception.status_code, 413)
+
+    def assert_binary_payloads(self, encode, content_type):
+        """Comprobar una codificación binaria con lecturas válidas y no representables en JSON."""
+        readings = parse_readings(encode([READING, READING]), content_type)
+        self.assertEqual(len(readings), 2)
+        self.assertEqual(readings[0]["sensor_nuevo"], {"valor": 1})
+        json.dumps(readings)
+        with self.assertRaises(PayloadError) as ctx:
+            parse_readings(encode(dict(READING, firma=b"\x00\x01")), content_type)
+        self.assertEqual(ctx.exception.status_code, 422)
+        self.assertEqual(ctx.exception.detail[0]["loc"], ["firma"])
+
+    @unittest.skipIf(msgpack is None, "msgpack no está instalado")
+    def test_msgpack(self):
+        """MessagePack se valida igual que JSON y los binarios se rechazan."""
+        self.assert_binary_payloads(lambda value: msgpack.packb(value, use_bin_type=True), "application/msgpack")
+
+    @unittest.skipIf(cbor2 is None, "cbor2 no está instalado")
+    def test_cbor(self):
+        """CBOR se valida igual que JSON, los binarios se rechazan y las fechas pasan a ISO 8601."""
+        self.assert_binary_payloads(cbor2.dumps, "application/cbor")
+        body = cbor2.dumps(dict(READING, timestamp=datetime(2025, 5, 1, 12, tzinfo=timezone.utc),
+                                calibrado=datetime(2025, 4, 1, tzinfo=timezone.utc)))
+        reading = parse_readings(body, "application/cbor")[0]
+        self.assertEqual(reading["timestamp"], "2025-05-01T12:00:00+00:00")
+        self.assertEqual(reading["calibrado"], "2025-04-01T00:00:00+00:00")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,7 @@
+"""
+Pruebas de carga y de rendimiento.
+
+No forman parte de la suite de tests (pytest no las recoge): se ejecutan a
+mano o en CI con `python -m benchmarks.<módulo>` desde data-analysis/ y
+escriben sus resultados en JSON para compararlos entre commits.
+"""
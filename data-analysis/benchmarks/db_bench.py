@@ -0,0 +1,444 @@
+"""
+Micro-benchmarks de DBManager con bases de datos de tamaño real.
+
+Hace crecer una base de datos en disco hasta cada una de las escalas
+indicadas y en cada una mide:
+
+- insercion_unitaria: save_sensor_data, una lectura por transacción.
+- insercion_lote: save_sensor_data_many con lotes de --lote lecturas.
+- ultimas_n: get_sensor_records(limit=100), las lecturas más recientes.
+- analisis_join: get_analysis_results(limit=100), con JOIN a sensor_data.
+- analisis_por_id: get_analysis_result con IDs al azar.
+
+Las lecturas se miden con la caché de páginas caliente (consultas
+repetidas) y fría: se cierran las conexiones y se pide al sistema que
+descarte de su caché las páginas del fichero (posix_fadvise DONTNEED)
+antes de cada consulta. En algunos sistemas de ficheros (tmpfs, overlay)
+el descarte no tiene efecto y frío y caliente coinciden. También se
+registra el tamaño del fichero y los bytes por lectura en cada escala.
+
+La carga masiva genera columnas con NumPy y las inserta con executemany
+sin diario. Los agregados de sensor_rollups se calculan vectorizados, así
+que la base de datos queda igual que si las lecturas hubieran entrado
+por la API.
+
+Uso (desde data-analysis/):
+    python -m benchmarks.db_bench --escalas 100000,1000000 --salida db.json
+    python -m benchmarks.db_bench --escalas 1000000,10000000,50000000 --directorio /mnt/ssd
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import logging
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.db.manager import DBManager
+from app.db.pool import close_all_pools
+from app.db.rollups import RESOLUTIONS, ROLLUP_METRICS, UPSERT_SQL
+from app.db.sensor_schema import GROUP_BITS, INSERT_COLUMNS, INSERT_SQL, SENSOR_GROUPS
+from benchmarks.load_test import git_commit
+
+# Filas generadas e insertadas por tramo en la carga masiva
+LOAD_CHUNK = 200000
+
+# Valor típico y dispersión de cada campo en las lecturas sintéticas
+_FIELD_PROFILE: Dict[str, tuple] = {
+    "presion_hPa": (889.0, 2.0), "temperatura_a": (23.5, 2.0), "luz_cruda": (60, 40),
+    "uv_crudo": (1, 1), "lux": (45.0, 30.0), "indice_uv": (0.4, 0.3), "co2_ppm": (450.0, 30.0),
+    "temperatura_b": (23.2, 2.0), "humedad_pct": (80.0, 6.0), "latitud": (9.8893941, 1e-5),
+    "longitud": (-84.0899409, 1e-5),
+}
+_SCD30_FIELDS = [field for field, _ in SENSOR_GROUPS["sensor_scd30"]]
+_INTEGER_FIELDS = {field for fields in SENSOR_GROUPS.values() for field, sql_type in fields if sql_type == "INTEGER"}
+_ALL_GROUPS = sum(GROUP_BITS.values())
+
+# Texto de análisis de tamaño realista (≈1,5 KB, como una respuesta del modelo)
+ANALYSIS_TEXT = (
+    "Resumen: las condiciones del cultivo son estables. La temperatura se mantiene "
+    "en el rango óptimo y la humedad relativa es adecuada para la fase actual. "
+) * 10
+
+
+def _utc_offset() -> int:
+    """Desfase de la hora local respecto a UTC en segundos."""
+    return int(datetime.now().astimezone().utcoffset().total_seconds())
+
+
+def _local_text(epoch: np.ndarray, sep: str) -> np.ndarray:
+    """Marcas de tiempo en hora local como texto, vectorizadas."""
+    text = (epoch + _utc_offset()).astype("datetime64[s]").astype(str)
+    return np.char.replace(text, "T", sep) if sep != "T" else text
+
+
+def _sql_list(values: np.ndarray, integer: bool) -> list:
+    """Columna convertida a valores de SQLite (NaN = NULL)."""
+    if integer:
+        return np.rint(values).astype(np.int64).tolist()
+    missing = np.isnan(values)
+    if not missing.any():
+        return values.tolist()
+    column = values.astype(object)
+    column[missing] = None
+    return column.tolist()
+
+
+def synthetic_columns(rng: np.random.Generator, epoch: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Generar las columnas tipadas de sensor_data para unas marcas de tiempo.
+
+    Args:
+        rng: Generador de NumPy
+        epoch: Marcas de tiempo en segundos epoch (ascendentes)
+
+    Returns:
+        Valores por campo (NaN = dato ausente, un 20 % en el sensor_scd30)
+    """
+    n = len(epoch)
+    columns = {}
+    for group, fields in SENSOR_GROUPS.items():
+        for field, _ in fields:
+            mean, spread = _FIELD_PROFILE.get(field, (20.0, 3.0))
+            values = rng.normal(mean, spread, n)
+            if field in _INTEGER_FIELDS:
+                values = np.clip(values, 0, None)
+            columns[field] = values
+    for field in _SCD30_FIELDS:
+        columns[field][rng.random(n) < 0.2] = np.nan
+    return columns
+
+
+def rollup_params(epoch: np.ndarray, columns: Dict[str, np.ndarray]) -> List[tuple]:
+    """
+    Calcular los agregados de sensor_rollups de un tramo, vectorizados.
+
+    Args:
+        epoch: Marcas de tiempo ascendentes del tramo
+        columns: Valores por campo
+
+    Returns:
+        Parámetros para ejecutar UPSERT_SQL con executemany
+    """
+    params = []
+    for metric in ROLLUP_METRICS:
+        values = columns[metric]
+        valid = ~np.isnan(values)
+        if not valid.any():
+            continue
+        metric_epoch, metric_values = epoch[valid], values[valid]
+        for seconds in RESOLUTIONS.values():
+            buckets = metric_epoch - metric_epoch % seconds
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+            counts = np.diff(np.append(starts, len(buckets)))
+            params.extend(zip(
+                [metric] * len(starts),
+                [seconds] * len(starts),
+                buckets[starts].tolist(),
+                counts.tolist(),
+                np.add.reduceat(metric_values, starts).tolist(),
+                np.minimum.reduceat(metric_values, starts).tolist(),
+                np.maximum.reduceat(metric_values, starts).tolist(),
+            ))
+    return params
+
+
+def bulk_load(
+    db_path: str,
+    rows: int,
+    start_epoch: int,
+    interval: int = 10,
+    analyses_every: int = 60,
+    seed: Optional[int] = None,
+) -> Dict[str, float]:
+    """
+    Añadir lecturas (y análisis) a una base de datos con el esquema de DBManager.
+
+    Las lecturas van de start_epoch en adelante, una cada `interval`
+    segundos. Se añade un análisis por cada `analyses_every` lecturas.
+    Las conexiones de DBManager deben estar cerradas.
+
+    Args:
+        db_path: Ruta de la base de datos (ya creada por DBManager)
+        rows: Lecturas a añadir
+        start_epoch: Marca de tiempo de la primera lectura
+        interval: Segundos entre lecturas
+        analyses_every: Lecturas por cada análisis (0 = sin análisis)
+        seed: Semilla de los datos
+
+    Returns:
+        Segundos empleados y filas por segundo
+    """
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    began = time.perf_counter()
+    try:
+        # El fichero sigue en modo WAL; synchronous=OFF evita los fsync de la carga
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA cache_size=-262144")
+        first_id = (conn.execute("SELECT MAX(id) FROM sensor_data").fetchone()[0] or 0) + 1
+        conn.execute("BEGIN")
+        for offset in range(0, rows, LOAD_CHUNK):
+            count = min(LOAD_CHUNK, rows - offset)
+            epoch = start_epoch + (offset + np.arange(count, dtype=np.int64)) * interval
+            columns = synthetic_columns(rng, epoch)
+            values = {
+                "timestamp": _local_text(epoch, " ").tolist(),
+                "epoch": epoch.tolist(),
+                "source_timestamp": _local_text(epoch, "T").tolist(),
+                "groups_mask": [_ALL_GROUPS] * count,
+                "extra": [None] * count,
+            }
+            for field, column in columns.items():
+                values[field] = _sql_list(column, field in _INTEGER_FIELDS)
+            conn.executemany(INSERT_SQL, zip(*(values[column] for column in INSERT_COLUMNS)))
+            conn.executemany(UPSERT_SQL, rollup_params(epoch, columns))
+
+            if analyses_every:
+                ids = np.arange(first_id + offset, first_id + offset + count, dtype=np.int64)
+                picked = np.flatnonzero((ids - first_id) % analyses_every == analyses_every - 1)
+                conn.executemany(
+                    "INSERT INTO analysis_results (data_id, result, timestamp, epoch) VALUES (?, ?, ?, ?)",
+                    zip(
+                        ids[picked].tolist(),
+                        [ANALYSIS_TEXT] * len(picked),
+                        _local_text(epoch[picked] + 5, " ").tolist(),
+                        (epoch[picked] + 5).tolist(),
+                    ),
+                )
+        conn.execute("COMMIT")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - began
+    return {"carga_s": round(elapsed, 2), "carga_filas_s": round(rows / elapsed, 1) if elapsed else None}
+
+
+def drop_page_cache(db_path: str) -> bool:
+    """
+    Pedir al sistema que descarte de su caché las páginas de la base de datos.
+
+    Args:
+        db_path: Ruta de la base de datos
+
+    Returns:
+        True si se pudo pedir el descarte (posix_fadvise disponible)
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for path in (db_path, db_path + "-wal"):
+        if os.path.exists(path):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+    return True
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """
+    Resumir latencias en segundos.
+
+    Args:
+        samples: Latencias medidas
+
+    Returns:
+        Muestras, p50/p95/p99 y media en milisegundos, y operaciones por segundo
+    """
+    values = np.array(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "muestras": len(values),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "media_ms": round(float(values.mean()), 3),
+        "ops_s": round(1000 / float(values.mean()), 1) if values.mean() else None,
+    }
+
+
+def time_calls(operation: Callable[[int], Any], repetitions: int) -> List[float]:
+    """Medir `repetitions` llamadas a una operación (recibe el número de llamada)."""
+    samples = []
+    for i in range(repetitions):
+        began = time.perf_counter()
+        operation(i)
+        samples.append(time.perf_counter() - began)
+    return samples
+
+
+def measure_scale(db_path: str, args: argparse.Namespace, rng: np.random.Generator) -> Dict[str, Any]:
+    """
+    Medir las operaciones de DBManager sobre la base de datos actual.
+
+    Args:
+        db_path: Ruta de la base de datos
+        args: Opciones de la línea de comandos
+        rng: Generador para elegir IDs al azar
+
+    Returns:
+        Resultados por operación
+    """
+    db = DBManager(db_path)
+    with db.pool.reader() as conn:
+        max_analysis = conn.execute("SELECT MAX(id) FROM analysis_results").fetchone()[0] or 0
+    reading = {
+        "sensor_bmp390": {"presion_hPa": 889.1, "temperatura_a": 23.4},
+        "sensor_scd30": {"co2_ppm": 452.0, "temperatura_b": 23.1, "humedad_pct": 81.0},
+    }
+    batch = [reading] * args.lote
+
+    reads: Dict[str, Callable[[int], Any]] = {
+        "ultimas_n": lambda i: db.get_sensor_records(limit=100),
+        "analisis_join": lambda i: db.get_analysis_results(limit=100),
+    }
+    if max_analysis:
+        ids = rng.integers(1, max_analysis + 1, size=args.repeticiones + args.repeticiones_frio).tolist()
+        reads["analisis_por_id"] = lambda i: db.get_analysis_result(ids[i])
+
+    results: Dict[str, Any] = {}
+    # Lecturas en frío: conexiones nuevas y caché de páginas descartada antes de cada consulta
+    cold_supported = True
+    for name, operation in reads.items():
+        samples = []
+        for i in range(args.repeticiones_frio):
+            close_all_pools()
+            cold_supported = drop_page_cache(db_path) and cold_supported
+            db = DBManager(db_path)
+            began = time.perf_counter()
+            operation(args.repeticiones + i)
+            samples.append(time.perf_counter() - began)
+        results[name] = {"frio": summarize(samples)}
+
+    # Lecturas en caliente: la misma conexión y las páginas ya en memoria
+    for name, operation in reads.items():
+        operation(0)
+        results[name]["caliente"] = summarize(time_calls(operation, args.repeticiones))
+
+    results["insercion_unitaria"] = summarize(time_calls(lambda i: db.save_sensor_data(reading), args.repeticiones))
+    batch_samples = time_calls(lambda i: db.save_sensor_data_many(batch), max(3, args.repeticiones // 50))
+    results["insercion_lote"] = summarize(batch_samples)
+    results["insercion_lote"]["filas_s"] = round(args.lote * len(batch_samples) / sum(batch_samples), 1)
+    results["frio_efectivo"] = cold_supported
+    close_all_pools()
+    return results
+
+
+def file_size(db_path: str) -> int:
+    """Tamaño de la base de datos en bytes, incluido el WAL."""
+    return sum(os.path.getsize(path) for path in (db_path, db_path + "-wal") if os.path.exists(path))
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Construir la base de datos escala a escala y medir cada una."""
+    workdir = args.directorio or tempfile.mkdtemp(prefix="db-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    db_path = os.path.join(workdir, "sensores.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    rng = np.random.default_rng(args.seed)
+    scales = sorted(args.escalas)
+    interval = 10
+    # Las lecturas terminan poco antes de ahora, como en una base de datos en uso
+    start_epoch = int(time.time()) - scales[-1] * interval - 3600
+    DBManager(db_path)
+    close_all_pools()
+
+    results = []
+    loaded = 0
+    try:
+        for scale in scales:
+            print(f"Cargando hasta {scale:,} lecturas...", flush=True)
+            load = bulk_load(
+                db_path, scale - loaded, start_epoch + loaded * interval, interval, args.analisis_cada, args.seed
+            )
+            loaded = scale
+            size = file_size(db_path)
+            operations = measure_scale(db_path, args, rng)
+            result = {
+                "lecturas": scale,
+                "analisis": scale // args.analisis_cada if args.analisis_cada else 0,
+                **load,
+                "tamano_bytes": size,
+                "bytes_por_lectura": round(size / scale, 1),
+                "operaciones": operations,
+            }
+            results.append(result)
+            print(
+                f"  {scale:>12,} lecturas  {size / 2**20:>9.1f} MiB  carga {load['carga_filas_s']:>10,.0f} filas/s  "
+                f"insert {operations['insercion_unitaria']['p50_ms']:.2f} ms  "
+                f"lote {operations['insercion_lote']['filas_s']:,.0f} filas/s"
+            )
+            for name in ("ultimas_n", "analisis_join", "analisis_por_id"):
+                if name in operations:
+                    op = operations[name]
+                    print(
+                        f"    {name:<16} caliente p50 {op['caliente']['p50_ms']:>8.2f} ms  "
+                        f"p95 {op['caliente']['p95_ms']:>8.2f} ms  frío p50 {op['frio']['p50_ms']:>8.2f} ms"
+                    )
+    finally:
+        close_all_pools()
+        if not args.conservar and not args.directorio:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "directorio": workdir,
+            "config": {
+                "repeticiones": args.repeticiones,
+                "repeticiones_frio": args.repeticiones_frio,
+                "lote": args.lote,
+                "analisis_cada": args.analisis_cada,
+                "seed": args.seed,
+            },
+        },
+        "resultados": results,
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(float(item)) for item in value.split(",") if item.strip()]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de DBManager en disco")
+    parser.add_argument("--escalas", type=_int_list, default=[100000, 1000000],
+                        help="Lecturas de cada escala, p. ej. 1e6,1e7,5e7 (por defecto 100000,1000000)")
+    parser.add_argument("--repeticiones", type=int, default=200, help="Llamadas medidas por operación en caliente")
+    parser.add_argument("--repeticiones-frio", type=int, default=10, help="Llamadas medidas por operación en frío")
+    parser.add_argument("--lote", type=int, default=500, help="Lecturas por lote en insercion_lote")
+    parser.add_argument("--analisis-cada", type=int, default=60, help="Lecturas por cada análisis guardado")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--directorio", help="Directorio de la base de datos (por defecto, uno temporal que se borra)")
+    parser.add_argument("--conservar", action="store_true", help="No borrar el directorio temporal al terminar")
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    output = run(args)
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"Resultados guardados en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
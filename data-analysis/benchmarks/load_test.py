@@ -0,0 +1,465 @@
+"""
+Prueba de carga del recorrido completo ingesta → análisis → lectura.
+
+Arranca la aplicación con uvicorn junto a dos sustitutos locales: el
+servicio fake-data (lecturas simuladas) y un Ollama simulado con latencia
+y velocidad de generación configurables (benchmarks/stub_ollama.py). La
+base de datos se crea en un directorio temporal. Con --base-url se mide en
+cambio una aplicación ya en marcha.
+
+Cada escenario se ejecuta con cada nivel de concurrencia durante
+--duracion segundos. Cada cliente virtual repite la operación en bucle
+cerrado: envía la siguiente petición en cuanto recibe la respuesta
+anterior. Escenarios:
+
+- sensor-data: POST /sensor-data con lecturas de fake-data (--lote por petición).
+- procesar-datos: GET /procesar-datos?forzar=true (lectura, guardado y encolado).
+- respuestas: GET /respuestas?limit=10.
+- pipeline: /procesar-datos, espera a que /jobs/{id} termine y lee la
+  respuesta en /respuestas/{id}. La latencia es la del recorrido completo.
+
+Por escenario y concurrencia se informa de peticiones, errores,
+throughput y latencias p50/p95/p99. Los resultados se guardan en JSON
+con el commit y la configuración, y --comparar los contrasta con los de
+otra ejecución. El código de salida es 1 si algún p95 o throughput
+empeora más de --max-regresion.
+
+Uso (desde data-analysis/):
+    python -m benchmarks.load_test --concurrencia 1,4,16 --duracion 10 --salida resultados.json
+    python -m benchmarks.load_test --escenarios respuestas --comparar base.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+FAKE_DATA_DIR = ROOT.parent / "fake-data"
+
+SCENARIOS = ("sensor-data", "procesar-datos", "respuestas", "pipeline")
+
+# Espera máxima a que un trabajo de análisis termine en el escenario pipeline
+JOB_TIMEOUT = 120.0
+JOB_POLL_SECONDS = 0.02
+# Espera máxima a que se vacíe la cola de análisis entre niveles
+DRAIN_TIMEOUT = 1800.0
+# Lecturas de ejemplo para sensor-data: al menos SAMPLE_BODIES cuerpos distintos por lote
+SAMPLE_DEVICES = 4
+SAMPLE_BODIES = 4
+# Máximo de lecturas por petición que acepta la API (INGEST_MAX_BATCH por defecto)
+MAX_BATCH = 10000
+
+
+def free_port() -> int:
+    """Obtener un puerto TCP libre en localhost."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit() -> Optional[str]:
+    """Commit actual del repositorio (None si no se puede obtener)."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+class Stack:
+    """Aplicación, fake-data y Ollama simulado como procesos locales."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="carga-")
+        self.processes: List[subprocess.Popen] = []
+        self.base_url = ""
+        self.fake_data_url = ""
+
+    def _spawn(self, name: str, command: List[str], cwd: Path, env: Dict[str, str]) -> None:
+        log = open(os.path.join(self.workdir, f"{name}.log"), "w")
+        self.processes.append(
+            subprocess.Popen(command, cwd=cwd, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+        )
+
+    async def _wait_ready(self, url: str, timeout: float = 60.0) -> None:
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < deadline:
+                try:
+                    if (await client.get(url, timeout=2)).status_code < 500:
+                        return
+                except httpx.HTTPError:
+                    pass
+                if any(process.poll() is not None for process in self.processes):
+                    break
+                await asyncio.sleep(0.2)
+        raise RuntimeError(f"El servicio {url} no arrancó (registros en {self.workdir})")
+
+    async def start(self) -> str:
+        """Arrancar los servicios y devolver la URL base de la aplicación."""
+        args = self.args
+        uvicorn = [sys.executable, "-m", "uvicorn", "--host", "127.0.0.1", "--log-level", "warning"]
+
+        fake_port, ollama_port, app_port = free_port(), free_port(), free_port()
+        self._spawn("fake-data", uvicorn + ["--port", str(fake_port), "main:app"], FAKE_DATA_DIR, {})
+        self._spawn(
+            "ollama",
+            [
+                sys.executable, "-m", "benchmarks.stub_ollama", "--port", str(ollama_port),
+                "--latency-ms", str(args.ollama_latencia_ms), "--tokens", str(args.ollama_tokens),
+                "--tokens-s", str(args.ollama_tokens_s), "--concurrency", str(args.ollama_paralelo),
+            ],
+            ROOT,
+            {},
+        )
+        await self._wait_ready(f"http://127.0.0.1:{fake_port}/datos")
+        await self._wait_ready(f"http://127.0.0.1:{ollama_port}/api/tags")
+
+        env = {
+            "DATA_DIR": self.workdir,
+            "SENSOR_API_URL": f"http://127.0.0.1:{fake_port}/datos",
+            "OLLAMA_HOST": f"http://127.0.0.1:{ollama_port}",
+            "OLLAMA_HOSTS": "",
+            # La ingesta programada no debe interferir con la medida salvo que se pida
+            "INGEST_POLL_SECONDS": os.getenv("INGEST_POLL_SECONDS", "0"),
+        }
+        self._spawn("app", uvicorn + ["--port", str(app_port), "app.main:app"], ROOT, env)
+        self.base_url = f"http://127.0.0.1:{app_port}"
+        self.fake_data_url = f"http://127.0.0.1:{fake_port}"
+        await self._wait_ready(f"{self.base_url}/")
+        return self.base_url
+
+    def stop(self) -> None:
+        """Detener los servicios."""
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+class Scenario:
+    """Operación que repite cada cliente virtual."""
+
+    def __init__(self, name: str, run: Callable[[httpx.AsyncClient, int], Awaitable[Optional[int]]]):
+        """
+        Args:
+            name: Nombre del escenario
+            run: Operación; devuelve el ID del trabajo de análisis que encola, si encola alguno
+        """
+        self.name = name
+        self.run = run
+        self.last_job: Optional[int] = None
+
+
+def build_scenarios(readings: List[Dict[str, Any]], batch: int) -> Dict[str, Scenario]:
+    """
+    Crear los escenarios de carga.
+
+    Args:
+        readings: Lecturas de ejemplo para POST /sensor-data
+        batch: Lecturas por petición en POST /sensor-data
+
+    Returns:
+        Escenarios por nombre
+    """
+    bodies = [
+        json.dumps(readings[i:i + batch] if batch > 1 else readings[i]).encode()
+        for i in range(0, len(readings) - batch + 1, batch)
+    ]
+    if readings and not bodies:
+        raise ValueError(f"Hacen falta al menos {batch} lecturas de ejemplo para lotes de {batch}")
+
+    async def sensor_data(client: httpx.AsyncClient, i: int) -> None:
+        response = await client.post(
+            "/sensor-data", content=bodies[i % len(bodies)], headers={"Content-Type": "application/json"}
+        )
+        response.raise_for_status()
+
+    async def procesar_datos(client: httpx.AsyncClient, i: int) -> Optional[int]:
+        return (await client.get("/procesar-datos", params={"forzar": "true"})).raise_for_status().json()["job_id"]
+
+    async def respuestas(client: httpx.AsyncClient, i: int) -> None:
+        (await client.get("/respuestas", params={"limit": 10})).raise_for_status()
+
+    async def pipeline(client: httpx.AsyncClient, i: int) -> Optional[int]:
+        response = await client.get("/procesar-datos", params={"forzar": "true"})
+        job_id = response.raise_for_status().json()["job_id"]
+        job = await wait_for_job(client, job_id)
+        if job["status"] == "error":
+            raise RuntimeError(f"Trabajo {job_id} con error: {job.get('error')}")
+        (await client.get(f"/respuestas/{job['response_id']}")).raise_for_status()
+        return job_id
+
+    return {
+        "sensor-data": Scenario("sensor-data", sensor_data),
+        "procesar-datos": Scenario("procesar-datos", procesar_datos),
+        "respuestas": Scenario("respuestas", respuestas),
+        "pipeline": Scenario("pipeline", pipeline),
+    }
+
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: int, timeout: float = JOB_TIMEOUT) -> Dict[str, Any]:
+    """
+    Esperar a que un trabajo de análisis termine.
+
+    Args:
+        client: Cliente HTTP contra la aplicación
+        job_id: ID del trabajo
+        timeout: Segundos máximos de espera
+
+    Returns:
+        Estado final del trabajo ("done" o "error")
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        job = (await client.get(f"/jobs/{job_id}")).raise_for_status().json()
+        if job["status"] in ("done", "error"):
+            return job
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Trabajo {job_id} sin terminar tras {timeout:.0f} s")
+        await asyncio.sleep(JOB_POLL_SECONDS)
+
+
+async def run_level(
+    client: httpx.AsyncClient, scenario: Scenario, concurrency: int, duration: float, warmup: float
+) -> Dict[str, Any]:
+    """
+    Ejecutar un escenario con un nivel de concurrencia.
+
+    Args:
+        client: Cliente HTTP contra la aplicación
+        scenario: Escenario a ejecutar
+        concurrency: Clientes virtuales simultáneos
+        duration: Segundos de medida
+        warmup: Segundos previos sin medir
+
+    Returns:
+        Resumen de latencias, throughput y errores
+    """
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+    last_end = stop_at
+    counter = 0
+
+    async def worker() -> None:
+        nonlocal counter, last_end
+        while True:
+            begin = time.perf_counter()
+            if begin >= stop_at:
+                return
+            counter += 1
+            try:
+                job_id = await scenario.run(client, counter)
+                if job_id is not None:
+                    scenario.last_job = max(job_id, scenario.last_job or 0)
+                ok = True
+            except Exception as e:
+                ok = False
+                kind = type(e).__name__
+                if isinstance(e, httpx.HTTPStatusError):
+                    kind = f"HTTP {e.response.status_code}"
+            end = time.perf_counter()
+            # Cuentan las operaciones que empiezan dentro de la ventana, aunque terminen después
+            if begin >= measure_from:
+                last_end = max(last_end, end)
+                if ok:
+                    latencies.append(end - begin)
+                else:
+                    errors[kind] = errors.get(kind, 0) + 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    values = np.array(latencies) * 1000
+    completed = len(values)
+    elapsed = last_end - measure_from
+    result: Dict[str, Any] = {
+        "escenario": scenario.name,
+        "concurrencia": concurrency,
+        "peticiones": completed,
+        "errores": sum(errors.values()),
+        "errores_por_tipo": errors,
+        "throughput_s": round(completed / elapsed, 2),
+    }
+    if completed:
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        result.update(
+            p50_ms=round(float(p50), 2),
+            p95_ms=round(float(p95), 2),
+            p99_ms=round(float(p99), 2),
+            media_ms=round(float(values.mean()), 2),
+            max_ms=round(float(values.max()), 2),
+        )
+    return result
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], max_regression: float) -> bool:
+    """
+    Comparar los resultados con los de otra ejecución e imprimir las diferencias.
+
+    Args:
+        results: Resultados de esta ejecución
+        baseline: Contenido del JSON de la ejecución de referencia
+        max_regression: Empeoramiento relativo tolerado (0.2 = 20 %)
+
+    Returns:
+        True si ningún p95 ni throughput empeora más de lo tolerado
+    """
+    reference = {(r["escenario"], r["concurrencia"]): r for r in baseline.get("resultados", [])}
+    ok = True
+    print(f"\nComparación con {baseline.get('meta', {}).get('commit') or 'la referencia'}:")
+    for result in results:
+        before = reference.get((result["escenario"], result["concurrencia"]))
+        if not before or "p95_ms" not in before or "p95_ms" not in result:
+            continue
+        p95_change = result["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        tput_change = result["throughput_s"] / before["throughput_s"] - 1 if before["throughput_s"] else 0.0
+        regression = p95_change > max_regression or tput_change < -max_regression
+        ok = ok and not regression
+        print(
+            f"  {result['escenario']:<15} c={result['concurrencia']:<4} "
+            f"p95 {before['p95_ms']:>9.1f} -> {result['p95_ms']:>9.1f} ms ({p95_change:+.0%})  "
+            f"throughput {before['throughput_s']:>8.1f} -> {result['throughput_s']:>8.1f}/s ({tput_change:+.0%})"
+            + ("  << REGRESIÓN" if regression else "")
+        )
+    return ok
+
+
+async def run(args: argparse.Namespace) -> int:
+    stack = None
+    base_url = args.base_url
+    fake_data_url = args.fake_data_url
+    if not base_url:
+        stack = Stack(args)
+        base_url = await stack.start()
+        fake_data_url = stack.fake_data_url
+        print(f"Servicios en marcha (registros en {stack.workdir})")
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrencia) * 2, max_keepalive_connections=max(args.concurrencia))
+        async with httpx.AsyncClient(base_url=base_url, timeout=JOB_TIMEOUT, limits=limits) as client:
+            readings: List[Dict[str, Any]] = []
+            if "sensor-data" in args.escenarios:
+                if not fake_data_url:
+                    raise RuntimeError("El escenario sensor-data necesita --fake-data-url con --base-url")
+                # Suficientes lecturas para varios cuerpos distintos aunque el lote sea grande
+                per_device = max(1000, -(-args.lote * SAMPLE_BODIES // SAMPLE_DEVICES))
+                response = await client.get(
+                    f"{fake_data_url}/datos/batch",
+                    params={"n": per_device, "dispositivos": SAMPLE_DEVICES, "seed": args.seed}
+                )
+                readings = response.raise_for_status().json()
+            scenarios = build_scenarios(readings, args.lote)
+
+            results = []
+            for name in args.escenarios:
+                for concurrency in args.concurrencia:
+                    scenario = scenarios[name]
+                    result = await run_level(client, scenario, concurrency, args.duracion, args.calentamiento)
+                    results.append(result)
+                    if scenario.last_job is not None:
+                        # Los trabajos encolados no deben contaminar el siguiente nivel
+                        await wait_for_job(client, scenario.last_job, timeout=DRAIN_TIMEOUT)
+                        scenario.last_job = None
+                    print(
+                        f"{name:<15} c={concurrency:<4} {result['throughput_s']:>9.1f}/s  "
+                        f"p50 {result.get('p50_ms', float('nan')):>8.1f}  p95 {result.get('p95_ms', float('nan')):>8.1f}  "
+                        f"p99 {result.get('p99_ms', float('nan')):>8.1f} ms  errores {result['errores']}"
+                    )
+    finally:
+        if stack:
+            stack.stop()
+
+    output = {
+        "meta": {
+            "commit": git_commit(),
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "base_url": args.base_url,
+            "config": {
+                "duracion": args.duracion,
+                "calentamiento": args.calentamiento,
+                "lote": args.lote,
+                "ollama_latencia_ms": args.ollama_latencia_ms,
+                "ollama_tokens": args.ollama_tokens,
+                "ollama_tokens_s": args.ollama_tokens_s,
+                "ollama_paralelo": args.ollama_paralelo,
+                "analysis_workers": os.getenv("ANALYSIS_WORKERS", "4"),
+            },
+        },
+        "resultados": results,
+    }
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            if not compare(results, json.load(f), args.max_regresion):
+                return 1
+    return 0
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def _batch_size(value: str) -> int:
+    size = int(value)
+    if not 1 <= size <= MAX_BATCH:
+        raise argparse.ArgumentTypeError(f"El lote debe estar entre 1 y {MAX_BATCH} lecturas")
+    return size
+
+
+def _scenario_list(value: str) -> List[str]:
+    names = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+    return names
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API de análisis")
+    parser.add_argument("--escenarios", type=_scenario_list, default=list(SCENARIOS),
+                        help=f"Escenarios separados por comas ({', '.join(SCENARIOS)})")
+    parser.add_argument("--concurrencia", type=_int_list, default=[1, 4, 16], help="Niveles de concurrencia (1,4,16)")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de medida por nivel")
+    parser.add_argument("--calentamiento", type=float, default=1.0, help="Segundos sin medir antes de cada nivel")
+    parser.add_argument("--lote", type=_batch_size, default=1, help=f"Lecturas por petición en sensor-data (1-{MAX_BATCH})")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla de las lecturas simuladas")
+    parser.add_argument("--salida", help="Fichero JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--max-regresion", type=float, default=0.2, help="Empeoramiento tolerado al comparar (0.2 = 20%%)")
+    parser.add_argument("--base-url", help="Medir una aplicación ya en marcha en lugar de arrancarla")
+    parser.add_argument("--fake-data-url", help="Servicio fake-data a usar con --base-url")
+    parser.add_argument("--ollama-latencia-ms", type=float, default=50.0, help="Latencia fija del Ollama simulado")
+    parser.add_argument("--ollama-tokens", type=int, default=64, help="Tokens por respuesta del Ollama simulado")
+    parser.add_argument("--ollama-tokens-s", type=float, default=200.0, help="Tokens por segundo del Ollama simulado")
+    parser.add_argument("--ollama-paralelo", type=int, default=1, help="Generaciones simultáneas del Ollama simulado")
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Servidor Ollama simulado para las pruebas de carga.
+
+Implementa las rutas que usa la aplicación (/api/tags, /api/show,
+/api/generate y /api/chat, con y sin streaming) y simula el coste de una
+generación: una latencia fija, el prefill del prompt a STUB_PREFILL_TOKENS_S
+tokens por segundo (un token ≈ 4 caracteres) y la generación de
+STUB_TOKENS tokens a STUB_TOKENS_S tokens por segundo. Las respuestas
+llevan los mismos campos de tiempos que Ollama (prompt_eval_duration,
+eval_duration...), así que las métricas de generación funcionan igual.
+
+STUB_CONCURRENCY limita las generaciones simultáneas, como
+OLLAMA_NUM_PARALLEL en un Ollama real; las demás esperan turno.
+
+Uso:
+    python -m benchmarks.stub_ollama --port 11434 --tokens-s 20 --latency-ms 50
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+# Configuración (se puede sobrescribir mediante variables de entorno)
+STUB_MODELS = os.getenv("STUB_MODELS", os.getenv("OLLAMA_MODEL", "gemma3:4b"))
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "50"))
+STUB_PREFILL_TOKENS_S = float(os.getenv("STUB_PREFILL_TOKENS_S", "500"))
+STUB_TOKENS = int(os.getenv("STUB_TOKENS", "64"))
+STUB_TOKENS_S = float(os.getenv("STUB_TOKENS_S", "40"))
+STUB_CONCURRENCY = int(os.getenv("STUB_CONCURRENCY", "1"))
+
+# Texto que se va "generando", una palabra por token
+_WORDS = (
+    "Las condiciones del cultivo son estables; la temperatura y la humedad "
+    "están dentro del rango óptimo y no se requieren acciones inmediatas."
+).split()
+
+
+def _now() -> str:
+    """Marca de tiempo en el formato de Ollama."""
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def create_app(
+    models: Optional[List[str]] = None,
+    latency_ms: Optional[float] = None,
+    prefill_tokens_s: Optional[float] = None,
+    tokens: Optional[int] = None,
+    tokens_s: Optional[float] = None,
+    concurrency: Optional[int] = None,
+) -> FastAPI:
+    """
+    Crear la aplicación del servidor simulado.
+
+    Args:
+        models: Modelos anunciados en /api/tags
+        latency_ms: Latencia fija de cada generación (carga, red...)
+        prefill_tokens_s: Velocidad de procesado del prompt (0 = instantáneo)
+        tokens: Tokens generados por respuesta
+        tokens_s: Velocidad de generación (0 = instantánea)
+        concurrency: Generaciones simultáneas como máximo
+
+    Returns:
+        Aplicación FastAPI
+    """
+    models = models or [name.strip() for name in STUB_MODELS.split(",") if name.strip()]
+    latency = (latency_ms if latency_ms is not None else STUB_LATENCY_MS) / 1000
+    prefill_rate = prefill_tokens_s if prefill_tokens_s is not None else STUB_PREFILL_TOKENS_S
+    n_tokens = tokens if tokens is not None else STUB_TOKENS
+    token_rate = tokens_s if tokens_s is not None else STUB_TOKENS_S
+    slots = asyncio.Semaphore(concurrency or STUB_CONCURRENCY)
+
+    app = FastAPI(title="Ollama simulado")
+    app.state.generations = 0
+
+    def prompt_tokens(body: Dict[str, Any]) -> int:
+        text = body.get("prompt") or "".join(m.get("content", "") for m in body.get("messages", []))
+        return max(1, len(text) // 4)
+
+    def stats(body: Dict[str, Any], prefill: float, generation: float, started: float) -> Dict[str, Any]:
+        return {
+            "model": body.get("model"),
+            "created_at": _now(),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((time.perf_counter() - started) * 1e9),
+            "load_duration": int(latency * 1e9),
+            "prompt_eval_count": prompt_tokens(body),
+            "prompt_eval_duration": int(prefill * 1e9),
+            "eval_count": n_tokens,
+            "eval_duration": int(generation * 1e9),
+        }
+
+    def content(body: Dict[str, Any], text: str) -> Dict[str, Any]:
+        if "messages" in body:
+            return {"message": {"role": "assistant", "content": text}}
+        return {"response": text}
+
+    async def generate(body: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Simular una generación; produce un fragmento por token y el final con los tiempos."""
+        async with slots:
+            started = time.perf_counter()
+            prefill = prompt_tokens(body) / prefill_rate if prefill_rate else 0.0
+            await asyncio.sleep(latency + prefill)
+            step = 1 / token_rate if token_rate else 0.0
+            for i in range(n_tokens):
+                if step:
+                    await asyncio.sleep(step)
+                word = _WORDS[i % len(_WORDS)]
+                yield {"model": body.get("model"), "created_at": _now(), "done": False, **content(body, word + " ")}
+            app.state.generations += 1
+            yield {**stats(body, prefill, step * n_tokens, started), **content(body, "")}
+
+    async def respond(request: Request):
+        body = await request.json()
+        if body.get("stream", True):
+            async def lines():
+                async for chunk in generate(body):
+                    yield json.dumps(chunk) + "\n"
+            return StreamingResponse(lines(), media_type="application/x-ndjson")
+        words = []
+        async for chunk in generate(body):
+            if not chunk["done"]:
+                words.append(chunk.get("response") or chunk["message"]["content"])
+        final = {**chunk, **content(body, "".join(words).strip())}
+        return final
+
+    @app.get("/api/tags")
+    async def tags():
+        return {
+            "models": [
+                {"name": name, "model": name, "size": 0, "details": {"family": "stub"}}
+                for name in models
+            ]
+        }
+
+    @app.post("/api/show")
+    async def show(request: Request):
+        body = await request.json()
+        return {"details": {"family": "stub", "parameter_size": "0B"}, "model_info": {}, "name": body.get("name")}
+
+    @app.get("/api/ps")
+    async def ps():
+        return {"models": [{"name": name, "model": name} for name in models]}
+
+    app.add_api_route("/api/generate", respond, methods=["POST"])
+    app.add_api_route("/api/chat", respond, methods=["POST"])
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servidor Ollama simulado")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--models", default=STUB_MODELS, help="Modelos anunciados, separados por comas")
+    parser.add_argument("--latency-ms", type=float, default=STUB_LATENCY_MS)
+    parser.add_argument("--prefill-tokens-s", type=float, default=STUB_PREFILL_TOKENS_S)
+    parser.add_argument("--tokens", type=int, default=STUB_TOKENS)
+    parser.add_argument("--tokens-s", type=float, default=STUB_TOKENS_S)
+    parser.add_argument("--concurrency", type=int, default=STUB_CONCURRENCY)
+    args = parser.parse_args()
+    app = create_app(
+        [name.strip() for name in args.models.split(",") if name.strip()],
+        args.latency_ms,
+        args.prefill_tokens_s,
+        args.tokens,
+        args.tokens_s,
+        args.concurrency,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,248 @@
-import requests
+"""
+Genera un conjunto de datos simulados directamente en un fichero.
+
+Usa el generador vectorizado (generator.py), sin pasar por el servidor,
+así que produce cientos de miles de filas por segundo. El formato se
+deduce de la extensión del fichero de salida:
+
+- .db / .sqlite: tabla sensor_data con el mismo esquema tipado que
+  data-analysis, lista para usarla como DB_PATH.
+- .parquet: una columna por campo (requiere pyarrow).
+- .ndjson / .jsonl: una lectura por línea, con el formato de GET /datos.
+- .json: lista de lecturas con el formato de GET /datos.
+
+Ejemplos:
+    python generate_dataset.py --n 1000000 --seed 42 --output sensores.db
+    python generate_dataset.py --n 100000 --dispositivos 20 --output sensores.parquet
+"""
+import argparse
 import json
+import os
+import sqlite3
+import sys
 import time
+from datetime import datetime
+from typing import Dict, Iterator
+
+import numpy as np
+
+from generator import GROUPS, INTEGER_FIELDS, device_name, generate_chunks, iter_ndjson, iter_readings, local_iso
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # dependencia opcional, sólo para la salida Parquet
+    pa = None
+
+# Filas generadas y escritas por tramo
+CHUNK_SIZE = 100000
+
+FIELDS = [field for fields in GROUPS.values() for field in fields]
+
+# Todos los grupos están presentes en cada lectura simulada (bits de groups_mask
+# en el orden de los grupos, como en data-analysis/app/db/sensor_schema.py)
+GROUPS_MASK = (1 << len(GROUPS)) - 1
 
-# URL del servicio de datos falsos (asegúrate de que esté en ejecución)
-URL = "http://localhost:8080/datos"
-NUM_RECORDS = 1000
-OUTPUT_FILE = "test_dataset_1000_records.json"
 
-def generate_dataset():
+def _sensor_data_ddl() -> str:
+    """Sentencia CREATE TABLE del esquema tipado de data-analysis."""
+    columns = ",\n            ".join(
+        f"{field} {'INTEGER' if field in INTEGER_FIELDS else 'REAL'}" for field in FIELDS
+    )
+    return f"""
+        CREATE TABLE IF NOT EXISTS sensor_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            epoch INTEGER,
+            source_timestamp TEXT,
+            groups_mask INTEGER NOT NULL DEFAULT 0,
+            {columns},
+            extra TEXT
+        )
     """
-    Llama al endpoint de datos falsos repetidamente para generar un gran conjunto de datos.
+
+
+def _sql_column(field: str, values: np.ndarray) -> list:
+    """Columna convertida a valores de SQLite (NaN = NULL)."""
+    if field in INTEGER_FIELDS:
+        return values.astype(np.int64).tolist()
+    missing = np.isnan(values)
+    if not missing.any():
+        return values.tolist()
+    column = values.astype(object)
+    column[missing] = None
+    return column.tolist()
+
+
+def write_sqlite(path: str, chunks: Iterator[Dict[str, np.ndarray]]) -> int:
+    """
+    Escribir las lecturas en la tabla sensor_data de una base SQLite.
+
+    Con varios dispositivos, cada fila guarda su campo "dispositivo" en la
+    columna extra, como hace data-analysis con las claves desconocidas.
+
+    Si la base ya existe, las lecturas se añaden al final. La escritura se
+    hace en una sola transacción y sin diario, así que un fallo a mitad
+    puede dejar la base inservible: genere siempre sobre un fichero nuevo
+    o desechable.
+
+    Args:
+        path: Ruta de la base de datos
+        chunks: Tramos de columnas devueltos por generate_chunks
+
+    Returns:
+        Número de filas escritas
     """
-    dataset = []
-    print(f"Generando {NUM_RECORDS} registros desde {URL}...")
-
-    for i in range(NUM_RECORDS):
-        try:
-            response = requests.get(URL)
-            response.raise_for_status()  # Lanza un error para respuestas 4xx/5xx
-            dataset.append(response.json())
-            
-            # Imprimir progreso
-            print(f"Registro {i + 1}/{NUM_RECORDS} generado.", end='\r')
-
-        except requests.RequestException as e:
-            print(f"\nError al contactar el servicio de datos falsos: {e}")
-            print("Asegúrate de que el servicio esté en ejecución ejecutando 'python main.py' en el directorio 'fake-data'.")
-            return
-        
-        # Pequeña pausa para no sobrecargar el servicio
-        time.sleep(0.01)
-
-    with open(OUTPUT_FILE, 'w') as f:
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+        conn.execute("PRAGMA cache_size=-262144")
+        conn.execute(_sensor_data_ddl())
+        columns = ["timestamp", "epoch", "source_timestamp", "groups_mask"] + FIELDS + ["extra"]
+        sql = (
+            f"INSERT INTO sensor_data ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})"
+        )
+        written = 0
+        conn.execute("BEGIN")
+        for chunk in chunks:
+            # Los dispositivos comparten instantes: cada marca de tiempo se formatea una vez
+            seconds, index = np.unique(np.floor(chunk["epoch"]).astype(np.int64), return_inverse=True)
+            db_timestamps = np.array(local_iso(seconds, sep=" "), dtype=object)[index]
+            iso_timestamps = np.array(local_iso(seconds), dtype=object)[index]
+            # El mismo JSON que flatten_reading guarda en extra para la clave "dispositivo"
+            devices = chunk["dispositivo"]
+            if int(devices.max()) > 0:
+                names = [json.dumps({"dispositivo": device_name(d)}) for d in range(int(devices.max()) + 1)]
+                extra = np.array(names, dtype=object)[devices].tolist()
+            else:
+                extra = [None] * len(index)
+            rows = zip(
+                db_timestamps.tolist(),
+                seconds[index].tolist(),
+                iso_timestamps.tolist(),
+                [GROUPS_MASK] * len(index),
+                *(_sql_column(field, chunk[field]) for field in FIELDS),
+                extra,
+            )
+            conn.executemany(sql, rows)
+            written += len(index)
+        conn.execute("COMMIT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sensor_data_epoch ON sensor_data (epoch, id)")
+        return written
+    finally:
+        conn.close()
+
+
+def write_parquet(path: str, chunks: Iterator[Dict[str, np.ndarray]]) -> int:
+    """
+    Escribir las lecturas en un fichero Parquet (una columna por campo).
+
+    Args:
+        path: Ruta del fichero
+        chunks: Tramos de columnas devueltos por generate_chunks
+
+    Returns:
+        Número de filas escritas
+    """
+    if pa is None:
+        raise RuntimeError("La salida Parquet requiere pyarrow: pip install pyarrow")
+    writer = None
+    written = 0
+    try:
+        for chunk in chunks:
+            arrays = {
+                "timestamp": pa.array(chunk["epoch"].astype("datetime64[ms]")),
+                "dispositivo": pa.array(chunk["dispositivo"].astype(np.int32)),
+            }
+            for field in FIELDS:
+                values = chunk[field]
+                if field in INTEGER_FIELDS:
+                    arrays[field] = pa.array(values.astype(np.int64))
+                else:
+                    arrays[field] = pa.array(values, mask=np.isnan(values))
+            table = pa.table(arrays)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            written += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def write_ndjson(path: str, chunks: Iterator[Dict[str, np.ndarray]]) -> int:
+    """Escribir las lecturas como NDJSON (una por línea). Devuelve las filas escritas."""
+    written = 0
+    with open(path, "w") as f:
+        for chunk in chunks:
+            f.writelines(iter_ndjson(chunk))
+            written += len(chunk["epoch"])
+    return written
+
+
+def write_json(path: str, chunks: Iterator[Dict[str, np.ndarray]]) -> int:
+    """Escribir las lecturas como una lista JSON. Devuelve las filas escritas."""
+    dataset = [reading for chunk in chunks for reading in iter_readings(chunk)]
+    with open(path, "w") as f:
         json.dump(dataset, f, indent=2)
-    
-    print(f"\n¡Éxito! Se ha guardado un conjunto de datos con {len(dataset)} registros en '{OUTPUT_FILE}'.")
+    return len(dataset)
+
+
+WRITERS = {
+    ".db": write_sqlite,
+    ".sqlite": write_sqlite,
+    ".sqlite3": write_sqlite,
+    ".parquet": write_parquet,
+    ".ndjson": write_ndjson,
+    ".jsonl": write_ndjson,
+    ".json": write_json,
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Genera lecturas simuladas de sensores en un fichero.")
+    parser.add_argument("--n", type=int, default=1000, help="Lecturas por dispositivo (por defecto 1000)")
+    parser.add_argument("--dispositivos", type=int, default=1, help="Dispositivos simulados (por defecto 1)")
+    parser.add_argument("--seed", type=int, default=None, help="Semilla: la misma semilla produce los mismos datos")
+    parser.add_argument("--intervalo", type=float, default=10.0, help="Segundos entre lecturas (por defecto 10)")
+    parser.add_argument(
+        "--inicio",
+        type=datetime.fromisoformat,
+        default=None,
+        help="Fecha de la primera lectura, ISO 8601 (por defecto, la última lectura es la actual)",
+    )
+    parser.add_argument(
+        "--output",
+        default="test_dataset_1000_records.json",
+        help="Fichero de salida: .db/.sqlite, .parquet, .ndjson/.jsonl o .json",
+    )
+    args = parser.parse_args()
+
+    extension = os.path.splitext(args.output)[1].lower()
+    writer = WRITERS.get(extension)
+    if writer is None:
+        parser.error(f"Extensión no soportada: {extension or '(ninguna)'}")
+    if args.n < 1 or args.dispositivos < 1:
+        parser.error("--n y --dispositivos deben ser mayores que 0")
+
+    total = args.n * args.dispositivos
+    start = args.inicio.timestamp() if args.inicio else None
+    print(f"Generando {total} registros ({args.dispositivos} dispositivos) en '{args.output}'...")
+    began = time.perf_counter()
+    chunks = generate_chunks(args.n, args.dispositivos, args.seed, start, args.intervalo, CHUNK_SIZE)
+    try:
+        written = writer(args.output, chunks)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - began
+    print(f"¡Éxito! {written} registros en {elapsed:.2f} s ({written / elapsed:,.0f} registros/s).")
+    return 0
+
 
 if __name__ == "__main__":
-    generate_dataset()
+    sys.exit(main())
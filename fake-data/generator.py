@@ -0,0 +1,251 @@
+"""
+Generador vectorizado de lecturas simuladas.
+
+Genera de una vez N lecturas × M dispositivos con NumPy a partir de una
+semilla, de modo que el mismo comando produce siempre los mismos datos.
+Las magnitudes siguen ciclos diarios realistas (temperatura con máximo a
+media tarde, luz y UV sólo de día, CO2 más alto de noche, marea
+barométrica semidiurna) y los campos del sensor_scd30 faltan al azar en
+un 20 % de las lecturas, como en el servidor original. Los datos del
+clima satelital son diarios: cambian una vez por día y dispositivo.
+
+Los datos se generan por columnas (un array por campo) y se convierten a
+lecturas anidadas (el formato de GET /datos) sólo cuando hace falta.
+"""
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+
+# Posición base de los dispositivos simulados
+BASE_LATITUD = 9.8893941
+BASE_LONGITUD = -84.0899409
+
+# Probabilidad de que falte cada campo del sensor_scd30
+SCD30_DROPOUT = 0.2
+
+# Grupos y campos de una lectura, en el mismo orden que el esquema tipado
+# de sensor_data en data-analysis (app/db/sensor_schema.py)
+GROUPS: Dict[str, List[str]] = {
+    "sensor_bmp390": ["presion_hPa", "temperatura_a"],
+    "sensor_ltr390": ["luz_cruda", "uv_crudo", "lux", "indice_uv"],
+    "sensor_scd30": ["co2_ppm", "temperatura_b", "humedad_pct"],
+    "gps": ["latitud", "longitud"],
+    "clima_satelital": [
+        "T2M", "T2M_MAX", "T2M_MIN", "T2M_RANGE", "PRECTOTCORR", "RH2M",
+        "QV2M", "WS10M", "WS10M_MAX", "WS10M_MIN", "T2MDEW", "T2MWET", "TS",
+        "ALLSKY_SFC_LW_DWN", "ALLSKY_SFC_SW_DWN", "CLRSKY_SFC_SW_DWN",
+        "ALLSKY_KT", "EVLAND", "PS",
+    ],
+}
+
+INTEGER_FIELDS = {"luz_cruda", "uv_crudo"}
+
+# Rangos diarios del clima satelital (mínimo, máximo); None = valor fijo de relleno
+SATELLITE_RANGES: Dict[str, Any] = {
+    "T2M": (22.0, 24.0), "T2M_MAX": (25.0, 27.0), "T2M_MIN": (20.0, 22.0),
+    "T2M_RANGE": (5.0, 6.0), "PRECTOTCORR": (10.0, 15.0), "RH2M": (85.0, 95.0),
+    "QV2M": (16.0, 18.0), "WS10M": (0.5, 1.0), "WS10M_MAX": (1.0, 1.5),
+    "WS10M_MIN": (0.1, 0.3), "T2MDEW": (20.0, 22.0), "T2MWET": (21.0, 23.0),
+    "TS": (22.0, 24.0), "ALLSKY_SFC_LW_DWN": (36.0, 40.0), "ALLSKY_SFC_SW_DWN": (10.0, 15.0),
+    "CLRSKY_SFC_SW_DWN": None, "ALLSKY_KT": None, "EVLAND": (2.5, 3.5), "PS": (90.0, 95.0),
+}
+
+
+def _utc_offset() -> int:
+    """Desfase de la hora local respecto a UTC en segundos."""
+    return int(datetime.now().astimezone().utcoffset().total_seconds())
+
+
+def generate_chunks(
+    n: int,
+    devices: int = 1,
+    seed: Union[int, np.random.Generator, None] = None,
+    start: Optional[float] = None,
+    interval: float = 10.0,
+    chunk_size: int = 100000,
+) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Generar lecturas simuladas por columnas, en tramos de tiempo consecutivos.
+
+    Las diferencias entre dispositivos y el clima satelital diario se
+    sortean una sola vez, así que los tramos encajan sin saltos. Las filas
+    van ordenadas por tiempo y, dentro de cada instante, por dispositivo.
+
+    Args:
+        n: Lecturas por dispositivo
+        devices: Número de dispositivos simulados
+        seed: Semilla o generador de NumPy ya creado (None = aleatoria)
+        start: Instante de la primera lectura en segundos epoch (por defecto, ahora - n * interval)
+        interval: Segundos entre lecturas de un mismo dispositivo
+        chunk_size: Filas aproximadas por tramo
+
+    Yields:
+        Diccionarios con "epoch", "dispositivo" y un array por campo (NaN = dato ausente)
+    """
+    rng = np.random.default_rng(seed)
+    if start is None:
+        start = datetime.now().timestamp() - n * interval
+    offset = _utc_offset()
+
+    # Diferencias fijas entre dispositivos (microclima y posición)
+    temp_offset = rng.normal(0.0, 0.8, devices)
+    pressure_offset = rng.normal(0.0, 3.0, devices)
+    lat_offset = rng.uniform(-0.01, 0.01, devices)
+    lon_offset = rng.uniform(-0.01, 0.01, devices)
+
+    # Clima satelital: un valor por día y dispositivo
+    first_day = int((start + offset) // 86400)
+    n_days = int((start + max(n - 1, 0) * interval + offset) // 86400) - first_day + 1
+    satellite = {
+        field: rng.uniform(limits[0], limits[1], (devices, n_days)) if limits else None
+        for field, limits in SATELLITE_RANGES.items()
+    }
+
+    step = max(1, chunk_size // devices)
+    for first in range(0, n, step):
+        count = min(step, n - first)
+        rows = count * devices
+        epoch = np.repeat(start + (first + np.arange(count)) * interval, devices)
+        device = np.tile(np.arange(devices), count)
+        # Hora local del día y su fase en radianes (0 = medianoche)
+        local_hours = ((epoch + offset) % 86400) / 3600.0
+        phase = 2 * np.pi * local_hours / 24.0
+
+        columns: Dict[str, np.ndarray] = {"epoch": epoch, "dispositivo": device}
+
+        # Temperatura con máximo hacia las 15 h y mínimo de madrugada
+        diurnal = np.sin(phase - 2 * np.pi * 9 / 24)
+        temperature = 23.5 + temp_offset[device] + 3.0 * diurnal + rng.normal(0, 0.2, rows)
+        columns["temperatura_a"] = temperature
+        # Marea barométrica semidiurna (máximos hacia las 10 h y 22 h)
+        columns["presion_hPa"] = (
+            889.0 + pressure_offset[device] + 1.2 * np.cos(2 * phase - 2 * np.pi * 10 / 12)
+            + rng.normal(0, 0.3, rows)
+        )
+
+        # Luz y UV sólo entre las 6 h y las 18 h
+        daylight = np.clip(np.sin(np.pi * (local_hours - 6.0) / 12.0), 0.0, None)
+        lux = 90.0 * daylight * rng.uniform(0.7, 1.0, rows)
+        columns["lux"] = lux
+        columns["luz_cruda"] = np.rint(lux * 1.2 + rng.normal(5.0, 1.0, rows)).clip(0)
+        columns["indice_uv"] = daylight * rng.uniform(0.6, 1.0, rows)
+        columns["uv_crudo"] = np.rint(2.0 * daylight)
+
+        # CO2 más alto de noche; humedad opuesta a la temperatura
+        columns["co2_ppm"] = 450.0 + 40.0 * np.cos(phase - 2 * np.pi * 3 / 24) + rng.normal(0, 8.0, rows)
+        columns["temperatura_b"] = temperature - 0.3 + rng.normal(0, 0.15, rows)
+        columns["humedad_pct"] = np.clip(80.0 - 8.0 * diurnal + rng.normal(0, 1.5, rows), 0.0, 100.0)
+        for field in GROUPS["sensor_scd30"]:
+            columns[field][rng.random(rows) < SCD30_DROPOUT] = np.nan
+
+        columns["latitud"] = BASE_LATITUD + lat_offset[device] + rng.normal(0, 2e-6, rows)
+        columns["longitud"] = BASE_LONGITUD + lon_offset[device] + rng.normal(0, 2e-6, rows)
+
+        day_index = ((epoch + offset) // 86400).astype(np.int64) - first_day
+        for field, daily in satellite.items():
+            columns[field] = np.full(rows, -999.0) if daily is None else daily[device, day_index]
+        yield columns
+
+
+def generate_columns(
+    n: int,
+    devices: int = 1,
+    seed: Union[int, np.random.Generator, None] = None,
+    start: Optional[float] = None,
+    interval: float = 10.0,
+) -> Dict[str, np.ndarray]:
+    """
+    Generar de una vez n × devices lecturas simuladas por columnas.
+
+    Args:
+        n: Lecturas por dispositivo
+        devices: Número de dispositivos simulados
+        seed: Semilla o generador de NumPy ya creado (None = aleatoria)
+        start: Instante de la primera lectura en segundos epoch (por defecto, ahora - n * interval)
+        interval: Segundos entre lecturas de un mismo dispositivo
+
+    Returns:
+        Diccionario con "epoch", "dispositivo" y un array por campo (NaN = dato ausente)
+    """
+    return next(generate_chunks(n, devices, seed, start, interval, chunk_size=max(1, n) * devices))
+
+
+def _python_values(field: str, values: np.ndarray) -> List[Any]:
+    """Columna convertida a valores de Python redondeados (NaN = None)."""
+    if field in INTEGER_FIELDS:
+        return values.astype(np.int64).tolist()
+    rounded = np.round(values, 7 if field in GROUPS["gps"] else 4).astype(object)
+    rounded[np.isnan(values)] = None
+    return rounded.tolist()
+
+
+def device_name(device: int) -> str:
+    """Nombre de un dispositivo simulado a partir de su índice (0 = "robot-001")."""
+    return f"robot-{device + 1:03d}"
+
+
+def iter_readings(columns: Dict[str, np.ndarray], include_device: Optional[bool] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Convertir columnas en lecturas con el formato de GET /datos.
+
+    Args:
+        columns: Columnas devueltas por generate_columns
+        include_device: Añadir el campo "dispositivo" (por defecto, si hay más de uno)
+
+    Yields:
+        Lecturas anidadas por grupo de sensores
+    """
+    devices = columns["dispositivo"]
+    if include_device is None:
+        include_device = bool(len(devices)) and int(devices.max()) > 0
+    timestamps = local_iso(columns["epoch"])
+    # Cada columna se convierte a tipos de Python de una sola vez
+    values = {field: _python_values(field, columns[field]) for group in GROUPS.values() for field in group}
+    device_ids = devices.tolist()
+    for i, timestamp in enumerate(timestamps):
+        reading: Dict[str, Any] = {"timestamp": timestamp}
+        if include_device:
+            reading["dispositivo"] = device_name(device_ids[i])
+        for group, fields in GROUPS.items():
+            reading[group] = {field: values[field][i] for field in fields}
+        yield reading
+
+
+def iter_ndjson(columns: Dict[str, np.ndarray], chunk_size: int = 1000) -> Iterator[str]:
+    """
+    Serializar las lecturas como NDJSON, en bloques de `chunk_size` líneas.
+
+    Args:
+        columns: Columnas devueltas por generate_columns
+        chunk_size: Lecturas por bloque de texto
+
+    Yields:
+        Bloques de líneas JSON terminadas en salto de línea
+    """
+    lines = []
+    for reading in iter_readings(columns):
+        lines.append(json.dumps(reading, separators=(",", ":")))
+        if len(lines) >= chunk_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def local_iso(epoch: np.ndarray, sep: str = "T") -> List[str]:
+    """
+    Marcas de tiempo ISO 8601 en hora local, vectorizadas.
+
+    Args:
+        epoch: Segundos epoch
+        sep: Separador entre fecha y hora
+
+    Returns:
+        Lista de textos "AAAA-MM-DDTHH:MM:SS"
+    """
+    local = (epoch + _utc_offset()).astype("datetime64[s]").astype(str)
+    if sep != "T":
+        local = np.char.replace(local, "T", sep)
+    return local.tolist()
@@ -1,8 +1,18 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
+from fastapi.responses import JSONResponse, StreamingResponse
 from datetime import datetime
-import random
+from typing import Optional
+import numpy as np
+import uvicorn
+import os
+
+from generator import generate_chunks, generate_columns, iter_ndjson, iter_readings
+
+# Configuración (se puede sobrescribir mediante variables de entorno)
+FAKE_DATA_SEED = os.getenv("FAKE_DATA_SEED")
+FAKE_DATA_MAX_BATCH = int(os.getenv("FAKE_DATA_MAX_BATCH", "100000"))
+FAKE_DATA_MAX_STREAM = int(os.getenv("FAKE_DATA_MAX_STREAM", "10000000"))
 
 app = FastAPI()
 
@@ -15,52 +25,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Generador compartido por /datos: con FAKE_DATA_SEED la secuencia de lecturas es reproducible
+rng = np.random.default_rng(int(FAKE_DATA_SEED) if FAKE_DATA_SEED else None)
+
+def _start(inicio: Optional[datetime]) -> Optional[float]:
+    """Instante de la primera lectura en segundos epoch (None = que la última sea la actual)."""
+    return inicio.timestamp() if inicio else None
+
 @app.get("/datos")
-async def get_datos():
+def get_datos():
     """Devuelve datos simulados de sensores y clima."""
-    return {
-        "timestamp": datetime.now().isoformat(),
-        "sensor_bmp390": {
-            "presion_hPa": random.uniform(880.0, 900.0),
-            "temperatura_a": random.uniform(22.0, 25.0)
-        },
-        "sensor_ltr390": {
-            "luz_cruda": random.randint(70, 110),
-            "uv_crudo": random.randint(0, 2),
-            "lux": random.uniform(50.0, 90.0),
-            "indice_uv": random.uniform(0.0, 1.0)
-        },
-        "sensor_scd30": {
-            "co2_ppm": random.uniform(400.0, 500.0) if random.random() > 0.2 else None,
-            "temperatura_b": random.uniform(22.0, 25.0) if random.random() > 0.2 else None,
-            "humedad_pct": random.uniform(70.0, 90.0) if random.random() > 0.2 else None
-        },
-        "gps": {
-            "latitud": 9.8893941,
-            "longitud": -84.0899409
-        },
-        "clima_satelital": {
-            "T2M": random.uniform(22.0, 24.0),
-            "T2M_MAX": random.uniform(25.0, 27.0),
-            "T2M_MIN": random.uniform(20.0, 22.0),
-            "T2M_RANGE": random.uniform(5.0, 6.0),
-            "PRECTOTCORR": random.uniform(10.0, 15.0),
-            "RH2M": random.uniform(85.0, 95.0),
-            "QV2M": random.uniform(16.0, 18.0),
-            "WS10M": random.uniform(0.5, 1.0),
-            "WS10M_MAX": random.uniform(1.0, 1.5),
-            "WS10M_MIN": random.uniform(0.1, 0.3),
-            "T2MDEW": random.uniform(20.0, 22.0),
-            "T2MWET": random.uniform(21.0, 23.0),
-            "TS": random.uniform(22.0, 24.0),
-            "ALLSKY_SFC_LW_DWN": random.uniform(36.0, 40.0),
-            "ALLSKY_SFC_SW_DWN": random.uniform(10.0, 15.0),
-            "CLRSKY_SFC_SW_DWN": -999.0,
-            "ALLSKY_KT": -999.0,
-            "EVLAND": random.uniform(2.5, 3.5),
-            "PS": random.uniform(90.0, 95.0)
-        }
-    }
+    return next(iter_readings(generate_columns(1, seed=rng, interval=0.0)))
+
+@app.get("/datos/batch")
+def get_datos_batch(
+    n: int = Query(100, ge=1, le=FAKE_DATA_MAX_BATCH, description="Lecturas por dispositivo"),
+    dispositivos: int = Query(1, ge=1, le=1000, description="Dispositivos simulados"),
+    seed: Optional[int] = Query(None, description="Semilla (misma semilla = mismos datos)"),
+    intervalo: float = Query(10.0, gt=0, description="Segundos entre lecturas de un dispositivo"),
+    inicio: Optional[datetime] = Query(None, description="Primera lectura (por defecto, la última es la actual)"),
+):
+    """Devuelve n × dispositivos lecturas simuladas, ordenadas por tiempo, en una lista JSON."""
+    if n * dispositivos > FAKE_DATA_MAX_BATCH:
+        return JSONResponse(
+            status_code=422,
+            content={"detail": f"Como máximo {FAKE_DATA_MAX_BATCH} lecturas por petición; use /datos/stream"},
+        )
+    columns = generate_columns(n, dispositivos, seed, _start(inicio), intervalo)
+    return JSONResponse(content=list(iter_readings(columns)))
+
+@app.get("/datos/stream")
+def get_datos_stream(
+    n: int = Query(1000, ge=1, description="Lecturas por dispositivo"),
+    dispositivos: int = Query(1, ge=1, le=1000, description="Dispositivos simulados"),
+    seed: Optional[int] = Query(None, description="Semilla (misma semilla = mismos datos)"),
+    intervalo: float = Query(10.0, gt=0, description="Segundos entre lecturas de un dispositivo"),
+    inicio: Optional[datetime] = Query(None, description="Primera lectura (por defecto, la última es la actual)"),
+):
+    """Devuelve n × dispositivos lecturas simuladas como NDJSON (una lectura por línea)."""
+    if n * dispositivos > FAKE_DATA_MAX_STREAM:
+        return JSONResponse(
+            status_code=422,
+            content={"detail": f"Como máximo {FAKE_DATA_MAX_STREAM} lecturas por petición"},
+        )
+
+    def chunks():
+        # Se genera por tramos para no tener todo el flujo en memoria
+        for columns in generate_chunks(n, dispositivos, seed, _start(inicio), intervalo):
+            yield from iter_ndjson(columns)
+
+    return StreamingResponse(chunks(), media_type="application/x-ndjson")
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8080) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8080)
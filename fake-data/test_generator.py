@@ -0,0 +1,73 @@
+import os
+import json
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from generator import GROUPS, SCD30_DROPOUT, generate_chunks, generate_columns
+from generate_dataset import write_sqlite
+
+START = 1714521600.0  # 2024-05-01 00:00 UTC
+
+class TestGenerator(unittest.TestCase):
+
+    def test_same_seed_same_data(self):
+        """La misma semilla produce los mismos datos y otra semilla, datos distintos."""
+        first = generate_columns(500, devices=2, seed=42, start=START)
+        second = generate_columns(500, devices=2, seed=42, start=START)
+        other = generate_columns(500, devices=2, seed=7, start=START)
+        for field, values in first.items():
+            np.testing.assert_array_equal(values, second[field])
+        self.assertFalse(np.allclose(first["temperatura_a"], other["temperatura_a"]))
+
+    def test_scd30_dropout_rate(self):
+        """Cada campo del sensor_scd30 falta en torno al 20 % de las lecturas."""
+        columns = generate_columns(20000, seed=1, start=START)
+        for field in GROUPS["sensor_scd30"]:
+            self.assertAlmostEqual(np.isnan(columns[field]).mean(), SCD30_DROPOUT, delta=0.02)
+        self.assertFalse(np.isnan(columns["temperatura_a"]).any())
+
+    def test_chunks_are_continuous(self):
+        """Los tramos encajan: tiempos consecutivos y mismo clima diario y posición por dispositivo."""
+        n, devices, interval = 3000, 3, 60.0
+        chunks = list(generate_chunks(n, devices, seed=3, start=START, interval=interval, chunk_size=999))
+        self.assertGreater(len(chunks), 1)
+        epoch = np.concatenate([chunk["epoch"] for chunk in chunks])
+        device = np.concatenate([chunk["dispositivo"] for chunk in chunks])
+        np.testing.assert_array_equal(epoch, np.repeat(START + np.arange(n) * interval, devices))
+        np.testing.assert_array_equal(device, np.tile(np.arange(devices), n))
+
+        # El clima satelital de un día y dispositivo no cambia al pasar de un tramo a otro
+        t2m = np.concatenate([chunk["T2M"] for chunk in chunks])
+        offset = datetime.now().astimezone().utcoffset().total_seconds()
+        day = ((epoch + offset) // 86400).astype(np.int64)
+        for d in range(devices):
+            for value_day in np.unique(day):
+                values = t2m[(device == d) & (day == value_day)]
+                self.assertEqual(len(np.unique(values)), 1)
+
+        # La posición de cada dispositivo se mantiene entre el primer y el último tramo
+        for d in range(devices):
+            first = chunks[0]["latitud"][chunks[0]["dispositivo"] == d].mean()
+            last = chunks[-1]["latitud"][chunks[-1]["dispositivo"] == d].mean()
+            self.assertAlmostEqual(first, last, delta=1e-5)
+
+    def test_sqlite_keeps_device(self):
+        """La salida SQLite guarda el dispositivo en extra, como data-analysis."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sensores.db")
+            written = write_sqlite(path, generate_chunks(10, devices=3, seed=5, start=START))
+            conn = sqlite3.connect(path)
+            try:
+                extra = [row[0] for row in conn.execute("SELECT extra FROM sensor_data ORDER BY id")]
+            finally:
+                conn.close()
+        self.assertEqual(written, 30)
+        self.assertEqual(json.loads(extra[0]), {"dispositivo": "robot-001"})
+        self.assertEqual(len(set(extra)), 3)
+
+if __name__ == "__main__":
+    unittest.main()
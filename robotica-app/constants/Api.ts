@@ -20,6 +20,7 @@ export const API_ENDPOINTS = {
   procesarDatos: '/procesar-datos',
   respuestas: '/respuestas',
   respuestaPorId: (id: number) => `/respuestas/${id}`,
+  trabajoPorId: (id: number) => `/jobs/${id}`,
   
   // Modelos
   modelos: '/modelos',
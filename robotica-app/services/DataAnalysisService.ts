@@ -393,10 +393,29 @@ class DataAnalysisService {
    */
   async procesarDatos(): Promise<AnalysisResult> {
     try {
-      console.log('[DataAnalysis] Iniciando procesamiento de datos (puede tomar hasta 60 segundos)...');
+      console.log('[DataAnalysis] Encolando análisis de datos...');
       const response = await this.api.get<any>(API_ENDPOINTS.procesarDatos);
       logDetailed('PROCESAR DATOS - RESPUESTA', response.data);
-      return this.normalizeAnalysisResult(response.data);
+
+      // Sin cambios significativos: el backend devuelve el análisis vigente y no encola nada
+      if (response.data.status === 'unchanged' || response.data.job_id == null) {
+        return this.normalizeAnalysisResult({
+          message: response.data.message,
+          data_id: response.data.data_id,
+          response_id: response.data.response_id,
+          response: response.data.response,
+        });
+      }
+
+      // El backend responde al instante con un trabajo; se consulta su estado hasta que termine
+      const job = await this.esperarTrabajo(response.data.job_id);
+      return this.normalizeAnalysisResult({
+        message: 'Datos procesados correctamente',
+        data_id: job.data_id,
+        response_id: job.response_id,
+        response: job.response,
+        timestamp: job.finished_at,
+      });
     } catch (error) {
       console.error('[DataAnalysis] Error al procesar datos:', error);
       console.warn('[DataAnalysis] Usando datos ficticios para análisis');
@@ -405,6 +424,28 @@ class DataAnalysisService {
     }
   }
 
+  /**
+   * Consulta periódicamente un trabajo de análisis hasta que termina
+   * @param jobId ID del trabajo devuelto por /procesar-datos
+   * @param intervalMs Intervalo entre consultas
+   * @param maxWaitMs Tiempo máximo de espera
+   * @returns Estado final del trabajo
+   */
+  async esperarTrabajo(jobId: number, intervalMs = 2000, maxWaitMs = 300000): Promise<any> {
+    const deadline = Date.now() + maxWaitMs;
+    while (Date.now() < deadline) {
+      const { data: job } = await this.api.get<any>(API_ENDPOINTS.trabajoPorId(jobId), { timeout: 15000 });
+      if (job.status === 'done') {
+        return job;
+      }
+      if (job.status === 'error') {
+        throw new Error(job.error || `El trabajo ${jobId} falló`);
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+    throw new Error(`Tiempo de espera agotado para el trabajo ${jobId}`);
+  }
+
   /**
    * Obtiene la lista de respuestas de análisis previos
    * @param limit Número máximo de respuestas a obtener